@@ -1,7 +1,30 @@
+"""Generate seed data for the course_management schema (see Sql_table.sql).
+
+Everything is produced in fixed-size shards (chunks of students, ranges of
+courses, forums or threads) and streamed out, so memory stays bounded by the
+shard size and the number of courses/forums/threads, not by the number of
+students. Every shard has its own seed, so the same --seed produces the same
+data whether it runs on one core or many (--workers).
+
+    python Insert_Generator.py --students 5000000 --courses 5000 --seed 42 > seed.sql
+    python Insert_Generator.py --format csv --out-dir seed/   # then: cd seed && mysql --local-infile course_management < load.sql
+    python Insert_Generator.py --format mysql --batch-size 5000
+    python Insert_Generator.py --workers 0 --format tsv --out-dir seed/   # all cores
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 from faker import Faker
-import random
+from faker.providers.internet.en_US import Provider as InternetProvider
+from faker.providers.lorem.en_US import Provider as LoremProvider
+from faker.providers.person.en_US import Provider as PersonProvider
 
-fake = Faker()
+from bulk_loader import (DEFAULT_BATCH_SIZE, TABLE_ORDER, DatabaseWriter, DelimitedWriter,
+                         Progress, SqlWriter, write_load_script)
+import reports
 
 # Settings
 NUM_STUDENTS = 100000      # Increased number of students
@@ -9,99 +32,745 @@ NUM_COURSES = 200          # Increased number of courses
 NUM_LECTURERS = 40         # Increased number of lecturers to handle 200 courses
 NUM_ADMINS = 1             # Keeping 1 admin
 
-# Data Containers
-users = []
-student_profiles = []
-courses = []
-student_courses = []
-lecturers = []
-admin = []
-course_assignments = {}
-
-user_id_counter = 1
-
-# --- Admin ---
-admin.append((user_id_counter, fake.name(), fake.email(), 'adminpass', 'admin'))
-user_id_counter += 1
-
-# --- Lecturers ---
-for _ in range(NUM_LECTURERS):
-    lecturers.append((user_id_counter, fake.name(), fake.email(), 'lecturerpass', 'lecturer'))
-    user_id_counter += 1
-
-# --- Students ---
-for _ in range(NUM_STUDENTS):
-    users.append((user_id_counter, fake.name(), fake.email(), 'studentpass', 'student'))
-    student_profiles.append((user_id_counter, round(random.uniform(2.0, 4.0), 2)))
-    user_id_counter += 1
-
-# --- Courses ---
-for course_id in range(1, NUM_COURSES + 1):
-    courses.append((course_id, fake.catch_phrase(), f"CSE{1000 + course_id}", fake.word()))
-
-# --- Assign Lecturers to Courses ---
-# Each lecturer teaches 1-5 courses
-available_courses = list(range(1, NUM_COURSES + 1))
-random.shuffle(available_courses)
-
-lecturer_course_map = {lecturer[0]: [] for lecturer in lecturers}
-
-for course_id in available_courses:
-    eligible_lecturers = [lid for lid, c in lecturer_course_map.items() if len(c) < 5]
-    selected_lecturer = random.choice(eligible_lecturers)
-    lecturer_course_map[selected_lecturer].append(course_id)
-    course_assignments[course_id] = selected_lecturer
-
-# --- Enroll Students ---
-# Each student must be enrolled in 3-6 courses
-for student in student_profiles:
-    enrolled_courses = random.sample(list(course_assignments.keys()), random.randint(3, 6))
-    for course_id in enrolled_courses:
-        student_courses.append((student[0], course_id))
-
-# --- Ensure Each Course Has at Least 10 Students ---
-course_membership = {cid: [] for cid in course_assignments.keys()}
-
-for student_id, course_id in student_courses:
-    course_membership[course_id].append(student_id)
-
-for course_id, members in course_membership.items():
-    if len(members) < 10:
-        needed = 10 - len(members)
-        available_students = [s[0] for s in student_profiles if s[0] not in members]
-        selected_students = random.sample(available_students, needed)
-        for student_id in selected_students:
-            student_courses.append((student_id, course_id))
-
-# --- Generate SQL ---
-
-# Admin
-print("-- Insert Admins")
-for entry in admin:
-    print(f"INSERT INTO user (user_id, name, email, password, role) VALUES ({entry[0]}, '{entry[1]}', '{entry[2]}', '{entry[3]}', '{entry[4]}');")
-
-# Lecturers
-print("\n-- Insert Lecturers")
-for entry in lecturers:
-    print(f"INSERT INTO user (user_id, name, email, password, role) VALUES ({entry[0]}, '{entry[1]}', '{entry[2]}', '{entry[3]}', '{entry[4]}');")
-
-# Students
-print("\n-- Insert Students")
-for entry in users:
-    print(f"INSERT INTO user (user_id, name, email, password, role) VALUES ({entry[0]}, '{entry[1]}', '{entry[2]}', '{entry[3]}', '{entry[4]}');")
-
-# Student Profiles
-print("\n-- Insert Student Profiles")
-for entry in student_profiles:
-    print(f"INSERT INTO student_profile (student_id, gpa) VALUES ({entry[0]}, {entry[1]});")
+CHUNK_SIZE = 50000         # Students generated per chunk
+MIN_COURSES_PER_STUDENT = 3
+MAX_COURSES_PER_STUDENT = 6
+MIN_STUDENTS_PER_COURSE = 10
+MAX_COURSES_PER_LECTURER = 5
+
+EVENTS_PER_COURSE = 12     # Mean calendar events per course
+MAX_FORUMS_PER_COURSE = 3
+MAX_ASSIGNMENTS_PER_COURSE = 6
+POSTS_PER_FORUM = 20       # Mean threads per forum, spread Zipf-style over forums
+FORUM_SKEW = 1.1           # Zipf exponent of thread volume across forums
+REPLY_SKEW = 1.8           # Zipf exponent of replies per thread
+MAX_REPLIES_PER_POST = 200
+REPLY_DEPTH = 4            # Deepest reply nesting level
+NESTED_REPLY_RATE = 0.6    # Chance a reply answers an earlier reply, not the thread
+SUBMISSION_RATE = 0.85
+GRADED_RATE = 0.7
+
+COURSE_SHARD = 250         # Courses per shard
+FORUM_SHARD = 500          # Forums per shard
+POST_SHARD = 5000          # Threads per reply shard
+
+TERM_START = np.datetime64("2025-01-06T08:00:00")
+TERM_DAYS = 120
+
+# Independent random streams, so changing how one table is generated never
+# shifts the values of another.
+STREAM_ADMINS = 0
+STREAM_LECTURERS = 1
+STREAM_STUDENTS = 2
+STREAM_PROFILES = 3
+STREAM_COURSES = 4
+STREAM_ASSIGNMENT = 5
+STREAM_ENROLLMENTS = 6
+STREAM_TOPUP = 7
+STREAM_PLAN = 8
+STREAM_EVENTS = 9
+STREAM_POSTS = 10
+STREAM_REPLIES = 11
+STREAM_SUBMISSIONS = 12
+
+
+class Settings:
+    """Dataset shape; user ids are laid out admins, lecturers, students"""
+
+    def __init__(self, students=NUM_STUDENTS, courses=NUM_COURSES, lecturers=None,
+                 admins=NUM_ADMINS, seed=0, chunk_size=CHUNK_SIZE,
+                 events_per_course=EVENTS_PER_COURSE, posts_per_forum=POSTS_PER_FORUM,
+                 forum_skew=FORUM_SKEW, reply_skew=REPLY_SKEW, reply_depth=REPLY_DEPTH,
+                 max_replies=MAX_REPLIES_PER_POST):
+        if lecturers is None:
+            lecturers = max(NUM_LECTURERS, -(-courses // (MAX_COURSES_PER_LECTURER - 1)))
+        if courses < MAX_COURSES_PER_STUDENT:
+            raise ValueError(f"Need at least {MAX_COURSES_PER_STUDENT} courses")
+        if lecturers * MAX_COURSES_PER_LECTURER < courses:
+            raise ValueError(f"{lecturers} lecturers cannot teach {courses} courses")
+        if students < MIN_STUDENTS_PER_COURSE:
+            raise ValueError(f"Need at least {MIN_STUDENTS_PER_COURSE} students")
+        if reply_depth < 1:
+            raise ValueError("--reply-depth must be at least 1")
+        if reply_skew <= 1:
+            raise ValueError("--reply-skew must be greater than 1")
+        self.students = students
+        self.courses = courses
+        self.lecturers = lecturers
+        self.admins = admins
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.events_per_course = events_per_course
+        self.posts_per_forum = posts_per_forum
+        self.forum_skew = forum_skew
+        self.reply_skew = reply_skew
+        self.reply_depth = reply_depth
+        self.max_replies = max_replies
+
+    @property
+    def first_lecturer_id(self):
+        return self.admins + 1
+
+    @property
+    def first_student_id(self):
+        return self.admins + self.lecturers + 1
+
+    def student_chunks(self):
+        """Yield (chunk_index, first_student_id, count)"""
+        for index, start in enumerate(range(0, self.students, self.chunk_size)):
+            yield index, self.first_student_id + start, min(self.chunk_size, self.students - start)
+
+
+# ==============================================
+# Random Streams
+# ==============================================
+def seed_sequence(settings, stream, shard=0):
+    return np.random.SeedSequence([settings.seed, stream, shard])
+
+
+def rng_for(settings, stream, shard=0):
+    return np.random.default_rng(seed_sequence(settings, stream, shard))
+
+
+def faker_for(settings, stream, shard=0):
+    fake = Faker()
+    fake.seed_instance(int(seed_sequence(settings, stream, shard).generate_state(1)[0]))
+    return fake
+
+
+def shards(total, size):
+    """Yield (start, stop) ranges of at most `size` items"""
+    for start in range(0, total, size):
+        yield start, min(start + size, total)
+
+
+WORDS = np.array(LoremProvider.word_list)
+
+
+def _texts(rng, count, min_words, max_words):
+    """`count` lorem sentences, drawn in bulk"""
+    lengths = rng.integers(min_words, max_words + 1, size=count).tolist()
+    words = rng.choice(WORDS, size=sum(lengths)).tolist()
+    texts, position = [], 0
+    for length in lengths:
+        texts.append(" ".join(words[position:position + length]).capitalize() + ".")
+        position += length
+    return texts
+
+
+def _timestamps(seconds):
+    """Seconds since TERM_START as 'YYYY-MM-DD HH:MM:SS' strings"""
+    seconds = np.asarray(seconds, dtype=np.int64)
+    if not len(seconds):
+        return []
+    moments = TERM_START + seconds.astype("timedelta64[s]")
+    return np.char.replace(np.datetime_as_string(moments, unit="s"), "T", " ").tolist()
+
+
+# ==============================================
+# Users
+# ==============================================
+# Calling fake.name() per row dominates the run time at millions of rows, so
+# names are drawn in bulk from Faker's own weighted name lists instead.
+def _weighted(names):
+    words = np.array(list(names))
+    weights = np.array(list(names.values()), dtype=float)
+    return words, weights / weights.sum()
+
+
+FIRST_NAMES, FIRST_NAME_WEIGHTS = _weighted(PersonProvider.first_names)
+LAST_NAMES, LAST_NAME_WEIGHTS = _weighted(PersonProvider.last_names)
+EMAIL_DOMAINS = np.array(InternetProvider.free_email_domains)
+
+
+def _people(rng, first_id, count, password, role):
+    first = rng.choice(FIRST_NAMES, size=count, p=FIRST_NAME_WEIGHTS).tolist()
+    last = rng.choice(LAST_NAMES, size=count, p=LAST_NAME_WEIGHTS).tolist()
+    domains = rng.choice(EMAIL_DOMAINS, size=count).tolist()
+    for offset in range(count):
+        user_id = first_id + offset
+        # Names repeat long before 100k rows; the id keeps emails unique
+        email = f"{first[offset].lower()}.{last[offset].lower()}{user_id}@{domains[offset]}"
+        yield (user_id, f"{first[offset]} {last[offset]}", email, password, role)
+
 
+def iter_admins(settings):
+    yield from _people(rng_for(settings, STREAM_ADMINS), 1, settings.admins, 'adminpass', 'admin')
+
+
+def iter_lecturers(settings):
+    yield from _people(rng_for(settings, STREAM_LECTURERS), settings.first_lecturer_id,
+                       settings.lecturers, 'lecturerpass', 'lecturer')
+
+
+def iter_student_users(settings, chunks=None):
+    for index, first_id, count in chunks or settings.student_chunks():
+        yield from _people(rng_for(settings, STREAM_STUDENTS, index), first_id, count,
+                           'studentpass', 'student')
+
+
+def iter_student_profiles(settings, chunks=None):
+    for index, first_id, count in chunks or settings.student_chunks():
+        gpas = rng_for(settings, STREAM_PROFILES, index).uniform(2.0, 4.0, count).round(2)
+        for offset, gpa in enumerate(gpas.tolist()):
+            yield (first_id + offset, gpa)
+
+
+# ==============================================
 # Courses
-print("\n-- Insert Courses")
-for entry in courses:
-    lecturer_id = course_assignments[entry[0]]
-    print(f"INSERT INTO course (course_id, name, course_code, department_name, lecturer_id) VALUES ({entry[0]}, '{entry[1]}', '{entry[2]}', '{entry[3]}', {lecturer_id});")
-
-# Student Course Enrollment
-print("\n-- Insert Student Course Enrollments")
-for entry in student_courses:
-    print(f"INSERT INTO student_course (student_id, course_id) VALUES ({entry[0]}, {entry[1]});")
+# ==============================================
+def assign_lecturers(settings):
+    """Array mapping course_id - 1 to its lecturer; each lecturer teaches at most 5"""
+    rng = rng_for(settings, STREAM_ASSIGNMENT)
+    order = rng.permutation(settings.courses)
+    eligible = list(range(settings.first_lecturer_id, settings.first_lecturer_id + settings.lecturers))
+    load = dict.fromkeys(eligible, 0)
+    picks = rng.random(settings.courses)
+
+    assignments = np.empty(settings.courses, dtype=np.int64)
+    for course_index, pick in zip(order.tolist(), picks.tolist()):
+        slot = int(pick * len(eligible))
+        lecturer_id = eligible[slot]
+        assignments[course_index] = lecturer_id
+        load[lecturer_id] += 1
+        if load[lecturer_id] == MAX_COURSES_PER_LECTURER:
+            # O(1) swap-remove instead of rebuilding the eligible list
+            eligible[slot] = eligible[-1]
+            eligible.pop()
+    return assignments
+
+
+def iter_courses(settings, lecturer_ids=None):
+    if lecturer_ids is None:
+        lecturer_ids = assign_lecturers(settings)
+    fake = faker_for(settings, STREAM_COURSES)
+    for course_id in range(1, settings.courses + 1):
+        yield (course_id, fake.catch_phrase(), f"CSE{1000 + course_id}", fake.word(),
+               int(lecturer_ids[course_id - 1]))
+
+
+# ==============================================
+# Enrollments
+# ==============================================
+def chunk_enrollments(settings, index, first_id, count):
+    """Vectorized 3-6 distinct courses per student for one chunk.
+
+    Returns parallel (student_ids, course_ids) arrays. Each chunk has its own
+    seed, so any chunk can be regenerated on its own.
+    """
+    rng = rng_for(settings, STREAM_ENROLLMENTS, index)
+    wanted = rng.integers(MIN_COURSES_PER_STUDENT, MAX_COURSES_PER_STUDENT + 1, size=count)
+    picks = rng.integers(1, settings.courses + 1, size=(count, MAX_COURSES_PER_STUDENT))
+
+    # Redraw the (rare) rows that picked a course twice
+    while True:
+        ordered = np.sort(picks, axis=1)
+        clash = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+        clashes = int(clash.sum())
+        if not clashes:
+            break
+        picks[clash] = rng.integers(1, settings.courses + 1, size=(clashes, MAX_COURSES_PER_STUDENT))
+
+    keep = np.arange(MAX_COURSES_PER_STUDENT) < wanted[:, None]
+    student_ids = np.repeat(np.arange(first_id, first_id + count), wanted)
+    return student_ids, picks[keep]
+
+
+def count_chunk_enrollments(settings, chunk):
+    _, course_ids = chunk_enrollments(settings, *chunk)
+    return np.bincount(course_ids, minlength=settings.courses + 1)
+
+
+def short_courses(counts):
+    """Course ids below the minimum class size"""
+    return [int(course_id) for course_id in np.flatnonzero(counts[1:] < MIN_STUDENTS_PER_COURSE) + 1]
+
+
+def iter_chunk_enrollments(settings, chunk, short=(), found=None):
+    """Yield one chunk's (student_id, course_id) rows.
+
+    Members of the courses in `short` are recorded in `found`, so the top-up
+    pass knows who is already enrolled without keeping every enrollment.
+    """
+    student_ids, course_ids = chunk_enrollments(settings, *chunk)
+    student_ids, course_ids = student_ids.tolist(), course_ids.tolist()
+    if short:
+        short = set(short)
+        for student_id, course_id in zip(student_ids, course_ids):
+            if course_id in short:
+                found.setdefault(course_id, set()).add(student_id)
+    yield from zip(student_ids, course_ids)
+
+
+def iter_topup(settings, members):
+    """Top courses in `members` (course_id -> enrolled students) up to 10 students"""
+    rng = rng_for(settings, STREAM_TOPUP)
+    last_student_id = settings.first_student_id + settings.students - 1
+    for course_id in sorted(members):
+        enrolled = members[course_id]
+        while len(enrolled) < MIN_STUDENTS_PER_COURSE:
+            student_id = int(rng.integers(settings.first_student_id, last_student_id + 1))
+            if student_id not in enrolled:
+                enrolled.add(student_id)
+                yield (student_id, course_id)
+
+
+# ==============================================
+# Volume Plan
+# ==============================================
+class Plan:
+    """Per-course, per-forum and per-thread row counts, drawn up front.
+
+    Knowing every count before any rows are written lets each shard compute
+    its own ids from the running totals, so shards never need to talk to
+    each other. Memory is O(courses + forums + threads), not O(students).
+    """
+
+    def __init__(self, settings):
+        rng = rng_for(settings, STREAM_PLAN)
+        courses = settings.courses
+
+        self.lecturers = assign_lecturers(settings)
+        self.events = rng.poisson(settings.events_per_course, size=courses)
+        self.forums = rng.integers(1, MAX_FORUMS_PER_COURSE + 1, size=courses)
+        self.assignments = rng.integers(1, MAX_ASSIGNMENTS_PER_COURSE + 1, size=courses)
+
+        # Zipfian activity: the forum with popularity rank r gets a share
+        # of all threads proportional to 1 / r^skew
+        forum_count = int(self.forums.sum())
+        ranks = rng.permutation(forum_count) + 1
+        weights = ranks.astype(float) ** -settings.forum_skew
+        expected = forum_count * settings.posts_per_forum * weights / weights.sum()
+        self.posts = rng.poisson(expected)
+        self.forum_courses = np.repeat(np.arange(1, courses + 1), self.forums)
+
+        post_count = int(self.posts.sum())
+        self.post_seconds = rng.integers(0, TERM_DAYS * 86400, size=post_count)
+        self.replies = np.minimum(rng.zipf(settings.reply_skew, size=post_count) - 1,
+                                  settings.max_replies)
+
+        # First id of each course's / forum's / thread's rows
+        self.first_event = self._first_ids(self.events)
+        self.first_forum = self._first_ids(self.forums)
+        self.first_assignment = self._first_ids(self.assignments)
+        self.first_post = self._first_ids(self.posts)
+        self.first_reply = self._first_ids(self.replies)
+
+    @staticmethod
+    def _first_ids(counts):
+        return np.concatenate(([1], np.cumsum(counts)[:-1] + 1)).astype(np.int64)
+
+    def threads(self, start, stop):
+        """Slice of per-thread arrays covering forums start+1..stop"""
+        first = int(self.first_post[start]) - 1
+        return slice(first, first + int(self.posts[start:stop].sum()))
+
+    @property
+    def forum_count(self):
+        return len(self.posts)
+
+    @property
+    def post_count(self):
+        return len(self.replies)
+
+
+# ==============================================
+# Calendar Events, Forums, Assignments
+# ==============================================
+EVENT_KINDS = np.array(["Lecture", "Lab", "Tutorial", "Quiz", "Assignment due", "Midterm", "Final exam"])
+FORUM_NAMES = ["General", "Announcements", "Q&A"]
+
+
+def iter_events(settings, start, stop, counts, first_ids):
+    """calendar_event rows for courses start+1..stop"""
+    rng = rng_for(settings, STREAM_EVENTS, start)
+    total = int(counts.sum())
+    kinds = rng.choice(EVENT_KINDS, size=total).tolist()
+    days = rng.integers(0, TERM_DAYS, size=total)
+    dates = np.datetime_as_string(TERM_START.astype("datetime64[D]") + days, unit="D").tolist()
+    descriptions = _texts(rng, total, 5, 20)
+
+    row = 0
+    for offset, count in enumerate(counts.tolist()):
+        course_id = start + offset + 1
+        for n in range(count):
+            yield (int(first_ids[offset]) + n, course_id, f"{kinds[row]} {n + 1}", dates[row],
+                   descriptions[row])
+            row += 1
+
+
+def iter_forums(settings, start, stop, counts, first_ids):
+    for offset, count in enumerate(counts.tolist()):
+        for n in range(count):
+            yield (int(first_ids[offset]) + n, FORUM_NAMES[n % len(FORUM_NAMES)], start + offset + 1)
+
+
+def iter_assignments(settings, start, stop, counts, first_ids):
+    for offset, count in enumerate(counts.tolist()):
+        for n in range(count):
+            yield (int(first_ids[offset]) + n, f"Assignment {n + 1}", start + offset + 1)
+
+
+# ==============================================
+# Forum Threads and Replies
+# ==============================================
+def _authors(rng, settings, lecturer_ids):
+    """Mostly random students, with the course lecturer chiming in ~15% of the time"""
+    students = rng.integers(settings.first_student_id,
+                            settings.first_student_id + settings.students, size=len(lecturer_ids))
+    return np.where(rng.random(len(lecturer_ids)) < 0.15, lecturer_ids, students).tolist()
+
+
+def iter_posts(settings, start, stop, counts, first_ids, lecturer_ids, seconds):
+    """forum_post rows for forums start+1..stop; lecturer_ids/seconds are per thread"""
+    rng = rng_for(settings, STREAM_POSTS, start)
+    total = int(counts.sum())
+    titles = _texts(rng, total, 3, 8)
+    bodies = _texts(rng, total, 15, 120)
+    authors = _authors(rng, settings, lecturer_ids)
+    created = _timestamps(seconds)
+
+    row = 0
+    for offset, count in enumerate(counts.tolist()):
+        forum_id = start + offset + 1
+        for n in range(count):
+            yield (int(first_ids[offset]) + n, titles[row], bodies[row], authors[row], forum_id,
+                   created[row])
+            row += 1
+
+
+def iter_replies(settings, start, stop, counts, first_ids, lecturer_ids, seconds):
+    """reply rows for threads start+1..stop, as trees at most reply_depth deep.
+
+    Each reply answers either the thread itself or a random earlier reply
+    that still has room below it, and is posted after everything before it.
+    """
+    rng = rng_for(settings, STREAM_REPLIES, start)
+    total = int(counts.sum())
+    contents = _texts(rng, total, 5, 60)
+    authors = _authors(rng, settings, np.repeat(lecturer_ids, counts))
+    nest = (rng.random(total) < NESTED_REPLY_RATE).tolist()
+    picks = rng.random(total).tolist()
+    # Each thread's replies trail its own post time by cumulative gaps
+    elapsed = np.cumsum(rng.exponential(6 * 3600, size=total))
+    thread_starts = np.cumsum(counts) - counts
+    before = np.repeat(np.where(thread_starts > 0, elapsed[thread_starts - 1], 0), counts)
+    created = _timestamps(np.repeat(seconds, counts) + elapsed - before)
+
+    row = 0
+    for offset, count in enumerate(counts.tolist()):
+        post_id = start + offset + 1
+        first_id = int(first_ids[offset])
+        depths = []
+        for n in range(count):
+            parent, depth = None, 1
+            if n and nest[row]:
+                candidate = int(picks[row] * n)
+                if depths[candidate] < settings.reply_depth:
+                    parent, depth = first_id + candidate, depths[candidate] + 1
+            depths.append(depth)
+            yield (first_id + n, contents[row], authors[row], post_id, parent, created[row])
+            row += 1
+
+
+# ==============================================
+# Assignment Submissions
+# ==============================================
+def iter_submissions(settings, chunk, assignment_counts, first_assignment):
+    """assignment_submission rows for one student chunk's enrollments.
+
+    Ids come from a block reserved per chunk (chunk size x 6 courses x 6
+    assignments), so chunks never collide; unused ids simply leave gaps.
+    """
+    index, _, count = chunk
+    rng = rng_for(settings, STREAM_SUBMISSIONS, index)
+    student_ids, course_ids = chunk_enrollments(settings, *chunk)
+
+    per_enrollment = assignment_counts[course_ids - 1]
+    students = np.repeat(student_ids, per_enrollment)
+    courses = np.repeat(course_ids, per_enrollment)
+    # Position of each row within its course's assignments: 0, 1, ..., n-1
+    starts = np.cumsum(per_enrollment) - per_enrollment
+    positions = np.arange(len(students)) - np.repeat(starts, per_enrollment)
+    assignments = first_assignment[courses - 1] + positions
+
+    submitted = rng.random(len(students)) < SUBMISSION_RATE
+    students, assignments = students[submitted], assignments[submitted]
+    total = len(students)
+    graded = rng.random(total) < GRADED_RATE
+    grades = np.clip(rng.normal(72, 14, size=total), 0, 100).round(2)
+    submitted_at = _timestamps(rng.integers(0, TERM_DAYS * 86400, size=total))
+
+    block = settings.chunk_size * MAX_COURSES_PER_STUDENT * MAX_ASSIGNMENTS_PER_COURSE
+    first_id = index * block + 1
+    grades = grades.tolist()
+    for row, (assignment_id, student_id) in enumerate(zip(assignments.tolist(), students.tolist())):
+        yield (first_id + row, assignment_id, student_id, submitted_at[row],
+               grades[row] if graded[row] else None)
+
+
+# ==============================================
+# Tasks
+# ==============================================
+USER_COLUMNS = ("user_id", "name", "email", "password", "role")
+COLUMNS = {
+    "user": USER_COLUMNS,
+    "student_profile": ("student_id", "gpa"),
+    "course": ("course_id", "name", "course_code", "department_name", "lecturer_id"),
+    "student_course": ("student_id", "course_id"),
+    "calendar_event": ("event_id", "course_id", "title", "event_date", "description"),
+    "forum": ("forum_id", "name", "course_id"),
+    "assignment": ("assignment_id", "name", "course_id"),
+    "forum_post": ("post_id", "title", "post", "user_id", "forum_id", "created_at"),
+    "reply": ("reply_id", "reply_content", "user_id", "post_id", "parent_reply_id", "created_at"),
+    "assignment_submission": ("submission_id", "assignment_id", "student_id", "submission_date", "grade"),
+}
+
+
+class Task:
+    """One shard of one table: `func(settings, *args)` yields its rows.
+
+    If `found` is given it is passed as the last argument and handed back
+    to the parent once the shard is written (see iter_chunk_enrollments).
+    """
+
+    def __init__(self, title, table, func, *args, found=None):
+        self.title = title
+        self.table = table
+        self.func = func
+        self.args = args
+        self.found = found
+
+    def rows(self, settings):
+        args = self.args if self.found is None else self.args + (self.found,)
+        return self.func(settings, *args)
+
+
+class Output:
+    """Where rows go; picklable so worker processes can open their own writer"""
+
+    def __init__(self, fmt, out_dir=None, batch_size=DEFAULT_BATCH_SIZE, connect_args=None):
+        self.fmt = fmt
+        self.out_dir = out_dir
+        self.batch_size = batch_size
+        self.connect_args = connect_args
+
+    def writer(self, task=None, label=""):
+        """Writer for the whole run, or for one shard if `task` is given"""
+        # Shards leave the report summaries alone; Runner rebuilds them once at the end
+        options = {"batch_size": self.batch_size, "progress": Progress(label=label),
+                   "refresh_reports": task is None}
+        if self.fmt == "sql":
+            if task is None:
+                return SqlWriter(sys.stdout, **options)
+            os.makedirs(self.out_dir, exist_ok=True)
+            # Zero-padded FK position first, so `cat $(ls *.sql)` loads in order
+            name = f"{TABLE_ORDER.index(task.table):02d}-{task.table}{label}.sql"
+            return SqlWriter(open(os.path.join(self.out_dir, name), "w", encoding="utf-8"),
+                             close=True, **options)
+        if self.fmt in ("csv", "tsv"):
+            delimiter = "\t" if self.fmt == "tsv" else ","
+            return DelimitedWriter(self.out_dir, delimiter, suffix=label, script=task is None, **options)
+        return DatabaseWriter(self.connect_args, **options)
+
+
+def run_task(settings, output, task, label):
+    """Worker entry point: write one shard with its own writer"""
+    writer = output.writer(task, label)
+    writer.begin()
+    writer.write(task.table, COLUMNS[task.table], task.rows(settings))
+    writer.finish()
+    return task.found, getattr(writer, "files", [])
+
+
+class Runner:
+    """Runs phases of tasks; phases run in FK order, tasks within one may run in parallel"""
+
+    def __init__(self, settings, output, workers=1):
+        self.settings = settings
+        self.output = output
+        self.pool = ProcessPoolExecutor(workers) if workers > 1 else None
+        self.writer = None if self.pool else output.writer()
+        self.files = []
+        self.shard = 0
+
+    def __enter__(self):
+        if self.writer:
+            self.writer.begin()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.pool:
+            self.pool.shutdown(cancel_futures=exc_type is not None)
+            if exc_type is None:
+                self._finish_shards()
+        elif exc_type is None:
+            self.writer.finish()
+
+    def _finish_shards(self):
+        """Load script and report summary rebuild covering every shard"""
+        fmt = self.output.fmt
+        if fmt in ("csv", "tsv"):
+            write_load_script(self.output.out_dir, self.files, "\t" if fmt == "tsv" else ",")
+        elif fmt == "sql":
+            path = os.path.join(self.output.out_dir, f"{len(TABLE_ORDER):02d}-rebuild-reports.sql")
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(f"{statement};\n" for statement in reports.REBUILD_STATEMENTS)
+        else:
+            import mysql.connector
+
+            db = mysql.connector.connect(autocommit=False, **self.output.connect_args)
+            try:
+                cursor = db.cursor()
+                reports.rebuild(cursor)
+                db.commit()
+            finally:
+                db.close()
+
+    def map(self, func, items):
+        """func(settings, item) for every item, in parallel if possible"""
+        if not self.pool:
+            return [func(self.settings, item) for item in items]
+        return list(self.pool.map(func, [self.settings] * len(items), items))
+
+    def phase(self, tasks):
+        """Write every task; returns the `found` results in task order"""
+        if not self.pool:
+            for task in tasks:
+                self.writer.section(task.title)
+                self.writer.write(task.table, COLUMNS[task.table], task.rows(self.settings))
+            return [task.found for task in tasks]
+
+        futures = []
+        for task in tasks:
+            self.shard += 1
+            futures.append(self.pool.submit(run_task, self.settings, self.output, task,
+                                            f".{self.shard:05d}"))
+        results = []
+        for future in futures:
+            found, files = future.result()
+            results.append(found)
+            self.files.extend(files)
+        return results
+
+
+def _course_tasks(settings, title, table, func, counts, first_ids):
+    return [Task(title, table, func, start, stop, counts[start:stop], first_ids[start:stop])
+            for start, stop in shards(settings.courses, COURSE_SHARD)]
+
+
+def generate(settings, output, workers=1):
+    """Generate every table, phase by phase in foreign-key order"""
+    chunks = list(settings.student_chunks())
+    plan = Plan(settings)
+
+    with Runner(settings, output, workers) as run:
+        run.phase(
+            [Task("Insert Admins", "user", iter_admins),
+             Task("Insert Lecturers", "user", iter_lecturers)]
+            + [Task("Insert Students", "user", iter_student_users, [chunk]) for chunk in chunks]
+        )
+        run.phase(
+            [Task("Insert Student Profiles", "student_profile", iter_student_profiles, [chunk])
+             for chunk in chunks]
+            + [Task("Insert Courses", "course", iter_courses, plan.lecturers)]
+        )
+
+        # Enrollments: count first, so only short courses need their members tracked
+        counts = sum(run.map(count_chunk_enrollments, chunks))
+        short = short_courses(counts)
+        found = run.phase([Task("Insert Student Course Enrollments", "student_course",
+                                iter_chunk_enrollments, chunk, short, found={})
+                           for chunk in chunks])
+        members = {course_id: set() for course_id in short}
+        for shard_found in found:
+            for course_id, students in shard_found.items():
+                members[course_id] |= students
+
+        run.phase(
+            [Task("Top Up Small Courses", "student_course", iter_topup, members)]
+            + _course_tasks(settings, "Insert Calendar Events", "calendar_event", iter_events,
+                            plan.events, plan.first_event)
+            + _course_tasks(settings, "Insert Forums", "forum", iter_forums,
+                            plan.forums, plan.first_forum)
+            + _course_tasks(settings, "Insert Assignments", "assignment", iter_assignments,
+                            plan.assignments, plan.first_assignment)
+        )
+
+        thread_lecturers = np.repeat(plan.lecturers[plan.forum_courses - 1], plan.posts)
+        run.phase([
+            Task("Insert Forum Threads", "forum_post", iter_posts, start, stop,
+                 plan.posts[start:stop], plan.first_post[start:stop],
+                 thread_lecturers[plan.threads(start, stop)], plan.post_seconds[plan.threads(start, stop)])
+            for start, stop in shards(plan.forum_count, FORUM_SHARD)
+        ])
+
+        run.phase(
+            [Task("Insert Replies", "reply", iter_replies, start, stop,
+                  plan.replies[start:stop], plan.first_reply[start:stop],
+                  thread_lecturers[start:stop], plan.post_seconds[start:stop])
+             for start, stop in shards(plan.post_count, POST_SHARD)]
+            + [Task("Insert Assignment Submissions", "assignment_submission", iter_submissions,
+                    chunk, plan.assignments, plan.first_assignment)
+               for chunk in chunks]
+        )
+
+
+def make_output(args):
+    if args.format in ("csv", "tsv") and not args.out_dir:
+        sys.exit(f"error: --format {args.format} needs --out-dir")
+    if args.format == "sql" and args.workers != 1 and not args.out_dir:
+        sys.exit("error: --format sql with --workers needs --out-dir (one file per shard)")
+    return Output(args.format, args.out_dir, args.batch_size, {
+        "host": os.environ.get("DB_HOST", "localhost"),
+        "port": int(os.environ.get("DB_PORT", 3306)),
+        "user": os.environ.get("DB_USER", "root"),
+        "password": os.environ.get("DB_PASSWORD", ""),
+        "database": os.environ.get("DB_NAME", "course_management"),
+    })
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate course_management seed data")
+    parser.add_argument("--students", type=int, default=NUM_STUDENTS)
+    parser.add_argument("--courses", type=int, default=NUM_COURSES)
+    parser.add_argument("--lecturers", type=int, default=None,
+                        help="default: enough to teach every course")
+    parser.add_argument("--admins", type=int, default=NUM_ADMINS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--events-per-course", type=float, default=EVENTS_PER_COURSE)
+    parser.add_argument("--posts-per-forum", type=float, default=POSTS_PER_FORUM)
+    parser.add_argument("--forum-skew", type=float, default=FORUM_SKEW,
+                        help="Zipf exponent of thread volume across forums")
+    parser.add_argument("--reply-skew", type=float, default=REPLY_SKEW,
+                        help="Zipf exponent of replies per thread (> 1)")
+    parser.add_argument("--reply-depth", type=int, default=REPLY_DEPTH,
+                        help="deepest reply nesting level")
+    parser.add_argument("--max-replies", type=int, default=MAX_REPLIES_PER_POST)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes; 0 = one per core")
+    parser.add_argument("--format", choices=["sql", "csv", "tsv", "mysql"], default="sql",
+                        help="sql: batched INSERTs on stdout; csv/tsv: LOAD DATA files in "
+                             "--out-dir; mysql: load directly (DB_HOST, DB_USER, ... env vars)")
+    parser.add_argument("--out-dir", help="directory for csv/tsv output, or per-shard sql files")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="rows per INSERT statement / executemany batch")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        settings = Settings(args.students, args.courses, args.lecturers, args.admins,
+                            args.seed, args.chunk_size, args.events_per_course,
+                            args.posts_per_forum, args.forum_skew, args.reply_skew,
+                            args.reply_depth, args.max_replies)
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+    workers = args.workers or os.cpu_count()
+    generate(settings, make_output(args), workers)
+
+
+if __name__ == '__main__':
+    main()
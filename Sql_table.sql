@@ -1,5 +1,8 @@
 CREATE DATABASE IF NOT EXISTS course_management;
 
+-- Baseline schema. Later changes (indexes etc.) live in migrations/;
+-- run `python migrate.py` after loading this file.
+
 -- Single User Table
 CREATE TABLE user
 (
@@ -1,64 +1,615 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_request_context, json, request, jsonify, send_file, stream_with_context
 from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
-import mysql.connector
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from werkzeug.exceptions import NotFound
 from werkzeug.utils import secure_filename
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from mysql.connector import Error
+from compression import Compressor
+from db_pool import ConnectionPool, ReplicaSet
+from file_store import FileStore, FileTooLarge
+from instrumentation import Metrics
+from jobs import JobQueue
+import membership
+from pagination import InvalidCursor, page_args
+from queries import InvalidParameter
+from response_cache import MemoryStore, ResponseCache, SqliteStore
+from serialization import FastJSONProvider
+import queries
+import search_index
+import dashboard
+import enrollment
+import forums
+import grading
+import reports
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'  
 app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['UPLOAD_MAX_BYTES'] = int(os.environ.get('UPLOAD_MAX_BYTES', 25 * 1024 * 1024))
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'  # let nginx/Apache send downloads
+app.config['DEFAULT_PAGE_SIZE'] = 50
+app.config['MAX_PAGE_SIZE'] = 200  # Server-enforced cap for ?limit=
+app.config['STREAM_BATCH_ROWS'] = 200  # Rows serialized per chunk in streamed exports
+app.config['THREAD_MAX_DEPTH'] = 10  # Reply nesting returned by GET /forums/<id>/threads/<id>
+app.config['THREAD_MAX_REPLIES'] = 1000  # Replies per page of a thread, all levels together
+app.config['DASHBOARD_ITEMS'] = 10  # Rows per section of GET /students/<id>/dashboard
+app.config['DASHBOARD_WORKERS'] = int(os.environ.get('DASHBOARD_WORKERS', 8))  # shared by all requests
+app.config['DASHBOARD_TIMEOUT_MS'] = int(os.environ.get('DASHBOARD_TIMEOUT_MS', 2000))  # per section
+app.config['MAX_GRADE_BATCH'] = 1000  # Entries accepted by POST /assignments/<id>/grades
+app.config['MAX_BULK_ENROLLMENTS'] = 100000  # Pairs accepted by POST /enrollments/bulk
+app.config['ENROLL_BATCH_SIZE'] = 1000  # Rows per multi-row INSERT
+app.config['DB_HOST'] = os.environ.get('DB_HOST', 'localhost')
+app.config['DB_PORT'] = int(os.environ.get('DB_PORT', 3306))
+app.config['DB_USER'] = os.environ.get('DB_USER', 'root')
+app.config['DB_PASSWORD'] = os.environ.get('DB_PASSWORD', '')
+app.config['DB_NAME'] = os.environ.get('DB_NAME', 'course_management')
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+app.config['DB_POOL_MAX_OVERFLOW'] = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 3600))
+app.config['DB_POOL_PING_INTERVAL'] = float(os.environ.get('DB_POOL_PING_INTERVAL', 0))
+# Dashboards whose sections may take extra connections at once; each holds up to four.
+# Past the cap a dashboard runs its sections on its own connection, one after another
+app.config['DASHBOARD_MAX_CONCURRENT'] = int(os.environ.get('DASHBOARD_MAX_CONCURRENT',
+                                                            max(1, app.config['DB_POOL_SIZE'] // 4)))
+app.config['DB_REPLICAS'] = os.environ.get('DB_REPLICAS', '')  # host:port,host:port; reads only
+app.config['DB_REPLICA_SELECTION'] = os.environ.get('DB_REPLICA_SELECTION', 'round_robin')  # or least_busy
+app.config['DB_REPLICA_MAX_LAG'] = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))  # seconds; beyond: primary
+app.config['DB_REPLICA_CHECK_INTERVAL'] = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 2))
+app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'memory')  # memory | sqlite | none
+app.config['CACHE_TTL'] = int(os.environ.get('CACHE_TTL', 60))
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+app.config['CACHE_PATH'] = os.environ.get('CACHE_PATH', os.path.join('cache', 'responses.sqlite'))
+app.config['JOBS_PATH'] = os.environ.get('JOBS_PATH', os.path.join('jobs', 'jobs.sqlite'))
+app.config['JOBS_WORKERS'] = int(os.environ.get('JOBS_WORKERS', 2))  # 0: run `flask run-jobs` separately
+app.config['JOBS_MAX_ATTEMPTS'] = int(os.environ.get('JOBS_MAX_ATTEMPTS', 5))
+app.config['OUTBOX_RELAY_SECONDS'] = int(os.environ.get('OUTBOX_RELAY_SECONDS', 30))  # sweep for unrelayed jobs
+app.config['SEARCH_INDEX_PATH'] = os.environ.get('SEARCH_INDEX_PATH', 'search_index')
+app.config['SEARCH_MAX_RESULTS'] = 50  # Cap for ?limit= on GET /courses/<id>/search
+app.config['MEMBERSHIP_RELOAD_SECONDS'] = int(os.environ.get('MEMBERSHIP_RELOAD_SECONDS', 3600))  # 0: build once
+app.config['ASYNC_DB_POOL_MIN'] = int(os.environ.get('ASYNC_DB_POOL_MIN', 5))  # asgi_app.py only
+app.config['ASYNC_DB_POOL_SIZE'] = int(os.environ.get('ASYNC_DB_POOL_SIZE', 50))
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'  # query/route timing for /metrics
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 200))
+# Client addresses allowed to read /metrics and the stats endpoints without an admin
+# token, e.g. a Prometheus scraper; only meaningful when it connects directly, not
+# through a reverse proxy (whose address every request would then carry)
+app.config['METRICS_SCRAPE_ADDRS'] = {addr.strip() for addr in os.environ.get('METRICS_SCRAPE_ADDRS', '').split(',')
+                                      if addr.strip()}
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING') == '1'  # per-response db/app timing header
+app.config['COMPRESS_ENABLED'] = os.environ.get('COMPRESS_ENABLED', '1') == '1'  # gzip/br by Accept-Encoding
+app.config['COMPRESS_MIN_BYTES'] = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))  # smaller bodies sent as is
+app.config['GZIP_LEVEL'] = int(os.environ.get('GZIP_LEVEL', 6))
+app.config['BROTLI_QUALITY'] = int(os.environ.get('BROTLI_QUALITY', 4))
+app.json = FastJSONProvider(app)  # orjson with Flask's date/Decimal formats (serialization.py)
 jwt = JWTManager(app)
+app.use_x_sendfile = app.config['USE_X_SENDFILE']
+file_store = FileStore(app.config['UPLOAD_FOLDER'], app.config['UPLOAD_MAX_BYTES'])
 
 # ==============================================
 # Database Connection Manager
 # ==============================================
-def get_db():
+# Writes go to the primary (DB_HOST). GET requests read from a replica in
+# DB_REPLICAS, when one is configured and keeping up, unless the user made a
+# write in the last few seconds: then they stay on the primary to see it.
+# Reads that fill the response cache use the primary too (response_cache.py).
+# That memory is per process, so behind a load balancer without sticky
+# sessions a read can still land on a lagging replica via another worker.
+_db_pool = None
+_db_router = None
+_db_pool_lock = threading.Lock()
+
+def _new_pool(host, port):
+    return ConnectionPool(
+        {
+            "host": host,
+            "port": port,
+            "user": app.config['DB_USER'],
+            "password": app.config['DB_PASSWORD'],
+            "database": app.config['DB_NAME'],
+            "autocommit": False  # We'll manage commits manually
+        },
+        size=app.config['DB_POOL_SIZE'],
+        max_overflow=app.config['DB_POOL_MAX_OVERFLOW'],
+        timeout=app.config['DB_POOL_TIMEOUT'],
+        recycle=app.config['DB_POOL_RECYCLE'],
+        ping_interval=app.config['DB_POOL_PING_INTERVAL'],
+        logger=app.logger
+    )
+
+def get_pool():
+    """Create the primary connection pool on first use"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = _new_pool(app.config['DB_HOST'], app.config['DB_PORT'])
+    return _db_pool
+
+def get_router():
+    """Create the primary/replica router on first use"""
+    global _db_router
+    if _db_router is None:
+        primary = get_pool()
+        with _db_pool_lock:
+            if _db_router is None:
+                replicas = {}
+                for endpoint in filter(None, (part.strip() for part in app.config['DB_REPLICAS'].split(','))):
+                    host, _, port = endpoint.partition(':')
+                    replicas[endpoint] = _new_pool(host, int(port or 3306))
+                _db_router = ReplicaSet(primary, replicas, selection=app.config['DB_REPLICA_SELECTION'],
+                                        max_lag=app.config['DB_REPLICA_MAX_LAG'],
+                                        check_interval=app.config['DB_REPLICA_CHECK_INTERVAL'],
+                                        logger=app.logger)
+    return _db_router
+
+def current_writer():
+    """The signed-in user's id, if authorize() has identified one"""
+    if not has_request_context():
+        return None
+    identity = g.get('identity')
+    return identity['user_id'] if identity else None
+
+def reads_from_replica():
+    """Whether the current request's queries may go to a replica. Not when they
+    fill the response cache: the entry is stored under the tag versions after
+    a write and must not be built from a replica that lacks it."""
+    return (has_request_context() and request.method in ('GET', 'HEAD')
+            and not g.get('response_cache_fill'))
+
+def get_db(read_only=None, writer=None, timeout=None):
+    """Check out a pooled connection; close() returns it to the pool
+
+    read_only connections may come from a replica; it defaults to
+    reads_from_replica(), so outside a request (CLI, jobs) it is the
+    primary. `writer` (default: current_writer()) is whose writes the
+    reads must see. `timeout` overrides DB_POOL_TIMEOUT for this checkout.
+    """
+    if read_only is None:
+        read_only = reads_from_replica()
+    if writer is None:
+        writer = current_writer()
     try:
-        return mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="course_management",
-            autocommit=False  # We'll manage commits manually
-        )
+        if not app.config['METRICS_ENABLED']:
+            return get_router().connect(read_only, writer, timeout)
+        started = time.perf_counter()
+        db = get_router().connect(read_only, writer, timeout)
+        metrics.record_checkout(time.perf_counter() - started)
+        return metrics.wrap(db)
     except Error as e:
         app.logger.error(f"Database connection failed: {str(e)}")
         raise
 
+def get_pool_stats():
+    """Connection pool counters (in use, waiting, checkout latency, ...)"""
+    return get_pool().stats()
+
+def get_routing_stats():
+    """Primary/replica routing counters and each replica's lag"""
+    return get_router().stats()
+
+# ==============================================
+# Metrics
+# ==============================================
+# Per-query latency/rows by statement fingerprint, per-route request timing
+# and a slow-query log, exported at /metrics. With METRICS_ENABLED=0 no
+# hooks are registered and connections are not wrapped.
+metrics = Metrics(slow_query_ms=app.config['SLOW_QUERY_MS'], logger=app.logger)
+if app.config['METRICS_ENABLED']:
+    metrics.init_app(app, server_timing=app.config['SERVER_TIMING'])
+    # Registry queries run on prepared cursors the instrumented connection never sees
+    queries.on_execute(lambda name, sql, seconds, rows, failed:
+                       metrics.record_query(sql, seconds, rows, failed))
+
+# ==============================================
+# Response Compression
+# ==============================================
+# Registered after the metrics hooks, so request timings include it
+compressor = Compressor(min_bytes=app.config['COMPRESS_MIN_BYTES'], gzip_level=app.config['GZIP_LEVEL'],
+                        brotli_quality=app.config['BROTLI_QUALITY'])
+if app.config['COMPRESS_ENABLED']:
+    compressor.init_app(app)
+
+# ==============================================
+# Response Cache
+# ==============================================
+# Public GET routes are cached by path, query string and the version of the
+# tags they read; writes bump those versions after a successful commit.
+if app.config['CACHE_BACKEND'] == 'sqlite':
+    _cache_store = SqliteStore(app.config['CACHE_PATH'], app.config['CACHE_MAX_ENTRIES'])
+else:
+    _cache_store = MemoryStore(app.config['CACHE_MAX_ENTRIES'])
+cache = ResponseCache(_cache_store, ttl=app.config['CACHE_TTL'],
+                      enabled=app.config['CACHE_BACKEND'] != 'none')
+
+def course_listing_tags(args=None):
+    """Tags for GET /courses; the ?student_id= listing also depends on enrollments"""
+    student_id = (request.args if args is None else args).get('student_id')
+    return ["courses", f"student:{student_id}:courses"] if student_id else ["courses"]
+
+# ==============================================
+# Background Jobs
+# ==============================================
+# Follow-up work that does not have to finish inside the request: routes
+# stage it in their own transaction with queue_after_commit(), and it is
+# moved to the queue once their write commits (see jobs.py, Outbox).
+jobs = JobQueue(app.config['JOBS_PATH'], workers=app.config['JOBS_WORKERS'],
+                max_attempts=app.config['JOBS_MAX_ATTEMPTS'], logger=app.logger)
+
+def on_commit(func):
+    """Run func after the current handle_db_operation() commits; dropped on rollback"""
+    g.setdefault('on_commit', []).append(func)
+
+def run_job_transaction(callback):
+    """Run callback(cursor) in its own transaction; errors propagate so the job retries"""
+    db = get_db()
+    cursor = None
+    try:
+        cursor = db.cursor(dictionary=True)
+        callback(cursor)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if cursor:
+            cursor.close()
+        db.close()
+
+@jobs.handler('refresh_gpa')
+def refresh_gpa_job(payload):
+    run_job_transaction(lambda cursor: grading.refresh_gpa(cursor, [payload['student_id']]))
+
+@jobs.handler('refresh_enrollment_stats')
+def refresh_enrollment_stats_job(payload):
+    run_job_transaction(lambda cursor: reports.refresh_enrollment_stats(
+        cursor, payload['student_ids'], payload['course_ids']))
+
+@jobs.periodic(app.config['OUTBOX_RELAY_SECONDS'])
+def relay_outbox():
+    """Queue the jobs staged in job_outbox by committed transactions"""
+    run_job_transaction(jobs.relay)
+
+def queue_after_commit(cursor, name, entries):
+    """Stage [(payload, key), ...] in the current transaction; relayed once it commits,
+    or by the periodic relay_outbox if this process dies first"""
+    jobs.stage(cursor, name, entries)
+    if relay_outbox not in g.get('on_commit', []):
+        on_commit(relay_outbox)
+
+def pending_jobs(cursor, name):
+    """`name` jobs queued, running or still staged in job_outbox"""
+    return jobs.pending(name) + jobs.staged(cursor, name)
+
+def enqueue_gpa_refresh(cursor, student_ids):
+    """One pending GPA refresh per student, however many grades changed"""
+    queue_after_commit(cursor, 'refresh_gpa', [({"student_id": student_id}, f"gpa:{student_id}")
+                                               for student_id in student_ids])
+
+# ==============================================
+# Search Index
+# ==============================================
+# Course content and forum threads, searched without touching MySQL (see
+# search_index.py). Routes add new documents once their insert commits;
+# `flask build-search-index` indexes existing rows and folds in the journal.
+_search = None
+_search_lock = threading.Lock()
+
+def get_search():
+    """Open the search index on first use"""
+    global _search
+    if _search is None:
+        with _search_lock:
+            if _search is None:
+                index = search_index.SearchIndex(app.config['SEARCH_INDEX_PATH'], logger=app.logger)
+                index.open()
+                _search = index
+    return _search
+
+# ==============================================
+# Authorization
+# ==============================================
+# Course-scoped routes serve the course's lecturer, its enrolled students
+# and admins. Membership comes from an in-memory index built in the
+# background from the first request on and kept current by the write
+# routes; whatever it does not know yet is looked up in the database and
+# remembered.
+memberships = membership.MembershipIndex()
+_memberships_loading = threading.Lock()
+_memberships_attempted = None
+
+def _load_memberships():
+    try:
+        db = get_db(read_only=True)
+        cursor = None
+        try:
+            cursor = db.cursor(buffered=False)
+            memberships.load(cursor)
+            app.logger.info(f"Membership index built in {memberships.load_ms}ms")
+        finally:
+            if cursor:
+                cursor.close()
+            db.close()
+    except Exception as e:
+        app.logger.warning(f"Membership index not built, using database checks: {str(e)}")
+    finally:
+        _memberships_loading.release()
+
+def refresh_memberships():
+    """Start a background (re)build if none has run, the last one failed 30s+ ago,
+    or the index is older than MEMBERSHIP_RELOAD_SECONDS"""
+    global _memberships_attempted
+    now = time.monotonic()
+    if _memberships_attempted is not None:
+        interval = app.config['MEMBERSHIP_RELOAD_SECONDS'] if memberships.ready else 30
+        if (memberships.ready and not interval) or now - _memberships_attempted < interval:
+            return
+    if not _memberships_loading.acquire(blocking=False):
+        return
+    _memberships_attempted = now
+    threading.Thread(target=_load_memberships, name="membership-index", daemon=True).start()
+
+def fetch_one(query, params):
+    """First row of a query, as a tuple, for checks made before handle_db_operation()"""
+    db = get_db()
+    cursor = None
+    try:
+        cursor = db.cursor()
+        cursor.execute(query, params)
+        return cursor.fetchone()
+    finally:
+        if cursor:
+            cursor.close()
+        db.close()
+
+def forum_course(forum_id):
+    """The course a forum belongs to, or None if there is no such forum"""
+    course_id = memberships.course_of_forum(forum_id)
+    if course_id is None:
+        row = fetch_one(membership.FORUM_QUERY, (forum_id,))
+        if row is None:
+            return None
+        course_id = row[0]
+        memberships.set_forum(forum_id, course_id)
+    return course_id
+
+def can_access_course(identity, course_id):
+    """Admins, the course's lecturer and its enrolled students"""
+    allowed = memberships.can_access(identity, course_id)
+    if allowed is None:
+        allowed = memberships.learn(identity, course_id, fetch_one(*memberships.fallback(identity, course_id)))
+    return allowed
+
+def authorize(*roles, scope=None):
+    """Require a JWT, one of `roles` (any role if none) and, optionally, access
+    to the resource in the URL: scope='course' (<course_id>), 'forum'
+    (<forum_id>'s course) or 'student' (students only see their own
+    <student_id>). The identity is decoded once and kept in g.identity.
+    """
+    def decorator(view):
+        @wraps(view)
+        @jwt_required()
+        def wrapper(**kwargs):
+            identity = g.identity = get_jwt_identity()
+            if roles and identity['role'] not in roles:
+                return jsonify({"error": "Insufficient permissions"}), 403
+            if scope == 'student':
+                allowed = identity['role'] != 'student' or identity['user_id'] == kwargs['student_id']
+            elif scope:
+                refresh_memberships()
+                course_id = kwargs['course_id'] if scope == 'course' else forum_course(kwargs['forum_id'])
+                if course_id is None:
+                    return jsonify({"error": "Resource not found"}), 404
+                allowed = can_access_course(identity, course_id)
+            else:
+                allowed = True
+            if not allowed:
+                return jsonify({"error": "Insufficient permissions"}), 403
+            return view(**kwargs)
+        return wrapper
+    return decorator
+
+def monitoring(view):
+    """Operator endpoints: admins, or METRICS_SCRAPE_ADDRS without a token"""
+    admin_view = authorize('admin')(view)
+
+    @wraps(view)
+    def wrapper(**kwargs):
+        if request.remote_addr in app.config['METRICS_SCRAPE_ADDRS']:
+            return view(**kwargs)
+        return admin_view(**kwargs)
+    return wrapper
+
+@app.before_request
+def start_membership_index():
+    """Build the membership index once the app serves, not when it is imported"""
+    refresh_memberships()
+
+@app.before_request
+def start_job_workers():
+    """Start the job workers (and with them relay_outbox) once the app serves"""
+    jobs.start()
+
 # ==============================================
 # Helper Functions
 # ==============================================
-def validate_role(required_roles):
-    """Check if user has required role"""
-    current_role = get_jwt_identity()['role']
-    if current_role not in required_roles:
-        return jsonify({"error": "Insufficient permissions"}), 403
-    return None
+def rollback(db):
+    """Undo a failed handle_db_operation() and drop its after-commit hooks"""
+    g.pop('on_commit', None)
+    if db:
+        db.rollback()
+        if app.config['METRICS_ENABLED']:
+            metrics.record_transaction("rollback")
 
 def handle_db_operation(callback, success_message, status_code=200):
     """Handle database operations with proper error handling"""
     db = None
+    cursor = None
     try:
         db = get_db()
         cursor = db.cursor(dictionary=True)
         result = callback(db, cursor)
         db.commit()
+        if app.config['METRICS_ENABLED']:
+            metrics.record_transaction("commit")
+        if not reads_from_replica() and current_writer() is not None:
+            get_router().record_write(current_writer())  # read-your-writes
+        for func in g.pop('on_commit', []):
+            try:
+                func()
+            except Exception as e:  # the write itself has committed
+                app.logger.error(f"After-commit hook failed: {str(e)}")
+        if hasattr(result, 'envelope'):
+            # Results like Page/Report carry extra top-level fields
+            data, extra = result.envelope()
+            return jsonify({"message": success_message, "data": data, **extra}), status_code
         return jsonify({"message": success_message, "data": result}), status_code
     except Error as e:
-        if db: db.rollback()
+        rollback(db)
         app.logger.error(f"Database error: {str(e)}")
         return jsonify({"error": "Database operation failed"}), 500
+    except (InvalidCursor, InvalidParameter, NotFound):
+        rollback(db)
+        raise  # 400/404 via the error handlers below
     except Exception as e:
-        if db: db.rollback()
+        rollback(db)
         app.logger.error(f"Unexpected error: {str(e)}")
         return jsonify({"error": "Operation failed"}), 500
     finally:
-        if db and db.is_connected():
-            cursor.close()
+        if cursor:
+            try:
+                cursor.close()
+            except Error:
+                pass
+        if db:
+            db.close()  # back to the pool
+
+def date_range_args(args=None):
+    """(start, end) from ?from=/?to= (or ?date=) as a half-open [start, end) range
+
+    `to` is inclusive for callers, so end is the day after it. Raises
+    ValueError for dates that are not YYYY-MM-DD. `args` defaults to the
+    current request's query parameters.
+    """
+    args = request.args if args is None else args
+    day = args.get('date')
+    first = args.get('from', day)
+    last = args.get('to', day)
+    start = datetime.strptime(first, '%Y-%m-%d').date() if first else None
+    end = datetime.strptime(last, '%Y-%m-%d').date() + timedelta(days=1) if last else None
+    return start, end
+
+def student_events_query(student_id, start, end):
+    """(registered query name, parameters) for a student's events from `start`
+    and/or before `end`, as returned by date_range_args()"""
+    params = {"student_id": student_id}
+    if start and end:
+        return "event.by_student_between", {**params, "start": start, "end": end}
+    elif start:
+        return "event.by_student_from", {**params, "start": start}
+    elif end:
+        return "event.by_student_until", {**params, "end": end}
+    return "event.by_student", params
+
+def export_format():
+    """'json' or 'ndjson' if the client asked for a streamed export, else None"""
+    export = request.args.get('export')
+    if export in ('json', 'ndjson'):
+        return export
+    if request.accept_mimetypes.best == 'application/x-ndjson':
+        return 'ndjson'
+    return None
+
+def stream_db_operation(callback, success_message, ndjson=False, status_code=200):
+    """Stream a query's rows to the client as they arrive from MySQL.
+
+    The callback executes its query on an unbuffered cursor and returns an
+    iterable of rows (usually the cursor itself). The query runs before the
+    response starts, so SQL errors still return a 500 like
+    handle_db_operation. A failure halfway through can't change the status
+    any more, so it is reported inside the body instead.
+    """
+    db = None
+    cursor = None
+
+    state = {"finished": False, "closed": False}
+
+    def cleanup(discard=False):
+        if state["closed"]:
+            return
+        state["closed"] = True
+        if cursor:
+            try:
+                cursor.close()
+            except Error:
+                discard = True
+        if db:
+            if discard:
+                db.invalidate()  # cheaper than draining the rest of the result
             db.close()
 
+    try:
+        db = get_db()
+        cursor = db.cursor(dictionary=True, buffered=False)
+        rows = iter(callback(db, cursor))
+        first = next(rows, None)
+    except Error as e:
+        if db: db.rollback()
+        cleanup(discard=True)
+        app.logger.error(f"Database error: {str(e)}")
+        return jsonify({"error": "Database operation failed"}), 500
+    except Exception as e:
+        if db: db.rollback()
+        cleanup(discard=True)
+        app.logger.error(f"Unexpected error: {str(e)}")
+        return jsonify({"error": "Operation failed"}), 500
+
+    batch_rows = app.config['STREAM_BATCH_ROWS']
+
+    def generate():
+        try:
+            if not ndjson:
+                yield '{"message": %s, "data": [' % json.dumps(success_message)
+            chunk = []
+            separator = ""
+            row = first
+            while row is not None:
+                if ndjson:
+                    chunk.append(json.dumps(row) + "\n")
+                else:
+                    chunk.append(separator + json.dumps(row))
+                    separator = ","
+                if len(chunk) >= batch_rows:
+                    yield "".join(chunk)
+                    chunk = []
+                row = next(rows, None)
+            if chunk:
+                yield "".join(chunk)
+            db.commit()
+            state["finished"] = True
+            if not ndjson:
+                yield ']}'
+        except Exception as e:
+            db.rollback()
+            app.logger.error(f"Streaming error: {str(e)}")
+            if ndjson:
+                yield json.dumps({"error": "Database operation failed"}) + "\n"
+            else:
+                yield '], "error": "Database operation failed"}'
+
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    response = Response(stream_with_context(generate()), status=status_code, mimetype=mimetype)
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let a proxy buffer the stream
+    # Runs when the response is closed, including when the client disconnects
+    # mid-stream, so the connection always goes back to the pool
+    response.call_on_close(lambda: cleanup(discard=not state["finished"]))
+    return response
+
 # ==============================================
 # 1. AUTHENTICATION ENDPOINTS
 # ==============================================
@@ -74,10 +625,8 @@ def register():
         return jsonify({"error": "Invalid role"}), 400
 
     def db_op(db, cursor):
-        cursor.execute(
-            "INSERT INTO user (user_id, name, email, password, role) VALUES (%s, %s, %s, %s, %s)",
-            (data['user_id'], data['name'], data['email'], data['password'], data['role'])
-        )
+        queries.run(db, "user.create", user_id=data['user_id'], name=data['name'], email=data['email'],
+                    password=data['password'], role=data['role'])
         return {"user_id": data['user_id']}
 
     return handle_db_operation(db_op, "User registered", 201)
@@ -88,11 +637,7 @@ def login():
     data = request.get_json()
     
     def db_op(db, cursor):
-        cursor.execute(
-            "SELECT user_id, role FROM user WHERE email = %s AND password = %s",
-            (data['email'], data['password'])
-        )
-        user = cursor.fetchone()
+        user = queries.run(db, "user.login", email=data['email'], password=data['password'])
         if not user:
             raise ValueError("Invalid credentials")
         return create_access_token(identity={'user_id': user['user_id'], 'role': user['role']})
@@ -107,63 +652,52 @@ def login():
 # 2. COURSE MANAGEMENT ENDPOINTS
 # ==============================================
 @app.route('/courses', methods=['POST'])
-@jwt_required()
+@authorize('admin')
 def create_course():
     """Create a course (admin only)"""
-    if validate_role(['admin']):
-        return validate_role(['admin'])
-    
     data = request.get_json()
 
     def db_op(db, cursor):
-        cursor.execute(
-            "INSERT INTO course (course_id, name, lecturer_id) VALUES (%s, %s, %s)",
-            (data['course_id'], data['name'], data['lecturer_id'])
-        )
+        queries.run(db, "course.create", course_id=data['course_id'], name=data['name'],
+                    lecturer_id=data['lecturer_id'])
+        on_commit(lambda: memberships.set_lecturer(data['course_id'], data['lecturer_id']))
         return {"course_id": data['course_id']}
 
-    return handle_db_operation(db_op, "Course created", 201)
+    return cache.invalidate_on_success(handle_db_operation(db_op, "Course created", 201), "courses")
 
 @app.route('/courses/<int:course_id>/members', methods=['GET'])
-@jwt_required()
+@authorize(scope='course')
 def get_course_members(course_id):
-    """Get all students enrolled in a course"""
+    """Get students enrolled in a course, one page at a time (?cursor=, ?limit=),
+    or all of them as a streamed export (?export=json|ndjson)"""
+    export = export_format()
+    if export:
+        def stream_op(db, cursor):
+            return queries.stream(cursor, "course.members", order_by="sc.student_id", course_id=course_id)
+
+        return stream_db_operation(stream_op, "Course members retrieved", ndjson=export == 'ndjson')
+
+    after, limit = page_args()
+
     def db_op(db, cursor):
-        cursor.execute("""
-            SELECT u.user_id, u.name, u.email 
-            FROM user u
-            JOIN student_course sc ON u.user_id = sc.student_id
-            WHERE sc.course_id = %s
-        """, (course_id,))
-        return cursor.fetchall()
+        return queries.page(db, "course.members", after, limit, course_id=course_id)
 
     return handle_db_operation(db_op, "Course members retrieved")
 
 @app.route('/courses', methods=['GET'])
+@cache.cached(course_listing_tags)
 def get_courses():
-    """Get all courses, or filter by student/lecturer"""
+    """Get all courses, or filter by student/lecturer (?cursor=, ?limit=)"""
     lecturer_id = request.args.get('lecturer_id')
     student_id = request.args.get('student_id')
-    page = request.args.get('page', 1, type=int)
-    limit = request.args.get('limit', 10, type=int)
-    offset = (page - 1) * limit
+    after, limit = page_args(default_limit=10)
 
     def db_op(db, cursor):
         if lecturer_id:
-            cursor.execute(
-                "SELECT * FROM course WHERE lecturer_id = %s LIMIT %s OFFSET %s",
-                (lecturer_id, limit, offset)
-            )
+            return queries.page(db, "course.by_lecturer", after, limit, lecturer_id=lecturer_id)
         elif student_id:
-            cursor.execute(
-                """SELECT c.* FROM course c 
-                JOIN student_course sc ON c.course_id = sc.course_id 
-                WHERE sc.student_id = %s LIMIT %s OFFSET %s""",
-                (student_id, limit, offset)
-            )
-        else:
-            cursor.execute("SELECT * FROM course LIMIT %s OFFSET %s", (limit, offset))
-        return cursor.fetchall()
+            return queries.page(db, "course.by_student", after, limit, student_id=student_id)
+        return queries.page(db, "course.list", after, limit)
 
     return handle_db_operation(db_op, "Courses retrieved")
 
@@ -171,84 +705,112 @@ def get_courses():
 # 3. ENROLLMENT ENDPOINTS
 # ==============================================
 @app.route('/courses/<int:course_id>/enroll', methods=['POST'])
-@jwt_required()
+@authorize()
 def enroll(course_id):
     """Enroll a student in a course"""
-    student_id = get_jwt_identity()['user_id']
+    student_id = g.identity['user_id']
 
     def db_op(db, cursor):
-        # Check if already enrolled
-        cursor.execute(
-            "SELECT 1 FROM student_course WHERE student_id = %s AND course_id = %s",
-            (student_id, course_id)
-        )
-        if cursor.fetchone():
+        if not enrollment.enroll_one(cursor, student_id, course_id):
             raise ValueError("Already enrolled")
-
-        cursor.execute(
-            "INSERT INTO student_course (student_id, course_id) VALUES (%s, %s)",
-            (student_id, course_id)
-        )
+        on_commit(lambda: memberships.add(student_id, course_id))
         return {"student_id": student_id, "course_id": course_id}
 
-    return handle_db_operation(db_op, "Enrollment successful", 201)
+    return cache.invalidate_on_success(handle_db_operation(db_op, "Enrollment successful", 201),
+                                       f"student:{student_id}:courses")
+
+@app.route('/enrollments/bulk', methods=['POST'])
+@authorize('admin')
+def bulk_enroll():
+    """Enroll many students at once (admin only)
+
+    Accepts {"enrollments": [{"student_id": ..., "course_id": ...}, ...]},
+    or a CSV with a student_id,course_id header, either uploaded as `file`
+    or sent as a text/csv body.
+    """
+    try:
+        if 'file' in request.files:
+            pairs, errors = enrollment.parse_csv(request.files['file'].read().decode('utf-8-sig'))
+        elif request.mimetype == 'text/csv':
+            pairs, errors = enrollment.parse_csv(request.get_data(as_text=True))
+        else:
+            data = request.get_json(silent=True) or {}
+            entries = data.get('enrollments') if isinstance(data, dict) else None
+            if not isinstance(entries, list):
+                raise ValueError("Expected {\"enrollments\": [...]} or a CSV file")
+            pairs, errors = enrollment.parse_pairs(entries)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not pairs and not errors:
+        return jsonify({"error": "No enrollments given"}), 400
+    if len(pairs) + len(errors) > app.config['MAX_BULK_ENROLLMENTS']:
+        return jsonify({"error": f"At most {app.config['MAX_BULK_ENROLLMENTS']} enrollments per request"}), 400
+
+    def db_op(db, cursor):
+        batch = enrollment.enroll_many(cursor, pairs, errors, app.config['ENROLL_BATCH_SIZE'])
+        on_commit(lambda: memberships.add_many(batch.enrolled))
+        if batch.inserted:
+            queue_after_commit(cursor, 'refresh_enrollment_stats', [(
+                {"student_ids": batch.students, "course_ids": batch.courses}, None)])
+        return batch
+
+    return cache.invalidate_on_success(handle_db_operation(db_op, "Bulk enrollment complete"),
+                                       *{f"student:{student_id}:courses" for student_id, _ in pairs})
 
 # ==============================================
 # 4. CALENDAR EVENT ENDPOINTS
 # ==============================================
 @app.route('/courses/<int:course_id>/events', methods=['POST'])
-@jwt_required()
+@authorize('admin', 'lecturer', scope='course')
 def create_calendar_event(course_id):
-    """Create a calendar event for a course (lecturer/admin only)"""
-    if validate_role(['admin', 'lecturer']):
-        return validate_role(['admin', 'lecturer'])
-    
+    """Create a calendar event for a course (its lecturer or an admin)"""
     data = request.get_json()
 
     def db_op(db, cursor):
-        cursor.execute(
-            """INSERT INTO calendar_event 
-               (course_id, title, description, event_date, created_by) 
-               VALUES (%s, %s, %s, %s, %s)""",
-            (course_id, data['title'], data['description'], 
-             data['event_date'], get_jwt_identity()['user_id'])
-        )
-        return {"event_id": cursor.lastrowid}
+        event = queries.run(db, "event.create", course_id=course_id, title=data['title'],
+                            description=data['description'], event_date=data['event_date'],
+                            created_by=g.identity['user_id'])
+        return {"event_id": event.lastrowid}
 
-    return handle_db_operation(db_op, "Event created", 201)
+    return cache.invalidate_on_success(handle_db_operation(db_op, "Event created", 201),
+                                       f"course:{course_id}:events")
 
 @app.route('/courses/<int:course_id>/events', methods=['GET'])
+@cache.cached(lambda course_id: [f"course:{course_id}:events"])
 def get_course_events(course_id):
-    """Get all events for a course"""
+    """Get events for a course in date order (?cursor=, ?limit=)"""
+    after, limit = page_args()
+
     def db_op(db, cursor):
-        cursor.execute(
-            "SELECT * FROM calendar_event WHERE course_id = %s",
-            (course_id,)
-        )
-        return cursor.fetchall()
+        return queries.page(db, "event.by_course", after, limit, course_id=course_id)
 
     return handle_db_operation(db_op, "Events retrieved")
 
 @app.route('/students/<int:student_id>/events', methods=['GET'])
-@jwt_required()
+@authorize(scope='student')
 def get_student_events(student_id):
-    """Get events for a student on a specific date"""
-    date = request.args.get('date')  # Expected format: YYYY-MM-DD
+    """Get events for a student, optionally within ?from=/?to= dates (inclusive,
+    YYYY-MM-DD; ?date= is shorthand for a single day), one page at a time
+    (?cursor=, ?limit=), or as a streamed export (?export=json|ndjson)"""
+    try:
+        start, end = date_range_args()
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+
+    name, params = student_events_query(student_id, start, end)
+
+    export = export_format()
+    if export:
+        def stream_op(db, cursor):
+            return queries.stream(cursor, name, order_by="ce.event_date, ce.event_id", **params)
+
+        return stream_db_operation(stream_op, "Student events retrieved", ndjson=export == 'ndjson')
+
+    after, limit = page_args()
 
     def db_op(db, cursor):
-        query = """
-            SELECT ce.* FROM calendar_event ce
-            JOIN student_course sc ON ce.course_id = sc.course_id
-            WHERE sc.student_id = %s
-        """
-        params = [student_id]
-        
-        if date:
-            query += " AND DATE(ce.event_date) = %s"
-            params.append(date)
-            
-        cursor.execute(query, tuple(params))
-        return cursor.fetchall()
+        return queries.page(db, name, after, limit, **params)
 
     return handle_db_operation(db_op, "Student events retrieved")
 
@@ -256,62 +818,73 @@ def get_student_events(student_id):
 # 5. FORUM ENDPOINTS
 # ==============================================
 @app.route('/courses/<int:course_id>/forums', methods=['POST'])
-@jwt_required()
+@authorize('admin', 'lecturer', scope='course')
 def create_forum(course_id):
-    """Create a forum for a course (lecturer/admin only)"""
-    if validate_role(['admin', 'lecturer']):
-        return validate_role(['admin', 'lecturer'])
-    
+    """Create a forum for a course (its lecturer or an admin)"""
     data = request.get_json()
 
     def db_op(db, cursor):
-        cursor.execute(
-            "INSERT INTO forum (course_id, name) VALUES (%s, %s)",
-            (course_id, data['name'])
-        )
-        return {"forum_id": cursor.lastrowid}
+        forum_id = queries.run(db, "forum.create", course_id=course_id, name=data['name']).lastrowid
+        on_commit(lambda: memberships.set_forum(forum_id, course_id))
+        return {"forum_id": forum_id}
 
-    return handle_db_operation(db_op, "Forum created", 201)
+    return cache.invalidate_on_success(handle_db_operation(db_op, "Forum created", 201),
+                                       f"course:{course_id}:forums")
 
 @app.route('/courses/<int:course_id>/forums', methods=['GET'])
+@authorize(scope='course')
+@cache.cached(lambda course_id: [f"course:{course_id}:forums"])
 def get_course_forums(course_id):
     """Get all forums for a course"""
     def db_op(db, cursor):
-        cursor.execute(
-            "SELECT * FROM forum WHERE course_id = %s",
-            (course_id,)
-        )
-        return cursor.fetchall()
+        return queries.run(db, "forum.by_course", course_id=course_id)
 
     return handle_db_operation(db_op, "Forums retrieved")
 
 @app.route('/forums/<int:forum_id>/threads', methods=['GET'])
+@authorize(scope='forum')
 def get_forum_threads(forum_id):
-    """Get all threads in a forum"""
+    """Get thread summaries in a forum, oldest first (?cursor=, ?limit=): an
+    excerpt of the post, its reply count and last activity"""
+    after, limit = page_args()
+
     def db_op(db, cursor):
-        cursor.execute("""
-            SELECT fp.*, u.name as author_name 
-            FROM forum_post fp
-            JOIN user u ON fp.user_id = u.user_id
-            WHERE fp.forum_id = %s
-        """, (forum_id,))
-        return cursor.fetchall()
+        return queries.page(db, "thread.by_forum", after, limit, forum_id=forum_id)
 
     return handle_db_operation(db_op, "Threads retrieved")
 
+@app.route('/forums/<int:forum_id>/threads/<int:post_id>', methods=['GET'])
+@authorize(scope='forum')
+def get_thread(forum_id, post_id):
+    """Get a thread with its nested replies. Top-level replies are paged
+    (?cursor=, ?limit=); a page holds at most THREAD_MAX_REPLIES replies
+    down to THREAD_MAX_DEPTH levels"""
+    after, limit = page_args()
+    if after is not None and (len(after) != 1 or not isinstance(after[0], int)):
+        raise InvalidCursor(after)
+
+    def db_op(db, cursor):
+        thread = forums.load_thread(cursor, forum_id, post_id, after[0] if after else None, limit,
+                                    app.config['THREAD_MAX_DEPTH'], app.config['THREAD_MAX_REPLIES'])
+        if thread is None:
+            raise NotFound()
+        return thread
+
+    return handle_db_operation(db_op, "Thread retrieved")
+
 @app.route('/forums/<int:forum_id>/threads', methods=['POST'])
-@jwt_required()
+@authorize(scope='forum')
 def create_thread(forum_id):
     """Create a discussion thread in a forum"""
     data = request.get_json()
-    user_id = get_jwt_identity()['user_id']
+    user_id = g.identity['user_id']
 
     def db_op(db, cursor):
-        cursor.execute(
-            "INSERT INTO forum_post (forum_id, user_id, title, post) VALUES (%s, %s, %s, %s)",
-            (forum_id, user_id, data['title'], data['post'])
-        )
-        return {"thread_id": cursor.lastrowid}
+        post_id = queries.run(db, "thread.create", forum_id=forum_id, user_id=user_id,
+                              title=data['title'], post=data['post']).lastrowid
+        course_id = forum_course(forum_id)
+        on_commit(lambda: get_search().add_thread(post_id, forum_id, course_id, data['title'], data['post']))
+        return {"thread_id": post_id}
 
     return handle_db_operation(db_op, "Thread created", 201)
 
@@ -319,151 +892,327 @@ def create_thread(forum_id):
 # 6. COURSE CONTENT ENDPOINTS
 # ==============================================
 @app.route('/courses/<int:course_id>/content', methods=['POST'])
-@jwt_required()
+@authorize('admin', 'lecturer', scope='course')
 def add_course_content(course_id):
-    """Add course content (lecturer/admin only)"""
-    if validate_role(['admin', 'lecturer']):
-        return validate_role(['admin', 'lecturer'])
-    
+    """Add course content (its lecturer or an admin)"""
     data = request.get_json()
 
     def db_op(db, cursor):
-        cursor.execute(
-            """INSERT INTO course_content 
-               (course_id, section, title, content_type, content_url, description) 
-               VALUES (%s, %s, %s, %s, %s, %s)""",
-            (course_id, data['section'], data['title'], 
-             data['content_type'], data.get('content_url'), data.get('description'))
-        )
-        return {"content_id": cursor.lastrowid}
+        content_id = queries.run(db, "content.create", course_id=course_id, section=data['section'],
+                                 title=data['title'], content_type=data['content_type'],
+                                 content_url=data.get('content_url'),
+                                 description=data.get('description')).lastrowid
+        on_commit(lambda: get_search().add_content(content_id, course_id, data['title'],
+                                             f"{data['section']} {data.get('description') or ''}"))
+        return {"content_id": content_id}
 
-    return handle_db_operation(db_op, "Content added", 201)
+    return cache.invalidate_on_success(handle_db_operation(db_op, "Content added", 201),
+                                       f"course:{course_id}:content")
 
 @app.route('/courses/<int:course_id>/content', methods=['GET'])
+@authorize(scope='course')
+@cache.cached(lambda course_id: [f"course:{course_id}:content"])
 def get_course_content(course_id):
-    """Get all content for a course"""
+    """Get content for a course, ordered by section (?cursor=, ?limit=)"""
+    after, limit = page_args()
+
     def db_op(db, cursor):
-        cursor.execute(
-            "SELECT * FROM course_content WHERE course_id = %s ORDER BY section",
-            (course_id,)
-        )
-        return cursor.fetchall()
+        return queries.page(db, "content.by_course", after, limit, course_id=course_id)
 
     return handle_db_operation(db_op, "Course content retrieved")
 
+@app.route('/courses/<int:course_id>/search', methods=['GET'])
+@authorize(scope='course')
+def search_course(course_id):
+    """Ranked search over a course's content and forum threads (?q=, ?limit=).
+    Words also match as prefixes, so partly typed words find results."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Missing search query"}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), app.config['SEARCH_MAX_RESULTS']))
+    return jsonify({"message": "Search results retrieved", "data": get_search().search(query, course_id, limit)}), 200
+
 # ==============================================
 # 7. ASSIGNMENT ENDPOINTS
 # ==============================================
 @app.route('/assignments/<int:assignment_id>/submit', methods=['POST'])
-@jwt_required()
+@authorize()
 def submit_assignment(assignment_id):
-    """Submit an assignment (PDF upload)"""
-    if 'file' not in request.files:
-        return jsonify({"error": "No file uploaded"}), 400
-    
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({"error": "Empty filename"}), 400
+    """Submit an assignment (PDF upload)
+
+    Send the file as multipart `file`, or as the raw body with
+    Content-Type application/pdf (?filename= optional). Resubmitting adds a
+    new submission; identical files are stored once.
+    """
+    # Reject obviously oversized bodies before reading any of them
+    if request.content_length and request.content_length > app.config['UPLOAD_MAX_BYTES'] + 64 * 1024:
+        return jsonify({"error": "File too large"}), 413
 
-    student_id = get_jwt_identity()['user_id']
-    filename = f"assignment_{assignment_id}_student_{student_id}.pdf"
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(filename))
-    file.save(filepath)
+    if request.mimetype in ('application/pdf', 'application/octet-stream'):
+        stream = request.stream
+        filename = request.args.get('filename', '')
+    else:
+        if 'file' not in request.files:
+            return jsonify({"error": "No file uploaded"}), 400
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({"error": "Empty filename"}), 400
+        stream = file.stream
+        filename = file.filename
+
+    student_id = g.identity['user_id']
+    filename = secure_filename(filename) or f"assignment_{assignment_id}_student_{student_id}.pdf"
+    try:
+        stored = file_store.save(stream)
+    except FileTooLarge:
+        return jsonify({"error": "File too large"}), 413
 
     def db_op(db, cursor):
-        cursor.execute(
-            "INSERT INTO assignment_submission (assignment_id, student_id, file_path) VALUES (%s, %s, %s)",
-            (assignment_id, student_id, filepath)
-        )
-        return {"file_path": filepath}
+        submission = queries.run(db, "submission.create", assignment_id=assignment_id, student_id=student_id,
+                                 file_sha256=stored.sha256, file_size=stored.size, file_name=filename)
+        return {"submission_id": submission.lastrowid, "sha256": stored.sha256, "size": stored.size}
 
     return handle_db_operation(db_op, "Assignment submitted", 201)
 
+@app.route('/submissions/<int:submission_id>/file', methods=['GET'])
+@authorize()
+def download_submission(submission_id):
+    """Download a submitted file (its student, the course's lecturer and admins)
+
+    Served straight from disk with Range and If-None-Match support; with
+    USE_X_SENDFILE the front-end server sends the bytes instead of Python.
+    """
+    identity = g.identity
+    db = get_db()
+    try:
+        submission = queries.run(db, "submission.file", submission_id=submission_id)
+    except Error as e:
+        app.logger.error(f"Database error: {str(e)}")
+        return jsonify({"error": "Database operation failed"}), 500
+    finally:
+        db.close()
+
+    if not submission or not submission['file_sha256']:
+        return jsonify({"error": "Resource not found"}), 404
+    if identity['role'] == 'student':
+        allowed = identity['user_id'] == submission['student_id']
+    else:
+        allowed = can_access_course(identity, submission['course_id'])
+    if not allowed:
+        return jsonify({"error": "Insufficient permissions"}), 403
+    if not file_store.exists(submission['file_sha256']):
+        app.logger.error(f"Missing file {submission['file_sha256']} for submission {submission_id}")
+        return jsonify({"error": "Resource not found"}), 404
+
+    return send_file(
+        file_store.path(submission['file_sha256']),
+        mimetype='application/pdf',
+        download_name=submission['file_name'] or f"submission_{submission_id}.pdf",
+        conditional=True,
+        etag=submission['file_sha256'],
+        max_age=3600
+    )
+
 @app.route('/assignments/<int:assignment_id>/grade', methods=['POST'])
-@jwt_required()
+@authorize('admin', 'lecturer')
 def grade_assignment(assignment_id):
     """Grade an assignment (lecturer only)"""
-    if validate_role(['admin', 'lecturer']):
-        return validate_role(['admin', 'lecturer'])
-    
     data = request.get_json()
 
     def db_op(db, cursor):
-        # Update grade
-        cursor.execute(
-            """UPDATE assignment_submission 
-               SET grade = %s 
-               WHERE assignment_id = %s AND student_id = %s""",
-            (data['grade'], assignment_id, data['student_id'])
-        )
-        
-        # Update student's GPA
-        cursor.execute("""
-            UPDATE student_profile sp
-            SET gpa = (
-                SELECT AVG(grade) 
-                FROM assignment_submission 
-                WHERE student_id = %s
-            )
-            WHERE sp.student_id = %s
-        """, (data['student_id'], data['student_id']))
-        
-        return {"student_id": data['student_id'], "grade": data['grade']}
+        batch = grading.apply_grades(cursor, assignment_id, [data])
+        result = batch.results[0]
+        if result['outcome'] == grading.INVALID:
+            raise InvalidParameter(result['error'])  # 400
+        enqueue_gpa_refresh(cursor, batch.changed_students)
+        return result
 
     return handle_db_operation(db_op, "Grade submitted")
 
+@app.route('/assignments/<int:assignment_id>/grades', methods=['POST'])
+@authorize('admin', 'lecturer')
+def grade_assignment_batch(assignment_id):
+    """Grade many submissions in one transaction (lecturer only)"""
+    started = time.perf_counter()
+    data = request.get_json(silent=True) or {}
+    entries = data.get('grades') if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "Expected {\"grades\": [{\"student_id\": ..., \"grade\": ...}, ...]}"}), 400
+    if len(entries) > app.config['MAX_GRADE_BATCH']:
+        return jsonify({"error": f"At most {app.config['MAX_GRADE_BATCH']} grades per request"}), 400
+
+    def db_op(db, cursor):
+        batch = grading.apply_grades(cursor, assignment_id, entries, started)
+        enqueue_gpa_refresh(cursor, batch.changed_students)
+        return batch
+
+    return handle_db_operation(db_op, "Grades submitted")
+
 # ==============================================
 # 8. REPORT ENDPOINTS
 # ==============================================
 @app.route('/reports/top-students', methods=['GET'])
 def top_students():
-    """Get top 10 students by average grade"""
+    """Get top 10 students by average grade (from student_grade_stats)"""
     def db_op(db, cursor):
-        cursor.execute("""
-            SELECT s.user_id, s.name, AVG(a.grade) as average
-            FROM student_profile s
-            JOIN assignment_submission a ON s.user_id = a.student_id
-            GROUP BY s.user_id, s.name
-            ORDER BY average DESC
-            LIMIT 10
-        """)
-        return cursor.fetchall()
+        return reports.top_students(cursor, 10)
 
     return handle_db_operation(db_op, "Top students retrieved")
 
 @app.route('/reports/popular-courses', methods=['GET'])
 def popular_courses():
-    """Get courses with ≥50 students"""
+    """Get courses with ≥50 students (from course_enrollment_stats)"""
     def db_op(db, cursor):
-        cursor.execute("""
-            SELECT c.course_id, c.name, COUNT(sc.student_id) as enrollment
-            FROM course c
-            JOIN student_course sc ON c.course_id = sc.course_id
-            GROUP BY c.course_id
-            HAVING enrollment >= 50
-            ORDER BY enrollment DESC
-        """)
-        return cursor.fetchall()
+        return reports.popular_courses(cursor, 50, pending_jobs(cursor, 'refresh_enrollment_stats'))
 
     return handle_db_operation(db_op, "Popular courses retrieved")
 
 @app.route('/reports/busy-students', methods=['GET'])
 def busy_students():
-    """Get students taking ≥5 courses"""
+    """Get students taking ≥5 courses (from student_course_stats)"""
     def db_op(db, cursor):
-        cursor.execute("""
-            SELECT u.user_id, u.name, COUNT(sc.course_id) as course_count
-            FROM user u
-            JOIN student_course sc ON u.user_id = sc.student_id
-            WHERE u.role = 'student'
-            GROUP BY u.user_id
-            HAVING course_count >= 5
-            ORDER BY course_count DESC
-        """)
-        return cursor.fetchall()
+        return reports.busy_students(cursor, 5, pending_jobs(cursor, 'refresh_enrollment_stats'))
 
     return handle_db_operation(db_op, "Busy students retrieved")
 
+@app.cli.command('rebuild-reports')
+def rebuild_reports_command():
+    """Recompute the report summary tables from scratch"""
+    db = get_db()
+    try:
+        cursor = db.cursor()
+        reports.rebuild(cursor)
+        db.commit()
+        print("Report summaries rebuilt")
+    except Error:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+@app.cli.command('build-search-index')
+def build_search_index_command():
+    """Index all course content and forum threads into a new search index generation"""
+    # Journal lines from here on may be missing from the reads below, so the build
+    # carries them over. The reads go to the primary: a lagging replica could also
+    # miss rows journaled before the mark.
+    since = get_search().mark()
+    content_db, thread_db = get_db(), get_db()  # one unbuffered stream each
+    try:
+        content = content_db.cursor(buffered=False)
+        content.execute(search_index.CONTENT_QUERY)
+        threads = thread_db.cursor(buffered=False)
+        threads.execute(search_index.THREAD_QUERY)
+        generation = get_search().build(search_index.documents(content, threads), since)
+        print(f"Search index generation {generation} written: {get_search().stats()['segment_documents']} documents")
+    finally:
+        content_db.close()
+        thread_db.close()
+
+# ==============================================
+# 9. DASHBOARD ENDPOINTS
+# ==============================================
+# Dashboard sections run here, each on its own pooled connection, for at most
+# DASHBOARD_MAX_CONCURRENT dashboards at a time so they cannot take the whole pool
+dashboard_executor = ThreadPoolExecutor(max_workers=app.config['DASHBOARD_WORKERS'],
+                                        thread_name_prefix="dashboard")
+dashboard_slots = threading.BoundedSemaphore(app.config['DASHBOARD_MAX_CONCURRENT'])
+
+@app.route('/students/<int:student_id>/dashboard', methods=['GET'])
+@authorize(scope='student')
+def get_student_dashboard(student_id):
+    """A student's courses, upcoming events, recent content and recent forum
+    activity in one response. Sections that fail or exceed DASHBOARD_TIMEOUT_MS
+    come back as null and are listed in sections_failed."""
+    read_only, writer = reads_from_replica(), current_writer()  # sections run outside the request
+
+    timeout = app.config['DASHBOARD_TIMEOUT_MS'] / 1000
+
+    def db_op(db, cursor):
+        # A section that cannot get a connection within its deadline has failed
+        connect = lambda: get_db(read_only, writer, timeout)
+        if not dashboard_slots.acquire(blocking=False):
+            return dashboard.load(cursor, student_id, None, None, date.today(),
+                                  app.config['DASHBOARD_ITEMS'], timeout, logger=app.logger)
+        try:
+            return dashboard.load(cursor, student_id, dashboard_executor, connect, date.today(),
+                                  app.config['DASHBOARD_ITEMS'], timeout, logger=app.logger)
+        finally:
+            dashboard_slots.release()
+
+    return handle_db_operation(db_op, "Dashboard retrieved")
+
+# ==============================================
+# 10. HEALTH ENDPOINTS
+# ==============================================
+@app.route('/health/db', methods=['GET'])
+@monitoring
+def db_health():
+    """Connection pool statistics, with primary/replica routing under 'routing'"""
+    data = {**get_pool_stats(), "routing": get_routing_stats()}
+    return jsonify({"message": "Pool stats retrieved", "data": data}), 200
+
+@app.route('/jobs/stats', methods=['GET'])
+@monitoring
+def job_stats():
+    """Background queue depth, lag and outcome counters"""
+    return jsonify({"message": "Job stats retrieved", "data": jobs.stats()}), 200
+
+@app.route('/memberships/stats', methods=['GET'])
+@monitoring
+def membership_stats():
+    """Size, memory and hit/miss counters of the authorization index"""
+    return jsonify({"message": "Membership index stats retrieved", "data": memberships.stats()}), 200
+
+@app.route('/search/stats', methods=['GET'])
+@monitoring
+def search_stats():
+    """Documents and terms in the search index segment and journal"""
+    return jsonify({"message": "Search index stats retrieved", "data": get_search().stats()}), 200
+
+@app.route('/queries/stats', methods=['GET'])
+@monitoring
+def query_stats():
+    """Executions, prepares, errors and timing per registered query"""
+    return jsonify({"message": "Query stats retrieved", "data": queries.stats()}), 200
+
+@app.route('/cache/stats', methods=['GET'])
+@monitoring
+def cache_stats():
+    """Response cache hit/miss/eviction counters"""
+    return jsonify({"message": "Cache stats retrieved", "data": cache.stats()}), 200
+
+@app.route('/metrics', methods=['GET'])
+@monitoring
+def metrics_endpoint():
+    """Prometheus text exposition of query, route, pool, cache and job metrics"""
+    gauges = {}
+    for prefix, stats in (("app_db_pool", get_pool_stats()), ("app_db_routing", get_routing_stats()),
+                          ("app_cache", cache.stats()),
+                          ("app_jobs", jobs.stats()), ("app_memberships", memberships.stats()),
+                          ("app_search", get_search().stats()), ("app_compression", compressor.stats())):
+        for name, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauges[f"{prefix}_{name}"] = (f"{prefix.replace('_', ' ')[4:]} stats: {name}", value)
+    registered = queries.stats()
+    for name in ("calls", "prepares", "errors"):
+        gauges[f"app_query_{name}"] = (f"registered query stats: {name}",
+                                       {(("query", query),): stats[name] for query, stats in registered.items()})
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/slow-queries', methods=['GET'])
+@monitoring
+def slow_queries():
+    """Most recent queries slower than SLOW_QUERY_MS, newest first"""
+    data = {"threshold_ms": metrics.slow_query_ms, "queries": list(reversed(metrics.slow_queries))}
+    return jsonify({"message": "Slow queries retrieved", "data": data}), 200
+
+@app.cli.command('run-jobs')
+def run_jobs_command():
+    """Work the background job queue in this process (use with JOBS_WORKERS=0 on the web side)"""
+    print(f"Working jobs from {app.config['JOBS_PATH']} (Ctrl+C to stop)")
+    jobs.run_forever()
+
 # ==============================================
 # ERROR HANDLERS
 # ==============================================
@@ -475,6 +1224,14 @@ def not_found(e):
 def server_error(e):
     return jsonify({"error": "Internal server error"}), 500
 
+@app.errorhandler(InvalidCursor)
+def invalid_cursor(e):
+    return jsonify({"error": "Invalid cursor"}), 400
+
+@app.errorhandler(InvalidParameter)
+def invalid_parameter(e):
+    return jsonify({"error": str(e)}), 400
+
 if __name__ == '__main__':
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     app.run(debug=True)
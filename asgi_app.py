@@ -0,0 +1,519 @@
+"""Asynchronous (ASGI) serving mode.
+
+    uvicorn asgi_app:app --workers 4 --loop uvloop
+
+The read endpoints that see the most traffic are served here by
+coroutines on an aiomysql connection pool, so an in-flight request waiting
+on MySQL holds no thread and concurrency is bounded by ASYNC_DB_POOL_SIZE
+rather than by worker threads. Independent queries of one request (a
+thread and its reply tree, a report and its refresh time) run
+concurrently on separate connections. Reads go to the replicas in
+DB_REPLICAS by the same rules as app.get_db(): app.get_router() tracks
+their lag and who wrote recently, and asgi_app keeps one aiomysql pool per
+replica beside the primary's. Response cache fills read from the primary.
+
+Every other route (logins, writes, uploads, streamed exports, stats) is
+passed to the Flask app in app.py unchanged, so both modes expose the same
+API. The async handlers reuse app.py's configuration, JWT verification
+(flask-jwt-extended, run against the request's headers), membership index,
+response cache and metrics, and they build the same response envelopes;
+async_compat.py checks that both modes return identical payloads. Routes
+run the statements registered in queries.py by name, with the same
+parameter checks; aiomysql has no server-side prepared statements, so they
+are sent as plain queries and reported through queries.QUERIES.record().
+"""
+import asyncio
+import contextvars
+import time
+from contextlib import asynccontextmanager
+
+import aiomysql
+from asgiref.wsgi import WsgiToAsgi
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+import app as flask_module
+import compression
+import forums
+import jobs
+import membership
+import queries
+import reports
+import serialization
+from pagination import InvalidCursor, keyset_result, parse_page_args
+from queries import InvalidParameter
+
+flask_app = flask_module.app
+config = flask_app.config
+logger = flask_app.logger
+cache = flask_module.cache
+memberships = flask_module.memberships
+metrics = flask_module.metrics
+
+_pools = {}  # None: the primary; a DB_REPLICAS endpoint: that replica
+
+# Per request, as app.current_writer() and g.response_cache_fill are
+_writer = contextvars.ContextVar("writer", default=None)
+_cache_fill = contextvars.ContextVar("cache_fill", default=False)
+
+
+class NotFound(Exception):
+    """The async counterpart of raising werkzeug's NotFound in a db_op"""
+
+
+# ==============================================
+# Database
+# ==============================================
+@asynccontextmanager
+async def _connection():
+    """A pooled connection from a replica where app.get_db() would use one, else the primary"""
+    router = flask_module.get_router()
+    if _cache_fill.get():
+        replica, reason = None, "primary_reads"
+    else:
+        replica, reason = router.choose(_writer.get(), busy=_busy)
+    if replica is not None:
+        try:
+            db = await _pools[replica.name].acquire()
+        except aiomysql.Error as e:
+            router.unreachable(replica, e)
+            replica, reason = None, "fallback_unavailable"
+    if replica is None:
+        db = await _pools[None].acquire()
+    router.count(reason or "replica_reads", replica)
+    try:
+        yield db
+    finally:
+        _pools[replica.name if replica else None].release(db)
+
+
+def _busy(replica):
+    pool = _pools[replica.name]
+    return (pool.size - pool.freesize) / max(pool.maxsize, 1)
+
+
+async def fetch_all(query, params=(), name=None):
+    """Rows of `query`; `name` is the queries.py registration it comes from, if any"""
+    async with _connection() as db:
+        async with db.cursor(aiomysql.DictCursor) as cursor:
+            started = time.perf_counter()
+            try:
+                await cursor.execute(query, params)
+                rows = await cursor.fetchall()
+            except aiomysql.Error:
+                _record(name, query, time.perf_counter() - started, 0, True)
+                raise
+    _record(name, query, time.perf_counter() - started, len(rows), False)
+    return rows
+
+
+def _record(name, query, seconds, rows, failed):
+    if name is not None:
+        queries.QUERIES.record(name, query, seconds, rows, failed)  # and the metrics hook
+    elif config['METRICS_ENABLED']:
+        metrics.record_query(query, seconds, rows, failed)
+
+
+async def fetch_one(query, params=()):
+    rows = await fetch_all(query, params)
+    return rows[0] if rows else None
+
+
+async def run_query(name, **params):
+    """queries.run() for coroutines (reads only)"""
+    query = queries.QUERIES[name]
+    if query.fetch == "write" or isinstance(query, queries.PageQuery):
+        raise TypeError(f"{name} cannot be run here")
+    rows = await fetch_all(query.sql, query.bind(params), name)
+    if query.fetch == "one":
+        return rows[0] if rows else None
+    return rows
+
+
+async def page_query(name, after, limit, **params):
+    """queries.page() for coroutines"""
+    query = queries.QUERIES[name]
+    sql, values = query.page_statement(query.bind(params), after, limit)
+    return keyset_result(await fetch_all(sql, values, name), query.order_by, limit)
+
+
+# ==============================================
+# Responses
+# ==============================================
+def json_response(payload, status_code=200):
+    # The encoder behind jsonify(), so dates, Decimals and key order match
+    return Response(serialization.encode(payload), status_code=status_code, media_type="application/json")
+
+
+def compress(request, response):
+    """Compressor.compress_response() for Starlette responses"""
+    compressor = flask_module.compressor
+    if response.media_type not in compression.COMPRESSIBLE and response.status_code != 304:
+        return response
+    response.headers.append('Vary', 'Accept-Encoding')
+    encoding = compressor.negotiate(request.headers.get('Accept-Encoding'))
+    if encoding is not None and response.status_code == 304:
+        _weaken_etag(response)
+    if encoding is None or not compressor.eligible(response.status_code, response.media_type,
+                                                   len(response.body), response.headers):
+        return response
+    response.body = compressor.encode(response.body, encoding)
+    response.headers['Content-Length'] = str(len(response.body))
+    response.headers['Content-Encoding'] = encoding
+    _weaken_etag(response)
+    return response
+
+
+def _weaken_etag(response):
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        response.headers['ETag'] = 'W/' + etag
+
+
+async def db_operation(operation, success_message, status_code=200):
+    """handle_db_operation() for coroutines: same envelope, same error responses"""
+    try:
+        result = await operation()
+    except aiomysql.Error as e:
+        logger.error(f"Database error: {str(e)}")
+        return json_response({"error": "Database operation failed"}, 500)
+    except InvalidCursor:
+        return json_response({"error": "Invalid cursor"}, 400)
+    except InvalidParameter as e:
+        return json_response({"error": str(e)}, 400)
+    except NotFound:
+        return json_response({"error": "Resource not found"}, 404)
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        return json_response({"error": "Operation failed"}, 500)
+    if hasattr(result, 'envelope'):
+        data, extra = result.envelope()
+        return json_response({"message": success_message, "data": data, **extra}, status_code)
+    return json_response({"message": success_message, "data": result}, status_code)
+
+
+async def cached(request, tags, respond):
+    """ResponseCache.cached() for coroutines, sharing the Flask app's cache"""
+    if not cache.enabled:
+        return await respond()
+    key, entry = cache.lookup(request.url.path, request.query_params.multi_items(), tags)
+    if entry is not None:
+        status, etag, mimetype, body = entry
+        return _conditional(request, Response(body, status_code=status, media_type=mimetype), etag, "HIT")
+    token = _cache_fill.set(True)  # read from the primary, as in response_cache.py
+    try:
+        response = await respond()
+    finally:
+        _cache_fill.reset(token)
+    if response.status_code != 200:
+        return response
+    etag = cache.save(key, response.status_code, "application/json", response.body)
+    return _conditional(request, response, etag, "MISS")
+
+
+def _conditional(request, response, etag, state):
+    response.headers['ETag'] = f'"{etag}"'
+    response.headers['X-Cache'] = state
+    wanted = request.headers.get('If-None-Match', '')
+    if wanted.strip() == '*' or etag in {tag.strip().removeprefix('W/').strip('"') for tag in wanted.split(',')}:
+        cache.record_not_modified()
+        return Response(status_code=304, headers={'ETag': f'"{etag}"', 'X-Cache': state})
+    return response
+
+
+# ==============================================
+# Authorization
+# ==============================================
+def verify_identity(request):
+    """(identity, None), or (None, error response) exactly as jwt_required() answers.
+
+    flask-jwt-extended only reads the Authorization header, so it runs in a
+    request context carrying just that header; no I/O is involved.
+    """
+    headers = {'Authorization': request.headers['Authorization']} if 'Authorization' in request.headers else {}
+    with flask_app.test_request_context(request.url.path, headers=headers):
+        try:
+            verify_jwt_in_request()
+            return get_jwt_identity(), None
+        except Exception as e:
+            error = flask_app.make_response(flask_app.handle_user_exception(e))
+            return None, Response(error.get_data(), status_code=error.status_code, media_type=error.mimetype)
+
+
+async def can_access_course(identity, course_id):
+    allowed = memberships.can_access(identity, course_id)
+    if allowed is None:
+        query, params = memberships.fallback(identity, course_id)
+        row = await fetch_one(query, params)
+        allowed = memberships.learn(identity, course_id, None if row is None else tuple(row.values()))
+    return allowed
+
+
+async def forum_course(forum_id):
+    course_id = memberships.course_of_forum(forum_id)
+    if course_id is None:
+        row = await fetch_one(membership.FORUM_QUERY, (forum_id,))
+        if row is None:
+            return None
+        course_id = row['course_id']
+        memberships.set_forum(forum_id, course_id)
+    return course_id
+
+
+async def authorize(request, *roles, scope=None):
+    """app.authorize() for coroutines: (identity, None) or (None, error response)"""
+    identity, error = verify_identity(request)
+    if error is not None:
+        return None, error
+    _writer.set(identity['user_id'])  # reads must see this user's own writes
+    forbidden = json_response({"error": "Insufficient permissions"}, 403)
+    if roles and identity['role'] not in roles:
+        return None, forbidden
+    params = request.path_params
+    if scope == 'student':
+        allowed = identity['role'] != 'student' or identity['user_id'] == params['student_id']
+    elif scope:
+        flask_module.refresh_memberships()
+        course_id = params['course_id'] if scope == 'course' else await forum_course(params['forum_id'])
+        if course_id is None:
+            return None, json_response({"error": "Resource not found"}, 404)
+        allowed = await can_access_course(identity, course_id)
+    else:
+        allowed = True
+    return (identity, None) if allowed else (None, forbidden)
+
+
+# ==============================================
+# Routes
+# ==============================================
+# Same queries as the Flask routes of the same name in app.py
+async def get_courses(request):
+    args = request.query_params
+
+    async def respond():
+        async def operation():
+            after, limit = parse_page_args(args, config, default_limit=10)
+            if args.get('lecturer_id'):
+                return await page_query("course.by_lecturer", after, limit, lecturer_id=args.get('lecturer_id'))
+            elif args.get('student_id'):
+                return await page_query("course.by_student", after, limit, student_id=args.get('student_id'))
+            return await page_query("course.list", after, limit)
+
+        return await db_operation(operation, "Courses retrieved")
+
+    return await cached(request, flask_module.course_listing_tags(args), respond)
+
+
+async def get_course_members(request):
+    _, error = await authorize(request, scope='course')
+    if error:
+        return error
+    course_id = request.path_params['course_id']
+
+    async def operation():
+        after, limit = parse_page_args(request.query_params, config)
+        return await page_query("course.members", after, limit, course_id=course_id)
+
+    return await db_operation(operation, "Course members retrieved")
+
+
+async def get_course_events(request):
+    course_id = request.path_params['course_id']
+
+    async def respond():
+        async def operation():
+            after, limit = parse_page_args(request.query_params, config)
+            return await page_query("event.by_course", after, limit, course_id=course_id)
+
+        return await db_operation(operation, "Events retrieved")
+
+    return await cached(request, [f"course:{course_id}:events"], respond)
+
+
+async def get_student_events(request):
+    _, error = await authorize(request, scope='student')
+    if error:
+        return error
+    try:
+        start, end = flask_module.date_range_args(request.query_params)
+    except ValueError:
+        return json_response({"error": "Dates must be YYYY-MM-DD"}, 400)
+
+    name, params = flask_module.student_events_query(request.path_params['student_id'], start, end)
+
+    async def operation():
+        after, limit = parse_page_args(request.query_params, config)
+        return await page_query(name, after, limit, **params)
+
+    return await db_operation(operation, "Student events retrieved")
+
+
+async def get_course_forums(request):
+    _, error = await authorize(request, scope='course')
+    if error:
+        return error
+    course_id = request.path_params['course_id']
+
+    async def respond():
+        async def operation():
+            return await run_query("forum.by_course", course_id=course_id)
+
+        return await db_operation(operation, "Forums retrieved")
+
+    return await cached(request, [f"course:{course_id}:forums"], respond)
+
+
+async def get_course_content(request):
+    _, error = await authorize(request, scope='course')
+    if error:
+        return error
+    course_id = request.path_params['course_id']
+
+    async def respond():
+        async def operation():
+            after, limit = parse_page_args(request.query_params, config)
+            return await page_query("content.by_course", after, limit, course_id=course_id)
+
+        return await db_operation(operation, "Course content retrieved")
+
+    return await cached(request, [f"course:{course_id}:content"], respond)
+
+
+async def get_forum_threads(request):
+    _, error = await authorize(request, scope='forum')
+    if error:
+        return error
+
+    async def operation():
+        after, limit = parse_page_args(request.query_params, config)
+        return await page_query("thread.by_forum", after, limit, forum_id=request.path_params['forum_id'])
+
+    return await db_operation(operation, "Threads retrieved")
+
+
+async def get_thread(request):
+    _, error = await authorize(request, scope='forum')
+    if error:
+        return error
+    forum_id, post_id = request.path_params['forum_id'], request.path_params['post_id']
+
+    async def operation():
+        after, limit = parse_page_args(request.query_params, config)
+        if after is not None and (len(after) != 1 or not isinstance(after[0], int)):
+            raise InvalidCursor(after)
+        max_replies = config['THREAD_MAX_REPLIES']
+        # The thread row and its reply tree don't depend on each other
+        thread, rows = await asyncio.gather(
+            fetch_one(forums.THREAD_QUERY, (post_id, forum_id)),
+            fetch_all(forums.TREE_QUERY, forums.tree_params(post_id, after[0] if after else None, limit,
+                                                            config['THREAD_MAX_DEPTH'], max_replies)))
+        if thread is None:
+            raise NotFound()
+        return forums.assemble_thread(thread, rows, limit, max_replies)
+
+    return await db_operation(operation, "Thread retrieved")
+
+
+def report_route(query, param, message, job=None):
+    """`job` names the background job that recounts the report's summaries"""
+    async def endpoint(request):
+        async def operation():
+            # The report and the time of the last rebuild are read side by side
+            rows, refresh = await asyncio.gather(fetch_all(query, (param,)), fetch_one(reports.REFRESH_QUERY))
+            pending = 0
+            if job:
+                staged = await fetch_one(jobs.OUTBOX_COUNT, (job,))
+                pending = flask_module.jobs.pending(job) + staged['staged']
+            return reports.Report(rows, refresh['rebuilt_at'] if refresh else None, pending)
+
+        return await db_operation(operation, message)
+    return endpoint
+
+
+# ==============================================
+# Application
+# ==============================================
+class AsyncRoute:
+    """ASGI endpoint running `handler`, or the Flask app for requests `delegate` picks"""
+
+    def __init__(self, path, handler, delegate=None):
+        self.path = path
+        self.handler = handler
+        self.delegate = delegate
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        if self.delegate is not None and self.delegate(request):
+            await flask_asgi(scope, receive, send)
+            return
+        started = time.perf_counter()
+        response = await self.handler(request)
+        if config['COMPRESS_ENABLED']:
+            response = compress(request, response)
+        if config['METRICS_ENABLED']:
+            metrics.record_request(request.method, self.path, response.status_code,
+                                   time.perf_counter() - started)
+        await response(scope, receive, send)
+
+
+def wants_export(request):
+    """Streamed exports stay on the Flask side (see app.export_format())"""
+    return 'export' in request.query_params or 'application/x-ndjson' in request.headers.get('Accept', '')
+
+
+def route(flask_rule, handler, delegate=None):
+    path = flask_rule.replace('<int:', '{').replace('>', ':int}')
+    return Route(path, AsyncRoute(flask_rule, handler, delegate), methods=['GET'])
+
+
+def create_pool(host, port, minsize):
+    return aiomysql.create_pool(
+        host=host, port=port, user=config['DB_USER'],
+        password=config['DB_PASSWORD'], db=config['DB_NAME'], autocommit=True,
+        minsize=minsize, maxsize=config['ASYNC_DB_POOL_SIZE'],
+        pool_recycle=config['DB_POOL_RECYCLE'])
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    _pools[None] = await create_pool(config['DB_HOST'], config['DB_PORT'], config['ASYNC_DB_POOL_MIN'])
+    for replica in flask_module.get_router().replicas:
+        host, _, port = replica.name.partition(':')
+        # Opened on demand, so a replica that is down does not stop startup
+        _pools[replica.name] = await create_pool(host, int(port or 3306), 0)
+    flask_module.refresh_memberships()  # Flask starts these with its first request
+    flask_module.jobs.start()
+    try:
+        yield
+    finally:
+        for pool in _pools.values():
+            pool.close()
+            await pool.wait_closed()
+        _pools.clear()
+
+
+flask_asgi = WsgiToAsgi(flask_app)
+
+app = Starlette(
+    routes=[
+        route('/courses', get_courses),
+        route('/courses/<int:course_id>/members', get_course_members, wants_export),
+        route('/courses/<int:course_id>/events', get_course_events),
+        route('/students/<int:student_id>/events', get_student_events, wants_export),
+        route('/courses/<int:course_id>/forums', get_course_forums),
+        route('/courses/<int:course_id>/content', get_course_content),
+        route('/forums/<int:forum_id>/threads', get_forum_threads),
+        route('/forums/<int:forum_id>/threads/<int:post_id>', get_thread),
+        route('/reports/top-students', report_route(reports.TOP_STUDENTS, 10, "Top students retrieved")),
+        route('/reports/popular-courses', report_route(reports.POPULAR_COURSES, 50, "Popular courses retrieved",
+                                                       'refresh_enrollment_stats')),
+        route('/reports/busy-students', report_route(reports.BUSY_STUDENTS, 5, "Busy students retrieved",
+                                                     'refresh_enrollment_stats')),
+        # Everything else, including other methods on the paths above
+        Mount('/', app=flask_asgi),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,110 @@
+"""Check that the ASGI server (asgi_app.py) answers exactly like the Flask one.
+
+    # both servers on the bench database (see benchmark.py)
+    DB_NAME=course_management_bench python app.py
+    DB_NAME=course_management_bench uvicorn asgi_app:app --port 8000
+
+    python async_compat.py --sync-url http://localhost:5000 --async-url http://localhost:8000
+
+Sends the same read requests to both (the routes asgi_app.py serves
+natively, a second page of each via next_cursor, and the usual auth
+failures) and compares status codes and JSON bodies. Exits 1 on any
+difference. Writes are not compared, since replaying one would not be
+idempotent; they are served by the same Flask code in both modes anyway.
+"""
+import argparse
+import json
+import random
+import sys
+from urllib.parse import urlencode
+
+import benchmark
+
+READ_OPS = [
+    benchmark.op_list_courses, benchmark.op_student_courses, benchmark.op_lecturer_courses,
+    benchmark.op_members, benchmark.op_course_events, benchmark.op_student_events,
+    benchmark.op_forums, benchmark.op_threads, benchmark.op_thread_detail, benchmark.op_content,
+] + [op for _, op in benchmark.REPORT_OPS]
+
+
+def edge_cases(fx, rng):
+    """(label, path, token) for error paths, which must match too"""
+    student_id, student_token = fx.token("student", rng)
+    other_student = next((row[0] for row in fx.students if row[0] != student_id), student_id)
+    course_id = rng.choice(fx.courses)
+    forum_id = rng.choice(fx.forums) if fx.forums else 1
+    return [
+        ("no token", f"/courses/{course_id}/members", None),
+        ("malformed token", f"/courses/{course_id}/members", "not-a-jwt"),
+        ("tampered token", f"/courses/{course_id}/members", student_token[:-2] + "xx"),
+        ("other student's events", f"/students/{other_student}/events", student_token),
+        ("bad date", f"/students/{student_id}/events?from=yesterday", student_token),
+        ("bad cursor", "/courses?cursor=garbage", None),
+        ("bad limit", f"/courses/{course_id}/events?limit=abc", None),
+        ("unknown forum", "/forums/999999999/threads", fx.token("admin", rng)[1]),
+        ("unknown thread", f"/forums/{forum_id}/threads/999999999", fx.token("admin", rng)[1]),
+    ]
+
+
+def fetch(client, path, token):
+    status, data = client.request("GET", path, token=token)
+    try:
+        return status, json.loads(data)
+    except ValueError:
+        return status, data.decode("utf-8", "replace")
+
+
+def next_page(path, payload):
+    """`path` for the page after `payload`, or None if it was the last"""
+    cursor = payload.get("next_cursor") if isinstance(payload, dict) else None
+    if not cursor:
+        return None
+    separator = "&" if "?" in path else "?"
+    return path + separator + urlencode({"cursor": cursor})
+
+
+def compare(label, path, token, sync_client, async_client, follow=True):
+    """Number of mismatches for `path` and, if it is paged, its second page"""
+    expected = fetch(sync_client, path, token)
+    actual = fetch(async_client, path, token)
+    if expected != actual:
+        print(f"DIFF  {label}: {path}\n      sync  {expected[0]} {str(expected[1])[:300]}"
+              f"\n      async {actual[0]} {str(actual[1])[:300]}")
+        return 1
+    print(f"ok    {label}: {path}")
+    following = next_page(path, expected[1]) if follow else None
+    if following is None:
+        return 0
+    return compare(f"{label} (next page)", following, token, sync_client, async_client, follow=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the Flask and ASGI servers' responses")
+    parser.add_argument("--sync-url", default="http://localhost:5000")
+    parser.add_argument("--async-url", default="http://localhost:8000")
+    parser.add_argument("--rounds", type=int, default=5, help="requests per route")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    sync_client = benchmark.HttpClient(args.sync_url)
+    async_client = benchmark.HttpClient(args.async_url)
+    fx = benchmark.Fixtures()
+    fx.prepare(sync_client, logins=5)
+
+    mismatches = checked = 0
+    for op in READ_OPS:
+        for _ in range(args.rounds):
+            label, _, path, _, token = op(fx, rng)
+            mismatches += compare(label, path, token, sync_client, async_client)
+            checked += 1
+    for label, path, token in edge_cases(fx, rng):
+        mismatches += compare(label, path, token, sync_client, async_client)
+        checked += 1
+
+    print(f"{checked} requests compared, {mismatches} differences")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Microbenchmarks for response encoding: Flask's default JSON provider vs
+serialization.py, and the compression options, on payloads shaped like
+the API's responses.
+
+    python bench_serialization.py [--rows 200] [--repeat 5]
+
+For each payload it prints the time per response for both encoders (and
+checks they decode to the same JSON), then the size and time of each
+compression setting. No server or database is needed.
+"""
+import argparse
+import gzip
+import json
+import random
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import serialization
+from compression import brotli
+
+WORDS = ("lecture notes week assignment reading exam review lab project quiz tutorial solution "
+         "algorithm database network design theory practice question answer deadline").split()
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def _payload(data, **extra):
+    return {"message": "Retrieved", "data": data, "next_cursor": "WzEyMzQ1XQ", **extra}
+
+
+def payloads(rows, seed=0):
+    """{name: response body object} with realistic types and sizes"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 6, 9, 0)
+    members = [{"user_id": 100000 + i, "name": f"Student {i}", "email": f"student{i}@example.edu"}
+               for i in range(rows)]
+    events = [{"event_id": i, "course_id": rng.randint(1, 500), "title": _text(rng, 3),
+               "event_date": date(2025, 1, 6) + timedelta(days=rng.randint(0, 120)),
+               "description": _text(rng, 25)} for i in range(rows)]
+    threads = [{"post_id": i, "forum_id": 7, "title": _text(rng, 5), "excerpt": _text(rng, 30),
+                "user_id": rng.randint(1, 10000), "author_name": f"User {i}",
+                "created_at": start + timedelta(minutes=37 * i), "reply_count": rng.randint(0, 40),
+                "last_activity_at": start + timedelta(minutes=37 * i + 90)} for i in range(rows)]
+    top_students = [{"user_id": i, "name": f"Student {i}",
+                     "average": Decimal(rng.randint(5000, 10000)) / 100} for i in range(rows)]
+    grades = [{"student_id": i, "grade": Decimal(rng.randint(400, 1000)) / 10, "status": "graded"}
+              for i in range(rows)]
+
+    def replies(depth, count):
+        return [{"reply_id": rng.randint(1, 10 ** 7), "reply_content": _text(rng, 20), "user_id": i,
+                 "author_name": f"User {i}", "created_at": start + timedelta(hours=i), "depth": depth,
+                 "replies": replies(depth + 1, count // 2) if depth < 4 else []} for i in range(count)]
+
+    return {
+        "course members": _payload(members),
+        "student events": _payload(events),
+        "thread listing": _payload(threads),
+        "thread tree": _payload({"post_id": 1, "title": "Exam review", "post": _text(rng, 200),
+                                 "created_at": start, "replies": replies(1, max(2, rows // 25))},
+                                replies_loaded=rows, truncated=False),
+        "top students": _payload(top_students, as_of=start, stale=False),
+        "grade batch": _payload(grades),
+    }
+
+
+def best(callable_, repeat, number):
+    """Fastest time per call, in microseconds"""
+    return min(timeit.repeat(callable_, repeat=repeat, number=number)) / number * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark JSON encoding and compression")
+    parser.add_argument("--rows", type=int, default=200, help="rows per list payload (a full page)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=50, help="calls per timing")
+    args = parser.parse_args(argv)
+
+    app = Flask(__name__)
+    flask_default = DefaultJSONProvider(app)
+
+    def old(obj):
+        # What jsonify() did before: stdlib json with Flask's default()
+        return (flask_default.dumps(obj, separators=(",", ":")) + "\n").encode()
+
+    print(f"encoder: {'orjson ' + serialization.orjson.__version__ if serialization.orjson else 'stdlib json'}, "
+          f"brotli: {'yes' if brotli else 'not installed'}\n")
+    print(f"{'payload':<16}{'bytes':>9}{'flask us':>11}{'new us':>10}{'speedup':>9}")
+    encoded = {}
+    for name, obj in payloads(args.rows).items():
+        before, after = old(obj), serialization.encode(obj)
+        if json.loads(before) != json.loads(after):
+            sys.exit(f"error: {name} encodes differently")
+        encoded[name] = after
+        old_us = best(lambda: old(obj), args.repeat, args.number)
+        new_us = best(lambda: serialization.encode(obj), args.repeat, args.number)
+        print(f"{name:<16}{len(after):>9,}{old_us:>11.1f}{new_us:>10.1f}{old_us / new_us:>8.1f}x")
+
+    settings = [(f"gzip {level}", lambda body, level=level: gzip.compress(body, compresslevel=level, mtime=0))
+                for level in (1, 6, 9)]
+    if brotli:
+        settings += [(f"br {quality}", lambda body, quality=quality: brotli.compress(body, quality=quality))
+                     for quality in (1, 4, 11)]
+    print(f"\n{'payload':<16}{'setting':<10}{'bytes':>9}{'ratio':>8}{'us':>10}")
+    for name, body in encoded.items():
+        for setting, compress in settings:
+            size = len(compress(body))
+            print(f"{name:<16}{setting:<10}{size:>9,}{size / len(body):>8.2f}"
+                  f"{best(lambda: compress(body), args.repeat, max(1, args.number // 5)):>10.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,622 @@
+"""Load tests for the API: seed a database, drive mixed workloads, record results.
+
+    # build a bench database at a chosen scale (drops and recreates it)
+    python benchmark.py seed --scale small
+
+    # drive a workload against a running server, or in-process with --in-process
+    python benchmark.py run --workload mixed --clients 16 --duration 30 --url http://localhost:5000
+
+    # compare two result files; exits 1 if p95 or throughput regressed past --threshold
+    python benchmark.py compare results/old.json results/new.json
+
+The database is BENCH_DB_NAME (default course_management_bench) on the usual
+DB_HOST/DB_PORT/DB_USER/DB_PASSWORD server; point the server under test at
+it with DB_NAME. Queries per request come from MySQL's global `Questions`
+counter, so they are only meaningful on an otherwise idle server.
+
+Each run writes <out-dir>/<timestamp>-<workload>.json (run settings,
+overall and per-route latency percentiles, requests/sec, error counts,
+queries/request) and a .csv with one row per route.
+"""
+import argparse
+import csv
+import http.client
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from migrate import Migration, connect_args_from_env, load_migrations, migrate
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_PATH = os.path.join(HERE, "Sql_table.sql")
+DEFAULT_DB_NAME = "course_management_bench"
+
+SCALES = {
+    "tiny": {"students": 500, "courses": 20},
+    "small": {"students": 5000, "courses": 60},
+    "medium": {"students": 25000, "courses": 120},
+    "large": {"students": 100000, "courses": 200},
+}
+
+# Insert_Generator.py gives every account of a role the same password
+PASSWORDS = {"admin": "adminpass", "lecturer": "lecturerpass", "student": "studentpass"}
+
+SAMPLE_SIZE = 200  # accounts, courses, forums ... sampled for request parameters
+
+
+def bench_connect_args(with_database=True):
+    args = connect_args_from_env()
+    args["database"] = os.environ.get("BENCH_DB_NAME", DEFAULT_DB_NAME)
+    if not with_database:
+        args.pop("database")
+    return args
+
+
+# ==============================================
+# Seeding
+# ==============================================
+def seed(scale, workers):
+    """Recreate the bench database: schema, migrations, then generated data"""
+    import mysql.connector
+    from Insert_Generator import Output, Settings, generate
+
+    connect_args = bench_connect_args()
+    name = connect_args["database"]
+    if not name.endswith("_bench"):
+        sys.exit(f"error: refusing to drop '{name}'; bench databases must end in _bench")
+
+    db = mysql.connector.connect(**bench_connect_args(with_database=False))
+    cursor = db.cursor()
+    print(f"Recreating database {name}")
+    cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+    cursor.execute(f"CREATE DATABASE `{name}`")
+    cursor.execute(f"USE `{name}`")
+    for statement in Migration(0, "baseline", SCHEMA_PATH).statements():
+        if not statement.upper().startswith("CREATE DATABASE"):
+            cursor.execute(statement)
+    db.commit()
+    migrate(db, load_migrations())
+    cursor.close()
+    db.close()
+
+    settings = Settings(**SCALES[scale])
+    generate(settings, Output("mysql", connect_args=connect_args), workers)
+
+
+# ==============================================
+# Clients
+# ==============================================
+class HttpClient:
+    """Keep-alive HTTP/1.1 connection to a running server; one per thread"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.https = parts.scheme == "https"
+        self.connection = None
+
+    def request(self, method, path, body=None, token=None):
+        headers = {"Accept": "application/json"}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        for attempt in range(2):
+            if self.connection is None:
+                connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+                self.connection = connection_class(self.host, self.port, timeout=60)
+            try:
+                self.connection.request(method, path, payload, headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                return response.status, data
+            except (http.client.HTTPException, OSError):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+
+
+class InProcessClient:
+    """Flask test client against app.py in this process (no network, no server)"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_data()
+
+
+def make_client_factory(args):
+    if args.in_process:
+        os.environ["DB_NAME"] = bench_connect_args()["database"]
+        from app import app
+        return lambda: InProcessClient(app)
+    return lambda: HttpClient(args.url)
+
+
+# ==============================================
+# Fixtures
+# ==============================================
+def _grouped(cursor, query, ids):
+    """{first column: [second column, ...]} for `query` with its IN list filled from ids"""
+    grouped = {}
+    if ids:
+        cursor.execute(query.format(", ".join(["%s"] * len(ids))), tuple(ids))
+        for key, value in cursor.fetchall():
+            grouped.setdefault(key, []).append(value)
+    return grouped
+
+
+class Fixtures:
+    """Ids and credentials sampled from the bench database, plus logged-in tokens"""
+
+    def __init__(self):
+        import mysql.connector
+
+        db = mysql.connector.connect(**bench_connect_args())
+        cursor = db.cursor()
+
+        def sample(query):
+            cursor.execute(query + f" ORDER BY RAND() LIMIT {SAMPLE_SIZE}")
+            return cursor.fetchall()
+
+        self.students = sample("SELECT user_id, email FROM user WHERE role = 'student'")
+        self.lecturers = sample("SELECT user_id, email FROM user WHERE role = 'lecturer'")
+        self.admins = sample("SELECT user_id, email FROM user WHERE role = 'admin'")
+        self.courses = [row[0] for row in sample("SELECT course_id FROM course")]
+        self.forums = [row[0] for row in sample("SELECT forum_id FROM forum")]
+        self.assignments = sample("SELECT assignment_id, course_id FROM assignment")
+        # Courses the sampled users belong to, for routes limited to course members
+        self.student_courses = _grouped(cursor, "SELECT student_id, course_id FROM student_course "
+                                        "WHERE student_id IN ({})", [row[0] for row in self.students])
+        self.lecturer_courses = _grouped(cursor, "SELECT lecturer_id, course_id FROM course "
+                                         "WHERE lecturer_id IN ({})", [row[0] for row in self.lecturers])
+        self.course_forums = _grouped(cursor, "SELECT course_id, forum_id FROM forum WHERE course_id IN ({})",
+                                      sorted({course_id for courses in self.student_courses.values()
+                                              for course_id in courses}))
+        self.forum_threads = _grouped(cursor, "SELECT forum_id, post_id FROM forum_post WHERE forum_id IN ({})",
+                                      sorted({forum_id for forums in self.course_forums.values()
+                                              for forum_id in forums}))
+        # Rows created by the run get ids well clear of the generated ones
+        cursor.execute("SELECT (SELECT MAX(user_id) FROM user), (SELECT MAX(course_id) FROM course)")
+        max_user, max_course = cursor.fetchone()
+        self.next_ids = {"user": (max_user or 0) + 1_000_000, "course": (max_course or 0) + 1_000_000}
+        cursor.close()
+        db.close()
+
+        if not (self.students and self.lecturers and self.admins and self.courses):
+            sys.exit("error: bench database is empty; run `python benchmark.py seed` first")
+        self.tokens = {}
+        self._lock = threading.Lock()
+
+    def login(self, client, role, user):
+        status, data = client.request("POST", "/auth/login",
+                                      {"email": user[1], "password": PASSWORDS[role]})
+        if status != 200:
+            sys.exit(f"error: could not log in as {user[1]} ({status}): {data[:200]!r}")
+        return json.loads(data)["token"]
+
+    def prepare(self, client, logins=20):
+        """Log in a handful of each role up front so request timings exclude it"""
+        for role, users in (("student", self.students), ("lecturer", self.lecturers),
+                            ("admin", self.admins)):
+            self.tokens[role] = [(user[0], self.login(client, role, user)) for user in users[:logins]]
+
+    def token(self, role, rng):
+        return rng.choice(self.tokens[role])
+
+    def member(self, role, rng):
+        """(token, course_id) for a logged-in student or lecturer and one of their courses"""
+        courses = self.student_courses if role == "student" else self.lecturer_courses
+        candidates = [(user_id, token) for user_id, token in self.tokens[role] if courses.get(user_id)]
+        if not candidates:
+            return self.token("admin", rng)[1], rng.choice(self.courses)
+        user_id, token = rng.choice(candidates)
+        return token, rng.choice(courses[user_id])
+
+    def member_forum(self, rng):
+        """(token, forum_id) for a logged-in student and a forum of one of their courses"""
+        token, course_id = self.member("student", rng)
+        forums = self.course_forums.get(course_id)
+        return token, rng.choice(forums) if forums else rng.choice(self.forums)
+
+    def new_id(self, kind):
+        with self._lock:
+            self.next_ids[kind] += 1
+            return self.next_ids[kind]
+
+
+# ==============================================
+# Workloads
+# ==============================================
+# Each operation returns (route label, method, path, body, token)
+def op_login(fx, rng):
+    role = rng.choices(["student", "lecturer", "admin"], [90, 9, 1])[0]
+    user = rng.choice({"student": fx.students, "lecturer": fx.lecturers, "admin": fx.admins}[role])
+    return "POST /auth/login", "POST", "/auth/login", {"email": user[1], "password": PASSWORDS[role]}, None
+
+
+def op_register(fx, rng):
+    user_id = fx.new_id("user")
+    return ("POST /auth/register", "POST", "/auth/register",
+            {"user_id": user_id, "name": "Bench User", "email": f"bench{user_id}@example.com",
+             "password": "benchpass", "role": "student"}, None)
+
+
+def op_list_courses(fx, rng):
+    return "GET /courses", "GET", "/courses", None, None
+
+
+def op_student_courses(fx, rng):
+    student_id, token = fx.token("student", rng)
+    return "GET /courses?student_id", "GET", f"/courses?student_id={student_id}", None, token
+
+
+def op_lecturer_courses(fx, rng):
+    lecturer_id = rng.choice(fx.lecturers)[0]
+    return "GET /courses?lecturer_id", "GET", f"/courses?lecturer_id={lecturer_id}", None, None
+
+
+def op_enroll(fx, rng):
+    _, token = fx.token("student", rng)
+    course_id = rng.choice(fx.courses)
+    return "POST /courses/<id>/enroll", "POST", f"/courses/{course_id}/enroll", None, token
+
+
+def op_bulk_enroll(fx, rng):
+    _, token = fx.token("admin", rng)
+    pairs = [{"student_id": rng.choice(fx.students)[0], "course_id": rng.choice(fx.courses)}
+             for _ in range(100)]
+    return "POST /enrollments/bulk", "POST", "/enrollments/bulk", {"enrollments": pairs}, token
+
+
+def op_members(fx, rng):
+    token, course_id = fx.member("lecturer", rng)
+    return "GET /courses/<id>/members", "GET", f"/courses/{course_id}/members", None, token
+
+
+def op_create_course(fx, rng):
+    _, token = fx.token("admin", rng)
+    course_id = fx.new_id("course")
+    return ("POST /courses", "POST", "/courses",
+            {"course_id": course_id, "name": f"Bench {course_id}", "lecturer_id": rng.choice(fx.lecturers)[0]},
+            token)
+
+
+def op_course_events(fx, rng):
+    return ("GET /courses/<id>/events", "GET", f"/courses/{rng.choice(fx.courses)}/events", None, None)
+
+
+def op_student_events(fx, rng):
+    student_id, token = fx.token("student", rng)
+    return ("GET /students/<id>/events", "GET",
+            f"/students/{student_id}/events?from=2025-02-01&to=2025-02-28", None, token)
+
+
+def op_dashboard(fx, rng):
+    student_id, token = fx.token("student", rng)
+    return "GET /students/<id>/dashboard", "GET", f"/students/{student_id}/dashboard", None, token
+
+
+def op_create_event(fx, rng):
+    token, course_id = fx.member("lecturer", rng)
+    return ("POST /courses/<id>/events", "POST", f"/courses/{course_id}/events",
+            {"title": "Bench event", "description": "", "event_date": "2025-03-01"}, token)
+
+
+def op_forums(fx, rng):
+    token, course_id = fx.member("student", rng)
+    return "GET /courses/<id>/forums", "GET", f"/courses/{course_id}/forums", None, token
+
+
+def op_threads(fx, rng):
+    token, forum_id = fx.member_forum(rng)
+    return "GET /forums/<id>/threads", "GET", f"/forums/{forum_id}/threads", None, token
+
+
+def op_thread_detail(fx, rng):
+    token, forum_id = fx.member_forum(rng)
+    threads = fx.forum_threads.get(forum_id)
+    if not threads:
+        return "GET /forums/<id>/threads", "GET", f"/forums/{forum_id}/threads", None, token
+    return ("GET /forums/<id>/threads/<id>", "GET", f"/forums/{forum_id}/threads/{rng.choice(threads)}",
+            None, token)
+
+
+def op_create_thread(fx, rng):
+    token, forum_id = fx.member_forum(rng)
+    return ("POST /forums/<id>/threads", "POST", f"/forums/{forum_id}/threads",
+            {"title": "Bench thread", "post": "Question about the reading"}, token)
+
+
+def op_content(fx, rng):
+    token, course_id = fx.member("student", rng)
+    return "GET /courses/<id>/content", "GET", f"/courses/{course_id}/content", None, token
+
+
+def op_grade_batch(fx, rng):
+    _, token = fx.token("lecturer", rng)
+    assignment_id, _ = rng.choice(fx.assignments)
+    grades = [{"student_id": rng.choice(fx.students)[0], "grade": rng.randint(40, 100)}
+              for _ in range(50)]
+    return ("POST /assignments/<id>/grades", "POST", f"/assignments/{assignment_id}/grades",
+            {"grades": grades}, token)
+
+
+def op_report(path):
+    def op(fx, rng):
+        return f"GET {path}", "GET", path, None, None
+    return op
+
+
+REPORT_OPS = [(1, op_report("/reports/top-students")), (1, op_report("/reports/popular-courses")),
+              (1, op_report("/reports/busy-students"))]
+
+WORKLOADS = {
+    "login-storm": [(95, op_login), (5, op_register)],
+    "enrollment-week": [(60, op_enroll), (5, op_bulk_enroll), (20, op_student_courses),
+                        (10, op_list_courses), (5, op_members)],
+    "report-polling": REPORT_OPS,
+    "forum-browsing": [(25, op_forums), (35, op_threads), (25, op_thread_detail), (5, op_create_thread),
+                       (10, op_content)],
+    "mixed": [(10, op_login), (1, op_register), (10, op_list_courses), (8, op_student_courses),
+              (3, op_lecturer_courses), (5, op_enroll), (1, op_bulk_enroll), (3, op_members),
+              (1, op_create_course), (8, op_course_events), (8, op_student_events), (1, op_create_event),
+              (4, op_dashboard), (8, op_forums), (8, op_threads), (4, op_thread_detail), (2, op_create_thread), (6, op_content),
+              (1, op_grade_batch)] + [(2, op) for _, op in REPORT_OPS],
+}
+
+
+# ==============================================
+# Driver
+# ==============================================
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / count, 3) if count else None,
+        "p50_ms": percentile(values, 0.50),
+        "p95_ms": percentile(values, 0.95),
+        "p99_ms": percentile(values, 0.99),
+        "max_ms": values[-1] if values else None,
+    }
+
+
+def mysql_questions():
+    """MySQL's global statement counter, or None if the server can't be reached"""
+    try:
+        import mysql.connector
+
+        db = mysql.connector.connect(**bench_connect_args())
+        cursor = db.cursor()
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
+        value = int(cursor.fetchone()[1])
+        cursor.close()
+        db.close()
+        return value
+    except Exception:
+        return None
+
+
+def drive(workload, client_factory, fixtures, clients, duration, warmup, seed):
+    """Run `clients` threads for warmup + duration seconds; returns per-route samples"""
+    weights = [weight for weight, _ in workload]
+    operations = [op for _, op in workload]
+    samples = {}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(clients + 1)
+    timing = {}
+
+    def client_loop(number):
+        rng = random.Random(seed * 1000 + number)
+        client = client_factory()
+        local = {}
+        start_barrier.wait()
+        measure_from = timing["start"] + warmup
+        stop_at = measure_from + duration
+        while True:
+            label, method, path, body, token = rng.choices(operations, weights)[0](fixtures, rng)
+            began = time.perf_counter()
+            if began >= stop_at:
+                break
+            try:
+                status, _ = client.request(method, path, body, token)
+            except Exception:
+                status = 599
+            ended = time.perf_counter()
+            if began >= measure_from:
+                latencies, errors = local.setdefault(label, ([], [0]))
+                latencies.append(round((ended - began) * 1000, 3))
+                if status >= 500:
+                    errors[0] += 1
+        with lock:
+            for label, (latencies, errors) in local.items():
+                merged = samples.setdefault(label, ([], [0]))
+                merged[0].extend(latencies)
+                merged[1][0] += errors[0]
+
+    threads = [threading.Thread(target=client_loop, args=(number,), daemon=True) for number in range(clients)]
+    for thread in threads:
+        thread.start()
+    timing["start"] = time.perf_counter()
+    start_barrier.wait()
+
+    time.sleep(warmup)
+    questions_before = mysql_questions()
+    for thread in threads:
+        thread.join()
+    questions_after = mysql_questions()
+    return samples, questions_before, questions_after
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    client_factory = make_client_factory(args)
+    fixtures = Fixtures()
+    fixtures.prepare(client_factory())
+
+    print(f"Running {args.workload}: {args.clients} clients, {args.warmup}s warmup + {args.duration}s")
+    samples, before, after = drive(WORKLOADS[args.workload], client_factory, fixtures,
+                                   args.clients, args.duration, args.warmup, args.seed)
+
+    routes = {label: summarize(latencies, errors[0], args.duration)
+              for label, (latencies, errors) in sorted(samples.items())}
+    every = [value for latencies, _ in samples.values() for value in latencies]
+    overall = summarize(every, sum(errors[0] for _, errors in samples.values()), args.duration)
+    if before is not None and after is not None and overall["requests"]:
+        # the counter also saw our own two probe statements
+        overall["queries_per_request"] = round((after - before - 2) / overall["requests"], 2)
+    else:
+        overall["queries_per_request"] = None
+
+    result = {
+        "workload": args.workload,
+        "target": "in-process" if args.in_process else args.url,
+        "clients": args.clients,
+        "duration_s": args.duration,
+        "warmup_s": args.warmup,
+        "seed": args.seed,
+        "revision": git_revision(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "overall": overall,
+        "routes": routes,
+    }
+    write_results(result, args.out_dir)
+    print_summary(result)
+    return result
+
+
+def write_results(result, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.join(out_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{result['workload']}")
+    with open(stem + ".json", "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    fields = ["route", "requests", "errors", "rps", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    with open(stem + ".csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fields)
+        writer.writeheader()
+        for route, stats in [("ALL", result["overall"])] + list(result["routes"].items()):
+            writer.writerow({"route": route, **{field: stats.get(field) for field in fields[1:]}})
+    print(f"Results written to {stem}.json and {stem}.csv")
+
+
+def print_summary(result):
+    print(f"{'route':36} {'reqs':>8} {'err':>5} {'rps':>9} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for route, stats in [("ALL", result["overall"])] + list(result["routes"].items()):
+        print(f"{route:36} {stats['requests']:>8} {stats['errors']:>5} {stats['rps']:>9} "
+              f"{_ms(stats['p50_ms'])} {_ms(stats['p95_ms'])} {_ms(stats['p99_ms'])}")
+    if result["overall"].get("queries_per_request") is not None:
+        print(f"queries/request: {result['overall']['queries_per_request']}")
+
+
+def _ms(value):
+    return f"{value:>8.1f}" if value is not None else f"{'-':>8}"
+
+
+# ==============================================
+# Comparing runs
+# ==============================================
+def compare(old_path, new_path, threshold):
+    """Print p95/rps changes per route; True if nothing regressed past threshold %"""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    ok = True
+    print(f"{'route':36} {'p95 old':>9} {'p95 new':>9} {'change':>8}   {'rps old':>9} {'rps new':>9} {'change':>8}")
+    rows = [("ALL", old["overall"], new["overall"])] + [
+        (route, old["routes"][route], new["routes"][route])
+        for route in sorted(set(old["routes"]) & set(new["routes"]))]
+    for route, before, after in rows:
+        p95 = _change(before["p95_ms"], after["p95_ms"])
+        rps = _change(before["rps"], after["rps"])
+        flag = ""
+        if (p95 is not None and p95 > threshold) or (rps is not None and rps < -threshold):
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{route:36} {_ms(before['p95_ms']):>9} {_ms(after['p95_ms']):>9} {_pct(p95)}   "
+              f"{before['rps']:>9} {after['rps']:>9} {_pct(rps)}{flag}")
+    return ok
+
+
+def _change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def _pct(value):
+    return f"{value:>+7.1f}%" if value is not None else f"{'-':>8}"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed, load-test and compare API benchmark runs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="recreate the bench database with generated data")
+    seed_parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    seed_parser.add_argument("--workers", type=int, default=1, help="generator processes; 0 = one per core")
+
+    run_parser = commands.add_parser("run", help="drive a workload and record the results")
+    run_parser.add_argument("--workload", choices=sorted(WORKLOADS), default="mixed")
+    run_parser.add_argument("--clients", type=int, default=8, help="concurrent client threads")
+    run_parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds first")
+    run_parser.add_argument("--url", default="http://localhost:5000")
+    run_parser.add_argument("--in-process", action="store_true",
+                            help="call app.py through Flask's test client instead of HTTP")
+    run_parser.add_argument("--seed", type=int, default=0, help="request mix random seed")
+    run_parser.add_argument("--out-dir", default=os.path.join(HERE, "bench_results"))
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=10.0,
+                                help="percent p95 increase / rps drop counted as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "seed":
+        seed(args.scale, args.workers or os.cpu_count())
+    elif args.command == "run":
+        run(args)
+    else:
+        sys.exit(0 if compare(args.old, args.new, args.threshold) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+"""Bulk output targets for generated seed data.
+
+Each writer takes rows table by table, in foreign-key order, and turns them
+into one of:
+
+    SqlWriter        multi-row INSERT statements on a text stream
+    DelimitedWriter  one CSV/TSV file per table plus a load.sql of LOAD DATA
+    DatabaseWriter   executemany() batches straight into MySQL
+
+All of them switch off foreign-key and unique checks for the duration of the
+load and report rows/sec progress on stderr. Loads that touch enrollments or
+submissions finish by rebuilding the report summary tables (reports.py).
+"""
+import os
+import sys
+import time
+
+import reports
+
+# Parents before children, as declared in Sql_table.sql
+TABLE_ORDER = [
+    "user",
+    "student_profile",
+    "course",
+    "student_course",
+    "calendar_event",
+    "forum",
+    "assignment",
+    "forum_post",
+    "reply",
+    "assignment_submission",
+    "course_content",
+    "course_resource",
+]
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Tables the report summaries are computed from
+REPORT_SOURCES = {"student_course", "assignment_submission"}
+
+DISABLE_CHECKS = ["SET FOREIGN_KEY_CHECKS = 0", "SET UNIQUE_CHECKS = 0"]
+ENABLE_CHECKS = ["SET UNIQUE_CHECKS = 1", "SET FOREIGN_KEY_CHECKS = 1"]
+
+_SQL_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    "'": "\\'",
+    "\n": "\\n",
+    "\r": "\\r",
+    "\0": "\\0",
+    "\x1a": "\\Z",
+})
+
+
+def sql_literal(value):
+    """Render a Python value as a MySQL literal"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).translate(_SQL_ESCAPES) + "'"
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Progress:
+    """Rows/sec reporting on stderr, at most once per `interval` seconds"""
+
+    def __init__(self, out=sys.stderr, interval=2.0, label=""):
+        self.out = out
+        self.interval = interval
+        self.label = label
+        self.total = 0
+        self.started = time.monotonic()
+
+    def table(self, table, rows):
+        """Pass `rows` through while counting them"""
+        start = last = time.monotonic()
+        count = 0
+        for row in rows:
+            count += 1
+            yield row
+            if count % 1000 == 0:
+                now = time.monotonic()
+                if now - last >= self.interval:
+                    self._report(table, count, now - start)
+                    last = now
+        self.total += count
+        self._report(table, count, time.monotonic() - start, done=True)
+
+    def _report(self, table, count, elapsed, done=False):
+        rate = count / elapsed if elapsed > 0 else 0.0
+        state = "done" if done else "..."
+        self.out.write(f"[{table}{self.label}] {count:,} rows {state} ({rate:,.0f} rows/s)\n")
+        self.out.flush()
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.total / elapsed if elapsed > 0 else 0.0
+        self.out.write(f"Loaded {self.total:,} rows{self.label} in {elapsed:.1f}s ({rate:,.0f} rows/s)\n")
+
+
+class BaseWriter:
+    """Common FK-order bookkeeping; subclasses implement _write"""
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, progress=None, refresh_reports=True):
+        self.batch_size = batch_size
+        self.progress = progress or Progress()
+        self.refresh_reports = refresh_reports
+        self.tables = set()
+        self._position = 0
+
+    @property
+    def needs_report_refresh(self):
+        return self.refresh_reports and bool(self.tables & REPORT_SOURCES)
+
+    def begin(self):
+        pass
+
+    def section(self, title):
+        pass
+
+    def write(self, table, columns, rows):
+        position = TABLE_ORDER.index(table)
+        if position < self._position:
+            raise ValueError(f"'{table}' written after one of its dependants; "
+                             f"expected order: {', '.join(TABLE_ORDER)}")
+        self._position = position
+        self.tables.add(table)
+        self._write(table, tuple(columns), self.progress.table(table, rows))
+
+    def _write(self, table, columns, rows):
+        raise NotImplementedError
+
+    def finish(self):
+        self.progress.summary()
+
+
+class SqlWriter(BaseWriter):
+    """Multi-row INSERT statements, `batch_size` rows per statement"""
+
+    def __init__(self, out=sys.stdout, close=False, **kwargs):
+        super().__init__(**kwargs)
+        self.out = out
+        self.close_out = close
+
+    def begin(self):
+        for statement in DISABLE_CHECKS + ["START TRANSACTION"]:
+            self.out.write(f"{statement};\n")
+
+    def section(self, title):
+        self.out.write(f"\n-- {title}\n")
+
+    def _write(self, table, columns, rows):
+        head = f"INSERT INTO {table} ({', '.join(columns)}) VALUES\n"
+        for batch in batched(rows, self.batch_size):
+            values = ",\n".join("(" + ", ".join(map(sql_literal, row)) + ")" for row in batch)
+            self.out.write(head + values + ";\n")
+
+    def finish(self):
+        if self.needs_report_refresh:
+            self.section("Rebuild Report Summaries")
+            for statement in reports.REBUILD_STATEMENTS:
+                self.out.write(f"{statement};\n")
+        for statement in ["COMMIT"] + ENABLE_CHECKS:
+            self.out.write(f"{statement};\n")
+        if self.close_out:
+            self.out.close()
+        else:
+            self.out.flush()
+        super().finish()
+
+
+def write_load_script(out_dir, files, delimiter=",", refresh_reports=True):
+    """Write out_dir/load.sql loading (table, filename, columns) files in FK order"""
+    terminator = "\\t" if delimiter == "\t" else delimiter
+    ordered = sorted(files, key=lambda entry: TABLE_ORDER.index(entry[0]))
+    with open(os.path.join(out_dir, "load.sql"), "w", encoding="utf-8") as f:
+        for statement in DISABLE_CHECKS:
+            f.write(f"{statement};\n")
+        for table, filename, columns in ordered:
+            f.write(
+                f"LOAD DATA LOCAL INFILE '{filename}' INTO TABLE {table}\n"
+                f"  CHARACTER SET utf8mb4\n"
+                f"  FIELDS TERMINATED BY '{terminator}' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY ''\n"
+                f"  LINES TERMINATED BY '\\n'\n"
+                f"  ({', '.join(columns)});\n"
+            )
+        if refresh_reports and REPORT_SOURCES & {entry[0] for entry in files}:
+            for statement in reports.REBUILD_STATEMENTS:
+                f.write(f"{statement};\n")
+        for statement in ENABLE_CHECKS:
+            f.write(f"{statement};\n")
+
+
+class DelimitedWriter(BaseWriter):
+    """<table>.csv / <table>.tsv files and a load.sql that LOADs them in order
+
+    Strings are enclosed in double quotes (doubled when embedded) and NULL is
+    written as a bare NULL, which LOAD DATA reads back as SQL NULL. Parallel
+    shards pass a `suffix` and script=False, and the caller writes one
+    load.sql for all of them with write_load_script().
+    """
+
+    def __init__(self, out_dir, delimiter=",", suffix="", script=True, **kwargs):
+        super().__init__(**kwargs)
+        self.out_dir = out_dir
+        self.delimiter = delimiter
+        self.extension = "tsv" if delimiter == "\t" else "csv"
+        self.suffix = suffix
+        self.script = script
+        self.files = []
+
+    def begin(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+
+    def _field(self, value):
+        if value is None:
+            return "NULL"
+        if isinstance(value, bool):
+            return "1" if value else "0"
+        if isinstance(value, (int, float)):
+            return repr(value)
+        return '"' + str(value).replace('"', '""') + '"'
+
+    def _write(self, table, columns, rows):
+        filename = f"{table}{self.suffix}.{self.extension}"
+        if any(entry[1] == filename for entry in self.files):
+            mode = "a"
+        else:
+            self.files.append((table, filename, columns))
+            mode = "w"
+        with open(os.path.join(self.out_dir, filename), mode, encoding="utf-8", newline="") as f:
+            for batch in batched(rows, self.batch_size):
+                f.write("".join(self.delimiter.join(map(self._field, row)) + "\n" for row in batch))
+
+    def finish(self):
+        if self.script:
+            write_load_script(self.out_dir, self.files, self.delimiter, self.refresh_reports)
+        super().finish()
+
+
+class DatabaseWriter(BaseWriter):
+    """executemany() straight into MySQL, committing every `batch_size` rows"""
+
+    def __init__(self, connect_args, **kwargs):
+        super().__init__(**kwargs)
+        self.connect_args = connect_args
+        self.db = None
+
+    def begin(self):
+        import mysql.connector
+
+        self.db = mysql.connector.connect(autocommit=False, **self.connect_args)
+        cursor = self.db.cursor()
+        for statement in DISABLE_CHECKS:
+            cursor.execute(statement)
+        cursor.close()
+
+    def _write(self, table, columns, rows):
+        statement = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                     f"VALUES ({', '.join(['%s'] * len(columns))})")
+        cursor = self.db.cursor()
+        try:
+            for batch in batched(rows, self.batch_size):
+                cursor.executemany(statement, batch)
+                self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def finish(self):
+        cursor = self.db.cursor()
+        try:
+            if self.needs_report_refresh:
+                reports.rebuild(cursor)
+                self.db.commit()
+            for statement in ENABLE_CHECKS:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+            self.db.close()
+        super().finish()
@@ -0,0 +1,99 @@
+"""Response compression negotiated from Accept-Encoding.
+
+Responses of a compressible type and at least `min_bytes` long are sent
+with Brotli (when the brotli package is installed) or gzip, whichever the
+client prefers by q-value; Brotli wins ties, being smaller for JSON at
+similar speed. Smaller responses go out as they are, since compressing
+them costs more time than it saves on the wire.
+
+Streamed responses (exports) and file downloads are never compressed, so
+they keep streaming. A compressed response's ETag becomes weak: the bytes
+differ per encoding but the representation is the same, so If-None-Match
+keeps working with the response cache.
+"""
+import gzip
+import threading
+
+from flask import request
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE = frozenset(["application/json", "application/x-ndjson", "text/plain", "text/html", "text/csv"])
+
+
+class Compressor:
+    def __init__(self, min_bytes=1024, gzip_level=6, brotli_quality=4):
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ("br", "gzip") if brotli is not None else ("gzip",)
+        self._lock = threading.Lock()
+        self.compressed = {encoding: 0 for encoding in self.encodings}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def init_app(self, app):
+        app.after_request(self.compress_response)
+
+    def negotiate(self, accept_encoding):
+        """The encoding to use for an Accept-Encoding header value, or None"""
+        if not accept_encoding:
+            return None
+        accepted = parse_accept_header(accept_encoding)
+        best, best_quality = None, 0
+        for encoding in self.encodings:
+            quality = accepted.quality(encoding)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def eligible(self, status, mimetype, size, headers):
+        """Whether a finished, non-streamed response should be compressed"""
+        return (200 <= status < 300 and status != 204 and size >= self.min_bytes
+                and mimetype in COMPRESSIBLE and 'Content-Encoding' not in headers)
+
+    def encode(self, body, encoding):
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        with self._lock:
+            self.compressed[encoding] += 1
+            self.bytes_in += len(body)
+            self.bytes_out += len(compressed)
+        return compressed
+
+    def compress_response(self, response):
+        """after_request hook for Flask responses"""
+        if response.direct_passthrough or response.is_streamed or (
+                response.mimetype not in COMPRESSIBLE and response.status_code != 304):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate(request.headers.get('Accept-Encoding'))
+        if encoding is not None and response.status_code == 304:
+            _weaken_etag(response)  # as on the compressed 200 the client revalidates
+        if encoding is None or not self.eligible(response.status_code, response.mimetype,
+                                                 response.calculate_content_length() or 0, response.headers):
+            return response
+        response.set_data(self.encode(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+        _weaken_etag(response)
+        return response
+
+    def stats(self):
+        return {
+            **{f"{encoding}_responses": count for encoding, count in self.compressed.items()},
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+        }
+
+
+def _weaken_etag(response):
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
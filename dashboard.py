@@ -0,0 +1,187 @@
+"""The student dashboard: courses, upcoming events, recent content and recent
+forum activity in one response.
+
+The student's courses are read first (one primary-key range read); each
+other section is then one query over all of those courses at once
+(`course_id IN (...)`), and the sections run side by side on a thread pool,
+each on its own pooled connection. The response takes about as long as the
+slowest section. Without an executor (the caller is at its cap of
+concurrent dashboards) they run one after another on the caller's cursor
+instead, taking no further connections.
+
+Every section has the same deadline. A section that misses it, or fails,
+is returned as null and named in `sections_failed`; the others are still
+returned. The deadline is also set as the section's MAX_EXECUTION_TIME so
+MySQL abandons the query instead of holding the connection, and the
+caller's connect() should give up on a checkout by then too, so a busy
+pool fails the section rather than stalling the thread.
+
+Nothing here imports Flask; the caller supplies the executor and a way to
+check out connections.
+"""
+import time
+from concurrent.futures import wait
+
+TIMEOUT = "timeout"
+ERROR = "error"
+
+_QUERY_TIMEOUT = 3024  # ER_QUERY_TIMEOUT: MAX_EXECUTION_TIME exceeded
+
+
+class Dashboard:
+    """Section results plus which sections are missing and why"""
+
+    def __init__(self, sections, failed):
+        self.sections = sections
+        self.failed = failed
+
+    def envelope(self):
+        return self.sections, {"partial": bool(self.failed), "sections_failed": self.failed}
+
+
+# ==============================================
+# Sections
+# ==============================================
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def enrolled_courses(cursor, student_id):
+    cursor.execute(
+        """SELECT c.* FROM student_course sc
+           JOIN course c ON c.course_id = sc.course_id
+           WHERE sc.student_id = %s
+           ORDER BY sc.course_id""",
+        (student_id,)
+    )
+    return cursor.fetchall()
+
+
+def upcoming_events(cursor, course_ids, today, limit):
+    """The next `limit` events from today on, across the courses"""
+    cursor.execute(
+        f"""SELECT * FROM calendar_event
+            WHERE course_id IN ({_placeholders(course_ids)}) AND event_date >= %s
+            ORDER BY event_date, event_id
+            LIMIT %s""",
+        (*course_ids, today, limit)
+    )
+    return cursor.fetchall()
+
+
+def recent_content(cursor, course_ids, limit):
+    """The `limit` most recently added content items (highest ids), without file bodies"""
+    cursor.execute(
+        f"""SELECT content_id, course_id, section, title, link, description
+            FROM course_content
+            WHERE course_id IN ({_placeholders(course_ids)})
+            ORDER BY content_id DESC
+            LIMIT %s""",
+        (*course_ids, limit)
+    )
+    return cursor.fetchall()
+
+
+def forum_activity(cursor, course_ids, limit):
+    """The `limit` threads with the latest posts or replies in the courses' forums"""
+    cursor.execute(
+        f"""SELECT fp.post_id, fp.title, fp.forum_id, f.name AS forum_name, f.course_id,
+                   fp.user_id, fp.reply_count,
+                   COALESCE(fp.last_activity_at, fp.created_at) AS last_activity_at
+            FROM forum f
+            JOIN forum_post fp ON fp.forum_id = f.forum_id
+            WHERE f.course_id IN ({_placeholders(course_ids)})
+            ORDER BY last_activity_at DESC, fp.post_id DESC
+            LIMIT %s""",
+        (*course_ids, limit)
+    )
+    return cursor.fetchall()
+
+
+def load(cursor, student_id, executor, connect, today, limit, timeout, logger=None):
+    """Dashboard for a student: courses on `cursor`, the other sections via gather(),
+    or via run_in_turn() on `cursor` when executor is None"""
+    courses = enrolled_courses(cursor, student_id)
+    course_ids = [course['course_id'] for course in courses]
+    if not course_ids:
+        return Dashboard({"courses": [], "upcoming_events": [], "recent_content": [],
+                          "forum_activity": []}, {})
+    sections = {
+        "upcoming_events": lambda section_cursor: upcoming_events(section_cursor, course_ids, today, limit),
+        "recent_content": lambda section_cursor: recent_content(section_cursor, course_ids, limit),
+        "forum_activity": lambda section_cursor: forum_activity(section_cursor, course_ids, limit),
+    }
+    if executor is None:
+        results, failed = run_in_turn(cursor, sections, timeout, logger)
+    else:
+        results, failed = gather(executor, connect, sections, timeout, logger)
+    return Dashboard({"courses": courses, **results}, failed)
+
+
+# ==============================================
+# Running Sections Concurrently
+# ==============================================
+def _with_deadline(cursor, callback, timeout_ms):
+    cursor.execute("SET SESSION MAX_EXECUTION_TIME = %s", (timeout_ms,))
+    try:
+        return callback(cursor)
+    finally:
+        cursor.execute("SET SESSION MAX_EXECUTION_TIME = DEFAULT")
+
+
+def _run_section(connect, callback, timeout_ms):
+    db = connect()
+    cursor = None
+    try:
+        cursor = db.cursor(dictionary=True)
+        return _with_deadline(cursor, callback, timeout_ms)
+    finally:
+        if cursor:
+            cursor.close()
+        db.close()
+
+
+def gather(executor, connect, callbacks, timeout, logger=None):
+    """Run {name: callback(cursor)} concurrently, each on a connection from
+    connect(), for at most `timeout` seconds in all.
+
+    Returns ({name: result or None}, {name: TIMEOUT or ERROR}).
+    """
+    timeout_ms = max(1, int(timeout * 1000))
+    futures = {name: executor.submit(_run_section, connect, callback, timeout_ms)
+               for name, callback in callbacks.items()}
+    started = time.perf_counter()
+    wait(futures.values(), timeout=timeout)
+
+    results, failed = {}, {}
+    for name, future in futures.items():
+        results[name] = None
+        if not future.done():
+            future.cancel()  # no-op if it already started; MAX_EXECUTION_TIME stops the query
+            failed[name] = TIMEOUT
+            if logger:
+                logger.warning(f"Dashboard section {name} timed out after "
+                               f"{(time.perf_counter() - started) * 1000:.0f}ms")
+        elif future.exception() is not None:
+            failed[name] = ERROR
+            if logger:
+                logger.error(f"Dashboard section {name} failed: {str(future.exception())}")
+        else:
+            results[name] = future.result()
+    return results, failed
+
+
+def run_in_turn(cursor, callbacks, timeout, logger=None):
+    """gather() without threads: each callback on `cursor` in turn, each with
+    the full `timeout` as its MAX_EXECUTION_TIME"""
+    timeout_ms = max(1, int(timeout * 1000))
+    results, failed = {}, {}
+    for name, callback in callbacks.items():
+        results[name] = None
+        try:
+            results[name] = _with_deadline(cursor, callback, timeout_ms)
+        except Exception as e:
+            failed[name] = TIMEOUT if getattr(e, "errno", None) == _QUERY_TIMEOUT else ERROR
+            if logger:
+                logger.error(f"Dashboard section {name} failed: {str(e)}")
+    return results, failed
@@ -0,0 +1,471 @@
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error, InterfaceError
+
+# ==============================================
+# Connection Pool
+# ==============================================
+# mysql.connector ships a MySQLConnectionPool, but it has no overflow,
+# no checkout timeout, no liveness checks and no stats, so we keep our own.
+
+
+class PoolTimeout(Error):
+    """Raised when no connection could be checked out in time"""
+
+
+class _PoolEntry:
+    """A raw connection plus the bookkeeping the pool needs for it"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.statements = {}  # prepared cursors (queries.py), gone with the connection
+
+
+class PooledConnection:
+    """Checked-out connection. close() hands it back to the pool."""
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+        self._discard = False
+
+    @property
+    def raw(self):
+        return self._entry.raw
+
+    @property
+    def statements(self):
+        return self._entry.statements
+
+    def invalidate(self):
+        """Make close() throw the connection away instead of reusing it"""
+        self._discard = True
+
+    def close(self):
+        if self._entry is None:
+            return
+        entry, self._entry = self._entry, None
+        self._pool._release(entry, self._discard)
+
+    def __getattr__(self, name):
+        if self._entry is None:
+            raise InterfaceError(msg="Connection already returned to the pool")
+        return getattr(self._entry.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """Thread-safe MySQL connection pool with overflow and health checks
+
+    size          connections kept open while idle
+    max_overflow  extra connections allowed under load, closed on release
+    timeout       seconds to wait for a free connection before PoolTimeout
+    recycle       seconds after which a connection is replaced (0 = never)
+    ping_interval ping connections idle for at least this many seconds
+                  before handing them out (0 = ping on every checkout)
+    """
+
+    def __init__(self, connect_args, size=10, max_overflow=10, timeout=30,
+                 recycle=3600, ping_interval=0, logger=None):
+        self.connect_args = dict(connect_args)
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self.logger = logger
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._open = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._invalidated = 0
+        self._checkout_wait_total = 0.0
+        self._checkout_wait_max = 0.0
+
+    # ------------------------------------------
+    # Checkout / release
+    # ------------------------------------------
+    def connect(self, timeout=None):
+        """Check out a live connection, waiting up to `timeout` seconds (default:
+        the pool's)"""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        entry = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    # LIFO: reuse the most recently used connection so idle
+                    # ones at the bottom can age out through `recycle`.
+                    entry = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(msg=f"No database connection available after {timeout}s "
+                                          f"({self._in_use} in use, {self._waiting} waiting)")
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+
+        try:
+            entry = self._create() if entry is None else self._check(entry)
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._checkout_wait_total += waited
+            self._checkout_wait_max = max(self._checkout_wait_max, waited)
+        return PooledConnection(self, entry)
+
+    def _release(self, entry, discard=False):
+        raw = entry.raw
+        if not discard:
+            try:
+                if raw.unread_result:
+                    raw.consume_results()
+                if raw.in_transaction:
+                    raw.rollback()
+            except Error:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or len(self._idle) >= self.size:
+                self._open -= 1
+                if discard:
+                    self._invalidated += 1
+            else:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+                raw = None
+            self._cond.notify()
+
+        if raw is not None:
+            self._close_raw(raw)
+
+    # ------------------------------------------
+    # Connection lifecycle
+    # ------------------------------------------
+    def _create(self):
+        raw = mysql.connector.connect(**self.connect_args)
+        with self._cond:
+            self._created += 1
+        return _PoolEntry(raw)
+
+    def _check(self, entry):
+        """Return `entry` if usable, otherwise a fresh replacement"""
+        now = time.monotonic()
+        if self.recycle and now - entry.created_at > self.recycle:
+            self._close_raw(entry.raw)
+            with self._cond:
+                self._recycled += 1
+            return self._create()
+
+        if now - entry.last_used >= self.ping_interval:
+            try:
+                entry.raw.ping(reconnect=False)
+            except Error as e:
+                if self.logger:
+                    self.logger.warning(f"Dropping dead pooled connection: {str(e)}")
+                self._close_raw(entry.raw)
+                with self._cond:
+                    self._invalidated += 1
+                return self._create()
+        return entry
+
+    def _close_raw(self, raw):
+        try:
+            raw.close()
+        except Error:
+            pass
+
+    def dispose(self):
+        """Close every idle connection (checked-out ones close on release)"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for entry in idle:
+            self._close_raw(entry.raw)
+
+    # ------------------------------------------
+    # Stats
+    # ------------------------------------------
+    @property
+    def in_use(self):
+        return self._in_use
+
+    def stats(self):
+        with self._cond:
+            avg_wait = self._checkout_wait_total / self._checkouts if self._checkouts else 0.0
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "recycled": self._recycled,
+                "invalidated": self._invalidated,
+                "avg_checkout_ms": round(avg_wait * 1000, 3),
+                "max_checkout_ms": round(self._checkout_wait_max * 1000, 3),
+            }
+
+
+# ==============================================
+# Read Replicas
+# ==============================================
+# Reads that can tolerate a little staleness go to replicas; everything else
+# (writes, and reads by a user who has just written) stays on the primary.
+# Each replica is checked every `check_interval` seconds and only used while
+# it replicates and is no more than `max_lag` seconds behind.
+#
+# To try it locally, run a second MySQL instance replicating from the first
+# (e.g. on port 3307) and start the app with DB_REPLICAS=127.0.0.1:3307; the
+# routing counters and per-replica lag are in GET /health/db. The app's DB
+# user needs REPLICATION CLIENT on the replicas for the lag check.
+
+
+class _Replica:
+    """A replica's pool plus what the lag monitor last saw of it"""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.usable = False  # until the first check
+        self.lag = None
+        self.state = "unchecked"
+        self.reads = 0
+
+
+class ReplicaSet:
+    """Routes connections between a primary pool and replica pools
+
+    replicas       {name: ConnectionPool}
+    selection      'round_robin' or 'least_busy' (fewest connections in use)
+    max_lag        seconds of replication lag after which a replica is skipped
+    check_interval seconds between replication lag checks
+    """
+
+    SELECTIONS = ("round_robin", "least_busy")
+
+    def __init__(self, primary, replicas=None, selection="round_robin", max_lag=5,
+                 check_interval=2, logger=None):
+        if selection not in self.SELECTIONS:
+            raise ValueError(f"Unknown replica selection {selection!r}")
+        self.primary = primary
+        self.replicas = [_Replica(name, pool) for name, pool in (replicas or {}).items()]
+        self.selection = selection
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.logger = logger
+        # A write is visible on a usable replica after at most max_lag
+        # seconds, plus however long the replica may have fallen behind
+        # since its last check.
+        self.read_your_writes_window = max_lag + check_interval
+
+        self._lock = threading.Lock()
+        self._next = 0
+        self._writers = {}
+        self._counts = {
+            "primary_writes": 0,
+            "primary_reads": 0,
+            "read_your_writes": 0,
+            "replica_reads": 0,
+            "fallback_lagging": 0,
+            "fallback_unavailable": 0,
+        }
+        self._stopped = threading.Event()
+        if self.replicas:
+            threading.Thread(target=self._monitor, name="replica-lag", daemon=True).start()
+
+    # ------------------------------------------
+    # Routing
+    # ------------------------------------------
+    def connect(self, read_only=False, writer=None, timeout=None):
+        """A connection to a usable replica for read_only work, else the primary
+
+        `writer` identifies who the read is for; reads by someone who wrote
+        within read_your_writes_window stay on the primary. `timeout` is the
+        checkout timeout, as for ConnectionPool.connect().
+        """
+        if not read_only:
+            return self._primary("primary_writes", timeout)
+        replica, reason = self.choose(writer)
+        if replica is None:
+            return self._primary(reason, timeout)
+        try:
+            connection = replica.pool.connect(timeout)
+        except Error as e:
+            self.unreachable(replica, e)
+            return self._primary("fallback_unavailable", timeout)
+        self.count("replica_reads", replica)
+        return connection
+
+    def choose(self, writer=None, busy=None):
+        """(replica, None) for a read that may go to `replica`, else (None, reason)
+        for one that must use the primary; nothing is counted
+
+        For callers with their own pools per replica (asgi_app.py), which then
+        count() the outcome. `busy(replica)` is the share of its connections
+        in use, for least_busy; by default that of replica.pool.
+        """
+        if not self.replicas:
+            return None, "primary_reads"
+        if writer is not None and self.wrote_recently(writer):
+            return None, "read_your_writes"
+        candidates = [replica for replica in self.replicas if replica.usable]
+        if not candidates:
+            lagging = any(replica.state in ("lagging", "stopped") for replica in self.replicas)
+            return None, "fallback_lagging" if lagging else "fallback_unavailable"
+        return self._select(candidates, busy), None
+
+    def count(self, reason, replica=None):
+        """Record where a connection went: a reason from choose(), or
+        'replica_reads' with the replica"""
+        with self._lock:
+            self._counts[reason] += 1
+            if replica is not None:
+                replica.reads += 1
+
+    def unreachable(self, replica, error):
+        """Take a replica that refused a connection out of rotation until the
+        next lag check finds it reachable"""
+        self._mark(replica, False, None, "unreachable", error)
+
+    def _primary(self, reason, timeout=None):
+        connection = self.primary.connect(timeout)
+        self.count(reason)
+        return connection
+
+    def _select(self, candidates, busy=None):
+        if self.selection == "least_busy":
+            busy = busy or (lambda replica: replica.pool.in_use / max(replica.pool.size, 1))
+            return min(candidates, key=busy)
+        with self._lock:
+            self._next += 1
+            return candidates[self._next % len(candidates)]
+
+    # ------------------------------------------
+    # Read-your-writes
+    # ------------------------------------------
+    def record_write(self, writer):
+        """Keep `writer`'s reads on the primary until replicas have caught up"""
+        if not self.replicas:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if len(self._writers) >= 10000:
+                self._writers = {key: until for key, until in self._writers.items() if until > now}
+            self._writers[writer] = now + self.read_your_writes_window
+
+    def wrote_recently(self, writer):
+        until = self._writers.get(writer)
+        return until is not None and until > time.monotonic()
+
+    # ------------------------------------------
+    # Lag monitor
+    # ------------------------------------------
+    def _monitor(self):
+        while not self._stopped.is_set():
+            for replica in self.replicas:
+                self.check(replica)
+            self._stopped.wait(self.check_interval)
+
+    def check(self, replica):
+        """Measure `replica`'s replication lag and take it in or out of rotation"""
+        try:
+            connection = replica.pool.connect()
+        except Error as e:
+            self._mark(replica, False, None, "unreachable", e)
+            return
+        try:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")
+                except Error:  # before MySQL 8.0.22
+                    cursor.execute("SHOW SLAVE STATUS")
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        except Error as e:
+            connection.invalidate()
+            self._mark(replica, False, None, "unreachable", e)
+            return
+        finally:
+            connection.close()
+
+        if not rows:
+            # Not replicating from anything, so nothing to lag behind
+            self._mark(replica, True, 0, "ok")
+            return
+        row = rows[0]
+        lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+        if lag is None:  # replication threads stopped
+            self._mark(replica, False, None, "stopped")
+        elif lag > self.max_lag:
+            self._mark(replica, False, lag, "lagging")
+        else:
+            self._mark(replica, True, lag, "ok")
+
+    def _mark(self, replica, usable, lag, state, error=None):
+        if self.logger and replica.usable and not usable:
+            detail = f": {str(error)}" if error is not None else f" (lag {lag}s)" if lag is not None else ""
+            self.logger.warning(f"Replica {replica.name} out of rotation, {state}{detail}")
+        elif self.logger and usable and replica.state not in ("ok", "unchecked"):
+            self.logger.info(f"Replica {replica.name} back in rotation (lag {lag}s)")
+        replica.usable, replica.lag, replica.state = usable, lag, state
+
+    def close(self):
+        """Stop the lag monitor and close idle connections everywhere"""
+        self._stopped.set()
+        self.primary.dispose()
+        for replica in self.replicas:
+            replica.pool.dispose()
+
+    # ------------------------------------------
+    # Stats
+    # ------------------------------------------
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            replicas = {replica.name: {"state": replica.state, "lag_seconds": replica.lag,
+                                       "reads": replica.reads, "in_use": replica.pool.in_use}
+                        for replica in self.replicas}
+        return {**counts, "selection": self.selection, "max_lag_seconds": self.max_lag,
+                "replicas_usable": sum(1 for replica in self.replicas if replica.usable),
+                "replicas": replicas}
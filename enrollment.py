@@ -0,0 +1,153 @@
+"""Enrolling students in courses, one pair or a whole cohort at a time.
+
+Duplicates are resolved by the student_course primary key: rows go in with
+INSERT ... ON DUPLICATE KEY UPDATE, and since the update is a no-op MySQL
+reports 0 affected rows for an existing enrollment and 1 for a new one.
+There is no SELECT-then-INSERT, so concurrent requests cannot race.
+"""
+import csv
+import io
+
+import reports
+
+# Invalid rows echoed back in a bulk response; the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+_INSERT_HEAD = "INSERT INTO student_course (student_id, course_id) VALUES "
+_INSERT_TAIL = " ON DUPLICATE KEY UPDATE course_id = course_id"
+
+
+class EnrollmentBatch:
+    """Counts for a bulk enrollment plus a sample of the rejected rows"""
+
+    def __init__(self, received, inserted, skipped, errors, students=(), courses=(), enrolled=()):
+        self.received = received
+        self.inserted = inserted
+        self.skipped = skipped
+        self.errors = errors
+        self.enrolled = enrolled  # valid (student_id, course_id) pairs, new or already there
+        # Whose summaries need recounting (reports.refresh_enrollment_stats)
+        self.students = sorted(students)
+        self.courses = sorted(courses)
+
+    def envelope(self):
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "invalid": len(self.errors),
+        }, {"errors": self.errors[:MAX_REPORTED_ERRORS]}
+
+
+def enroll_one(cursor, student_id, course_id):
+    """Insert one enrollment; False if the student was already enrolled"""
+    cursor.execute(_INSERT_HEAD + "(%s, %s)" + _INSERT_TAIL, (student_id, course_id))
+    if cursor.rowcount == 0:
+        return False
+    reports.record_enrollment(cursor, student_id, course_id)
+    return True
+
+
+def parse_pairs(entries):
+    """[{"student_id", "course_id"}, ...] -> ([(student_id, course_id)], errors)"""
+    pairs, errors = [], []
+    for row, entry in enumerate(entries, start=1):
+        pair = _pair(entry.get('student_id'), entry.get('course_id')) if isinstance(entry, dict) else None
+        if pair is None:
+            errors.append({"row": row, "error": "student_id and course_id must be integers"})
+        else:
+            pairs.append(pair)
+    return pairs, errors
+
+
+def parse_csv(text):
+    """A student_id,course_id CSV (header row required) -> (pairs, errors)"""
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or not {'student_id', 'course_id'} <= {
+            name.strip() for name in reader.fieldnames}:
+        raise ValueError("CSV header must include student_id and course_id")
+    pairs, errors = [], []
+    for row, record in enumerate(reader, start=2):
+        record = {key.strip(): value for key, value in record.items() if key}
+        pair = _pair(_int(record.get('student_id')), _int(record.get('course_id')))
+        if pair is None:
+            errors.append({"row": row, "error": "student_id and course_id must be integers"})
+        else:
+            pairs.append(pair)
+    return pairs, errors
+
+
+def _int(value):
+    try:
+        return int(value.strip())
+    except (AttributeError, ValueError):
+        return None
+
+
+def _pair(student_id, course_id):
+    if any(not isinstance(value, int) or isinstance(value, bool) for value in (student_id, course_id)):
+        return None
+    return student_id, course_id
+
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def _existing(cursor, query, ids, chunk_size):
+    """The subset of `ids` that `query` (selecting `id`) finds"""
+    found = set()
+    ids = sorted(ids)
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        cursor.execute(query.format(placeholders=_placeholders(chunk)), tuple(chunk))
+        found.update(row['id'] for row in cursor.fetchall())
+    return found
+
+
+def enroll_many(cursor, pairs, errors=(), batch_size=1000):
+    """Insert enrollment pairs in multi-row batches.
+
+    The report summaries of the students and courses involved are left for
+    the caller to recount, e.g. in a background job after commit. Pairs
+    naming an unknown student or course are rejected up front rather than
+    failing the whole batch on a foreign key error.
+    """
+    errors = list(errors)
+    received = len(pairs) + len(errors)
+
+    students = _existing(cursor,
+                         "SELECT user_id AS id FROM user WHERE role = 'student' AND user_id IN ({placeholders})",
+                         {student_id for student_id, _ in pairs}, batch_size)
+    courses = _existing(cursor, "SELECT course_id AS id FROM course WHERE course_id IN ({placeholders})",
+                        {course_id for _, course_id in pairs}, batch_size)
+
+    valid = []
+    seen = set()
+    skipped = 0
+    for student_id, course_id in pairs:
+        if student_id not in students:
+            errors.append({"student_id": student_id, "course_id": course_id, "error": "Unknown student"})
+        elif course_id not in courses:
+            errors.append({"student_id": student_id, "course_id": course_id, "error": "Unknown course"})
+        elif (student_id, course_id) in seen:
+            skipped += 1  # repeated within the request
+        else:
+            seen.add((student_id, course_id))
+            valid.append((student_id, course_id))
+
+    inserted = 0
+    for start in range(0, len(valid), batch_size):
+        batch = valid[start:start + batch_size]
+        cursor.execute(
+            _INSERT_HEAD + ", ".join(["(%s, %s)"] * len(batch)) + _INSERT_TAIL,
+            tuple(value for pair in batch for value in pair)
+        )
+        inserted += cursor.rowcount
+    skipped += len(valid) - inserted
+
+    if not inserted:
+        return EnrollmentBatch(received, inserted, skipped, errors, enrolled=valid)
+    return EnrollmentBatch(received, inserted, skipped, errors,
+                           {student_id for student_id, _ in valid}, {course_id for _, course_id in valid},
+                           valid)
@@ -0,0 +1,279 @@
+"""Run EXPLAIN on every query the API issues and fail on full table scans.
+
+Queries are found by reading the source, not by running the app:
+cursor.execute(...) / executemany(...), keyset_page(...) and _report(...)
+calls in app.py, asgi_app.py and the query modules they use.
+SQL built from string literals, f-strings, `+` and local variables
+(including `where += ...`) is reconstructed; anything else is listed as skipped. Placeholders get dummy
+values of a plausible type, which is all EXPLAIN needs. The statements
+registered in queries.py are taken from the registry itself, listed by name.
+
+    python explain_check.py [--min-rows N] [files ...]
+
+A plan step with access type ALL over at least --min-rows estimated rows
+fails the check. Deliberate scans (e.g. the report rebuild) are exempted
+with a `# explain: full-scan-ok` comment on the call's first line. The page
+queries in INDEX_ORDER must also read their rows in ORDER BY order from an
+index: a filesort there means every page sorts the whole filtered set.
+Connection settings come from the DB_* environment variables, as for
+migrate.py; run it against a database loaded by Insert_Generator.py.
+"""
+import argparse
+import ast
+import os
+import re
+import sys
+
+from migrate import connect_args_from_env
+
+DEFAULT_FILES = ["app.py", "grading.py", "enrollment.py", "reports.py", "forums.py",
+                 "dashboard.py", "asgi_app.py"]
+DEFAULT_MIN_ROWS = 1000
+ALLOW_MARKER = "explain: full-scan-ok"
+# Registered page queries whose ORDER BY an index serves (migration 0001)
+INDEX_ORDER = {"course.list", "event.by_course", "thread.by_forum"}
+
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|INSERT\s+INTO\s+\w+\s*\([^)]*\)\s*SELECT|WITH)\b",
+                          re.I | re.S)
+_DATE_PARAM = re.compile(r"(\w*date\w*|\w*_at)\s*(=|<=|>=|<|>)\s*%s", re.I)
+
+
+class Unresolved(Exception):
+    """SQL text that cannot be rebuilt from the source alone"""
+
+
+class Query:
+    def __init__(self, path, line, sql, allowed, index_order=False):
+        self.path = path
+        self.line = line
+        self.sql = sql
+        self.allowed = allowed
+        self.index_order = index_order  # a filesort fails the check
+
+    @property
+    def location(self):
+        return f"{os.path.basename(self.path)}:{self.line}"
+
+
+class _Scope:
+    """String values assigned to local names in one function (or at module
+    level, for a module), in source order"""
+
+    def __init__(self, function, outer=None):
+        self.outer = outer
+        self.values = {}
+        nodes = function.body if isinstance(function, ast.Module) else ast.walk(function)
+        for node in nodes:
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 \
+                    and isinstance(node.targets[0], ast.Name):
+                self._record(node.targets[0].id, node.value, append=False)
+            elif isinstance(node, ast.AugAssign) and isinstance(node.op, ast.Add) \
+                    and isinstance(node.target, ast.Name):
+                self._record(node.target.id, node.value, append=True)
+
+    def _record(self, name, value, append):
+        try:
+            text = resolve(value, self)
+        except Unresolved:
+            return
+        if append and name in self.values:
+            self.values[name] += text
+        elif not append:
+            self.values[name] = text
+
+    def lookup(self, name):
+        if name in self.values:
+            return self.values[name]
+        if self.outer is not None:
+            return self.outer.lookup(name)
+        raise Unresolved(name)
+
+
+def resolve(node, scope):
+    """Rebuild the SQL text of an expression, with %s for interpolated parts"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Constant) and type(node.value) is int:
+        return str(node.value)
+    if isinstance(node, ast.JoinedStr):
+        return "".join(value.value if isinstance(value, ast.Constant) else resolve(value.value, scope)
+                       for value in node.values)
+    if isinstance(node, ast.Call):
+        return _placeholder_list(node)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        return resolve(node.left, scope) + resolve(node.right, scope)
+    if isinstance(node, ast.Name) and scope is not None:
+        return scope.lookup(node.id)
+    raise Unresolved(ast.unparse(node))
+
+
+def _placeholder_list(node):
+    """One repetition of a generated placeholder list, e.g. ", ".join(["%s"] * n)"""
+    func = node.func
+    if isinstance(func, ast.Name) and func.id == "_placeholders":
+        return "%s"
+    if isinstance(func, ast.Attribute) and func.attr == "join" and node.args:
+        items = node.args[0]
+        if isinstance(items, ast.BinOp) and isinstance(items.op, ast.Mult):
+            items = items.left
+        if isinstance(items, ast.List) and len(items.elts) == 1 \
+                and isinstance(items.elts[0], ast.Constant) and "%s" in items.elts[0].value:
+            return items.elts[0].value
+    raise Unresolved(ast.unparse(node))
+
+
+def _order_by(node):
+    columns = []
+    for element in getattr(node, "elts", []):
+        if isinstance(element, ast.Tuple) and isinstance(element.elts[0], ast.Constant):
+            columns.append(element.elts[0].value)
+        else:
+            raise Unresolved(ast.unparse(node))
+    if not columns:
+        raise Unresolved(ast.unparse(node))
+    return columns
+
+
+def find_queries(path):
+    """(queries, skipped) for one source file; skipped is [(location, reason)]"""
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    lines = source.splitlines()
+    tree = ast.parse(source, path)
+    queries, skipped = [], []
+
+    def visit(node, scope):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            scope = _Scope(node, scope)
+        if isinstance(node, ast.Call):
+            _call(node, scope)
+        for child in ast.iter_child_nodes(node):
+            visit(child, scope)
+
+    def _call(node, scope):
+        func = node.func
+        name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+        try:
+            if name in ("execute", "executemany") and node.args:
+                sql = resolve(node.args[0], scope)
+            elif name == "_report" and len(node.args) >= 2:
+                sql = resolve(node.args[1], scope)  # reports.py query helpers
+            elif name == "keyset_page":
+                args = node.args[1:]
+                if len(args) < 4:
+                    return
+                select = resolve(args[0], scope)
+                where = resolve(args[1], scope)
+                sql = select + (" WHERE " + where if where else "")
+                sql += " ORDER BY " + ", ".join(_order_by(args[3])) + " LIMIT %s"
+            else:
+                return
+        except Unresolved as e:
+            skipped.append((f"{os.path.basename(path)}:{node.lineno}", f"dynamic SQL ({e})"))
+            return
+        if not _EXPLAINABLE.match(sql):
+            return
+        allowed = ALLOW_MARKER in lines[node.lineno - 1]
+        queries.append(Query(path, node.lineno, " ".join(sql.split()), allowed))
+
+    visit(tree, _Scope(tree))
+    return queries, skipped
+
+
+def registry_queries():
+    """The statements registered in queries.py, paginated ones as a page query"""
+    import queries as registry
+
+    found = []
+    for query in registry.QUERIES.queries.values():
+        sql = query.sql
+        if isinstance(query, registry.PageQuery):
+            sql += " ORDER BY " + ", ".join(column for column, _ in query.order_by) + " LIMIT %s"
+        if _EXPLAINABLE.match(sql):
+            found.append(Query("queries.py", query.name, " ".join(sql.split()), False,
+                               query.name in INDEX_ORDER))
+    return found
+
+
+def with_dummy_params(sql):
+    """Fill %s placeholders so the statement can be EXPLAINed"""
+    sql = re.sub(r"LIMIT\s+%s", "LIMIT 10", sql, flags=re.I)
+    sql = _DATE_PARAM.sub(lambda m: f"{m.group(1)} {m.group(2)} '2024-01-01'", sql)
+    return sql.replace("%s", "'1'")
+
+
+def explain(cursor, sql):
+    """The plan steps of `sql`, one dict per EXPLAIN row"""
+    cursor.execute("EXPLAIN " + with_dummy_params(sql))
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, values)) for values in cursor.fetchall()]
+
+
+def full_scans(steps, min_rows):
+    """Plan steps that read a whole table of at least min_rows rows"""
+    return [step for step in steps if step.get("type") == "ALL" and (step.get("rows") or 0) >= min_rows]
+
+
+def filesorts(steps):
+    """Plan steps that sort their rows instead of reading them in index order"""
+    return [step for step in steps if "Using filesort" in (step.get("Extra") or "")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EXPLAIN every API query; fail on full scans")
+    parser.add_argument("files", nargs="*", help=f"default: {' '.join(DEFAULT_FILES)}")
+    parser.add_argument("--min-rows", type=int, default=DEFAULT_MIN_ROWS,
+                        help="estimated rows for a full scan to count as large")
+    args = parser.parse_args(argv)
+
+    import mysql.connector
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    files = args.files or [os.path.join(here, name) for name in DEFAULT_FILES]
+
+    queries, skipped = ([] if args.files else registry_queries()), []
+    for path in files:
+        found, unresolved = find_queries(path)
+        queries.extend(found)
+        skipped.extend(unresolved)
+
+    db = mysql.connector.connect(**connect_args_from_env())
+    cursor = db.cursor()
+    failures = 0
+    try:
+        for query in queries:
+            try:
+                steps = explain(cursor, query.sql)
+            except mysql.connector.Error as e:
+                print(f"ERROR {query.location}: {e.msg}\n      {query.sql}")
+                failures += 1
+                continue
+            scans = full_scans(steps, args.min_rows)
+            sorts = filesorts(steps) if query.index_order else []
+            if sorts:
+                failures += 1
+                for step in sorts:
+                    print(f"FAIL  {query.location}: filesort of {step['table']} "
+                          f"(ORDER BY not in index order)\n      {query.sql}")
+                continue
+            if not scans:
+                print(f"ok    {query.location}")
+            elif query.allowed:
+                print(f"allow {query.location}: full scan of {', '.join(s['table'] for s in scans)}")
+            else:
+                failures += 1
+                for step in scans:
+                    print(f"FAIL  {query.location}: full scan of {step['table']} "
+                          f"(~{step['rows']:,} rows)\n      {query.sql}")
+    finally:
+        cursor.close()
+        db.close()
+
+    for location, reason in skipped:
+        print(f"skip  {location}: {reason}")
+    print(f"{len(queries)} queries checked, {failures} failed, {len(skipped)} skipped")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
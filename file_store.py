@@ -0,0 +1,76 @@
+"""Content-addressed storage for uploaded files.
+
+A file lives at <root>/<aa>/<bb>/<sha256>, where aa and bb are the first
+two byte pairs of its hash, so no directory grows past 256 entries per
+level. Uploads are streamed to a temporary file in fixed-size chunks,
+hashed as they are written and cut off once they pass the size limit,
+then renamed into place. Identical uploads therefore share one file on
+disk and the database only stores the hash.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+class FileTooLarge(ValueError):
+    """Raised when an upload passes the store's size limit"""
+
+
+class StoredFile:
+    def __init__(self, sha256, size, created):
+        self.sha256 = sha256
+        self.size = size
+        self.created = created  # False when an identical file was already stored
+
+
+class FileStore:
+    def __init__(self, root, max_bytes, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.tmp_dir = os.path.join(self.root, "tmp")
+
+    def path(self, sha256):
+        """Where the file with this hash lives; ValueError for anything but a hex sha256"""
+        if not _SHA256.match(sha256 or ""):
+            raise ValueError(f"not a sha256 digest: {sha256!r}")
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def exists(self, sha256):
+        return os.path.isfile(self.path(sha256))
+
+    def save(self, stream):
+        """Copy a readable binary stream into the store, chunk by chunk"""
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, prefix="upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise FileTooLarge(f"upload exceeds {self.max_bytes} bytes")
+                    digest.update(chunk)
+                    out.write(chunk)
+
+            sha256 = digest.hexdigest()
+            final_path = self.path(sha256)
+            if os.path.exists(final_path):
+                os.unlink(tmp_path)
+                return StoredFile(sha256, size, created=False)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)  # atomic; concurrent identical uploads both succeed
+            return StoredFile(sha256, size, created=True)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
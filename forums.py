@@ -0,0 +1,130 @@
+"""Forum thread listings and reply trees.
+
+Listings read the precomputed forum_post.reply_count and last_activity_at
+(migration 0003, recounted by reports.rebuild() after bulk loads) and only
+an excerpt of each post, so a page costs one indexed query however busy
+the forum is. The listing is registered as "thread.by_forum" in queries.py
+and pages by (created_at, post_id): idx_forum_post_forum_created holds
+exactly that order within a forum, InnoDB appending the primary key to it,
+so no page is sorted.
+
+A thread's replies are loaded with one recursive CTE (MySQL 8.0+): a page
+of top-level replies, then their descendants level by level, down to
+`max_depth` and at most `max_replies` rows, breadth first. Rows come back
+ordered by depth, so every parent arrives before its children and the
+tree is assembled in one pass over the rows.
+"""
+from pagination import encode_cursor
+
+EXCERPT_LENGTH = 200
+
+THREAD_SUMMARY_SELECT = f"""SELECT fp.post_id, fp.forum_id, fp.title, LEFT(fp.post, {EXCERPT_LENGTH}) AS excerpt,
+               fp.user_id, u.name AS author_name, fp.created_at, fp.reply_count,
+               COALESCE(fp.last_activity_at, fp.created_at) AS last_activity_at
+           FROM forum_post fp
+           JOIN user u ON fp.user_id = u.user_id"""
+
+THREAD_QUERY = """SELECT fp.post_id, fp.forum_id, fp.title, fp.post, fp.user_id, u.name AS author_name,
+               fp.created_at, fp.reply_count,
+               COALESCE(fp.last_activity_at, fp.created_at) AS last_activity_at
+           FROM forum_post fp
+           JOIN user u ON fp.user_id = u.user_id
+           WHERE fp.post_id = %s AND fp.forum_id = %s"""
+
+# root_rank numbers the top-level replies of the page; the one past the
+# page (rank limit + 1) is fetched without its descendants, only to tell
+# whether there is a next page.
+TREE_QUERY = """WITH RECURSIVE tree AS (
+        SELECT roots.*, 1 AS depth
+        FROM (SELECT reply_id, parent_reply_id, reply_content, user_id, created_at,
+                     ROW_NUMBER() OVER (ORDER BY reply_id) AS root_rank
+              FROM reply
+              WHERE post_id = %s AND parent_reply_id IS NULL AND reply_id > %s
+              ORDER BY reply_id
+              LIMIT %s) AS roots
+        UNION ALL
+        SELECT r.reply_id, r.parent_reply_id, r.reply_content, r.user_id, r.created_at,
+               t.root_rank, t.depth + 1
+        FROM reply r
+        JOIN tree t ON r.parent_reply_id = t.reply_id
+        WHERE t.depth < %s AND t.root_rank <= %s
+    )
+    SELECT tree.reply_id, tree.parent_reply_id, tree.reply_content, tree.user_id,
+           u.name AS author_name, tree.created_at, tree.depth, tree.root_rank
+    FROM tree
+    JOIN user u ON tree.user_id = u.user_id
+    ORDER BY tree.depth, tree.reply_id
+    LIMIT %s"""
+
+
+class ThreadTree:
+    """A thread with one page of its reply tree"""
+
+    def __init__(self, thread, replies, next_cursor, truncated, loaded):
+        self.thread = thread
+        self.replies = replies
+        self.next_cursor = next_cursor
+        self.truncated = truncated  # max_replies was hit; deeper replies are missing
+        self.loaded = loaded
+
+    def envelope(self):
+        return {**self.thread, "replies": self.replies}, {
+            "next_cursor": self.next_cursor,
+            "replies_loaded": self.loaded,
+            "truncated": self.truncated,
+        }
+
+
+def load_thread(cursor, forum_id, post_id, after, limit, max_depth, max_replies):
+    """The thread plus `limit` top-level replies after reply id `after` and their
+    subtrees; None if the forum has no such thread"""
+    cursor.execute(THREAD_QUERY, (post_id, forum_id))
+    thread = cursor.fetchone()
+    if thread is None:
+        return None
+    cursor.execute(TREE_QUERY, tree_params(post_id, after, limit, max_depth, max_replies))
+    return assemble_thread(thread, cursor.fetchall(), limit, max_replies)
+
+
+def tree_params(post_id, after, limit, max_depth, max_replies):
+    """TREE_QUERY parameters: one extra root probes for a next page, two extra
+    rows show max_replies being exceeded"""
+    return post_id, after or 0, limit + 1, max_depth, limit, max_replies + 2
+
+
+def assemble_thread(thread, rows, limit, max_replies):
+    """ThreadTree from the thread row and the TREE_QUERY rows"""
+    has_more = any(row['root_rank'] > limit for row in rows)
+    if has_more:
+        rows = [row for row in rows if row['root_rank'] <= limit]
+    truncated = len(rows) > max_replies
+    rows = rows[:max_replies]
+
+    replies, last_root = build_tree(rows)
+    next_cursor = encode_cursor([last_root]) if has_more and last_root is not None else None
+    return ThreadTree(thread, replies, next_cursor, truncated, len(rows))
+
+
+def build_tree(rows):
+    """Nest breadth-first reply rows under their parents in one pass.
+
+    Returns (top-level replies, id of the last top-level reply).
+    """
+    nodes = {}
+    roots = []
+    for row in rows:
+        node = {
+            "reply_id": row['reply_id'],
+            "reply_content": row['reply_content'],
+            "user_id": row['user_id'],
+            "author_name": row['author_name'],
+            "created_at": row['created_at'],
+            "depth": row['depth'],
+            "replies": [],
+        }
+        nodes[row['reply_id']] = node
+        if row['depth'] == 1:
+            roots.append(node)
+        else:
+            nodes[row['parent_reply_id']]['replies'].append(node)
+    return roots, (roots[-1]['reply_id'] if roots else None)
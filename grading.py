@@ -0,0 +1,169 @@
+"""Applying grades to assignment submissions, one or many at a time.
+
+A batch is applied in one transaction with a fixed number of statements:
+lock the existing submissions, update the changed grades and adjust the
+running grade totals in student_grade_stats by the difference. Nothing
+rescans a student's submissions. Copying the new averages into
+student_profile.gpa (refresh_gpa) is left to the caller, which runs it as a
+background job once the grades have committed. Grades are out of MAX_GRADE;
+gpa is on a 0-GPA_SCALE scale, so averages are rescaled on the way.
+"""
+import time
+from decimal import Decimal, InvalidOperation
+
+import reports
+
+MIN_GRADE = Decimal("0")
+MAX_GRADE = Decimal("100")
+GPA_SCALE = Decimal("4.00")  # student_profile.gpa is DECIMAL(3,2)
+
+# Rows per UPDATE ... CASE statement
+UPDATE_CHUNK = 500
+
+# Per-row outcomes
+GRADED = "graded"            # first grade for this submission
+REGRADED = "regraded"        # replaced an earlier grade
+UNCHANGED = "unchanged"      # same grade as before, nothing written
+NOT_SUBMITTED = "not_submitted"
+DUPLICATE = "duplicate"      # student appears earlier in the same batch
+INVALID = "invalid"
+
+
+class GradeBatch:
+    """Per-row outcomes plus a summary; elapsed time is taken after commit"""
+
+    def __init__(self, results, started, changed_students=()):
+        self.results = results
+        self.started = started
+        self.changed_students = list(changed_students)  # whose GPA needs a refresh
+
+    def summary(self):
+        counts = {}
+        for result in self.results:
+            counts[result['outcome']] = counts.get(result['outcome'], 0) + 1
+        return counts
+
+    def envelope(self):
+        elapsed_ms = round((time.perf_counter() - self.started) * 1000, 2)
+        return self.results, {"summary": self.summary(), "elapsed_ms": elapsed_ms}
+
+
+def parse_grade(value):
+    """Decimal grade in [MIN_GRADE, MAX_GRADE], or None for anything else"""
+    if isinstance(value, bool):
+        return None
+    try:
+        grade = Decimal(str(value)).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        return None
+    if not grade.is_finite() or not MIN_GRADE <= grade <= MAX_GRADE:
+        return None
+    return grade
+
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def apply_grades(cursor, assignment_id, entries, started=None):
+    """Grade {"student_id", "grade"} entries for one assignment.
+
+    Returns a GradeBatch with one result per entry, in request order.
+    """
+    started = time.perf_counter() if started is None else started
+    results = []
+    grades = {}
+    for entry in entries:
+        student_id = entry.get('student_id') if isinstance(entry, dict) else None
+        raw_grade = entry.get('grade') if isinstance(entry, dict) else None
+        result = {"student_id": student_id, "grade": raw_grade}
+        results.append(result)
+
+        grade = parse_grade(raw_grade)
+        if not isinstance(student_id, int) or isinstance(student_id, bool):
+            result.update(outcome=INVALID, error="student_id must be an integer")
+        elif grade is None:
+            result.update(outcome=INVALID, error=f"grade must be a number from {MIN_GRADE} to {MAX_GRADE}")
+        elif student_id in grades:
+            result.update(outcome=DUPLICATE)
+        else:
+            grades[student_id] = grade
+
+    if not grades:
+        return GradeBatch(results, started)
+
+    # Lock the submissions being graded and remember their current grades
+    student_ids = list(grades)
+    cursor.execute(
+        f"""SELECT student_id, grade FROM assignment_submission
+            WHERE assignment_id = %s AND student_id IN ({_placeholders(student_ids)})
+            FOR UPDATE""",
+        (assignment_id, *student_ids)
+    )
+    old_grades = {}
+    for row in cursor.fetchall():
+        old_grades.setdefault(row['student_id'], []).append(row['grade'])
+
+    outcomes = {}
+    changed = {}
+    deltas = {}
+    for student_id, grade in grades.items():
+        previous = old_grades.get(student_id)
+        if previous is None:
+            outcomes[student_id] = NOT_SUBMITTED
+            continue
+        if all(old == grade for old in previous):
+            outcomes[student_id] = UNCHANGED
+            continue
+        outcomes[student_id] = REGRADED if any(old is not None for old in previous) else GRADED
+        changed[student_id] = grade
+        grade_sum, grade_count = 0, 0
+        for old in previous:
+            delta_sum, delta_count = reports.grade_delta(old, grade)
+            grade_sum += delta_sum
+            grade_count += delta_count
+        deltas[student_id] = (grade_sum, grade_count)
+
+    if changed:
+        # Seed totals for students the summaries have never seen *before*
+        # the update, so they start from the old grades
+        reports.ensure_grade_stats(cursor, list(changed))
+        _update_grades(cursor, assignment_id, changed)
+        reports.record_grades(cursor, deltas)
+
+    for result in results:
+        if 'outcome' not in result:
+            result['outcome'] = outcomes[result['student_id']]
+    return GradeBatch(results, started, changed)
+
+
+def refresh_gpa(cursor, student_ids):
+    """Copy the running averages in student_grade_stats into student_profile.gpa
+
+    Averages are out of MAX_GRADE and are rescaled to 0-GPA_SCALE.
+    """
+    if not student_ids:
+        return
+    cursor.execute(
+        f"""UPDATE student_profile sp
+            JOIN student_grade_stats s ON s.student_id = sp.student_id
+            SET sp.gpa = ROUND(s.average * %s / %s, 2)
+            WHERE sp.student_id IN ({_placeholders(student_ids)})""",
+        (GPA_SCALE, MAX_GRADE, *student_ids)
+    )
+
+
+def _update_grades(cursor, assignment_id, grades):
+    """One UPDATE ... CASE per UPDATE_CHUNK students instead of one per row"""
+    items = list(grades.items())
+    for start in range(0, len(items), UPDATE_CHUNK):
+        chunk = items[start:start + UPDATE_CHUNK]
+        cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+        params = [value for item in chunk for value in item]
+        student_ids = [student_id for student_id, _ in chunk]
+        cursor.execute(
+            f"""UPDATE assignment_submission
+                SET grade = CASE student_id {cases} END
+                WHERE assignment_id = %s AND student_id IN ({_placeholders(student_ids)})""",
+            (*params, assignment_id, *student_ids)
+        )
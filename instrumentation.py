@@ -0,0 +1,289 @@
+"""Query and request instrumentation with Prometheus-format export.
+
+When enabled, get_db() hands out an InstrumentedConnection whose cursors
+time every execute(), count the rows it returned or touched and file it
+under a statement fingerprint (literals and placeholder lists collapsed,
+so `WHERE id IN (%s, %s)` and `WHERE id IN (%s)` count as one query).
+Per-route request durations come from before/after_request hooks. Queries
+slower than the configured threshold are logged and kept in a short
+in-memory list.
+
+When disabled, get_db() returns the pooled connection untouched and no
+hooks are registered, so the only cost is one config check per checkout.
+"""
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from flask import g, has_request_context, request
+
+# Upper bounds in seconds, Prometheus' client default buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Distinct fingerprints tracked before the rest are lumped together
+MAX_FINGERPRINTS = 500
+OTHER = "<other>"
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_LIST = re.compile(r"(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """Statement shape with literals, placeholders and value lists collapsed"""
+    text = _STRING.sub("?", sql)
+    text = _NUMBER.sub("?", text.replace("%s", "?"))
+    text = _LIST.sub("(...)", text)
+    text = _VALUES_LIST.sub(r"\1", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+
+
+class Metrics:
+    """Process-wide counters and histograms; every update takes one lock"""
+
+    def __init__(self, slow_query_ms=200, slow_query_log=100, logger=None):
+        self.slow_query_ms = slow_query_ms
+        self.logger = logger
+        self.slow_queries = deque(maxlen=slow_query_log)
+        self.queries = {}          # fingerprint -> Histogram
+        self.query_rows = {}       # fingerprint -> rows returned or affected
+        self.query_errors = {}     # fingerprint -> failed executes
+        self.requests = {}         # (method, route, status) -> Histogram
+        self.checkouts = Histogram()
+        self.transactions = {"commit": 0, "rollback": 0}
+        self._lock = threading.Lock()
+
+    def _key(self, statement):
+        if statement in self.queries or len(self.queries) < MAX_FINGERPRINTS:
+            return statement
+        return OTHER
+
+    def record_query(self, sql, seconds, rows, failed=False):
+        statement = fingerprint(sql)
+        with self._lock:
+            key = self._key(statement)
+            self.queries.setdefault(key, Histogram()).observe(seconds)
+            if rows > 0:
+                self.query_rows[key] = self.query_rows.get(key, 0) + rows
+            if failed:
+                self.query_errors[key] = self.query_errors.get(key, 0) + 1
+        if has_request_context():
+            timings = g.setdefault('query_timings', [])
+            timings.append(seconds)
+        if seconds * 1000 >= self.slow_query_ms:
+            route = request.path if has_request_context() else None
+            entry = {"fingerprint": statement, "ms": round(seconds * 1000, 2), "rows": rows,
+                     "route": route, "at": time.time()}
+            self.slow_queries.append(entry)
+            if self.logger:
+                self.logger.warning(f"Slow query ({entry['ms']}ms, {rows} rows, {route}): {statement}")
+
+    def record_rows(self, sql, rows):
+        """Rows fetched after execute() returned (unbuffered or lazily read results)"""
+        if rows <= 0:
+            return
+        with self._lock:
+            key = self._key(fingerprint(sql))
+            self.query_rows[key] = self.query_rows.get(key, 0) + rows
+
+    def record_checkout(self, seconds):
+        with self._lock:
+            self.checkouts.observe(seconds)
+
+    def record_transaction(self, outcome):
+        with self._lock:
+            self.transactions[outcome] += 1
+
+    def record_request(self, method, route, status, seconds):
+        with self._lock:
+            self.requests.setdefault((method, route, str(status)), Histogram()).observe(seconds)
+
+    # ==============================================
+    # Flask integration
+    # ==============================================
+    def init_app(self, app, server_timing=False):
+        """Register the per-request timing hooks"""
+        @app.before_request
+        def _start_timer():
+            g.request_started = time.perf_counter()
+
+        @app.after_request
+        def _stop_timer(response):
+            started = g.pop('request_started', None)
+            if started is None:
+                return response
+            elapsed = time.perf_counter() - started
+            route = request.url_rule.rule if request.url_rule else "<unmatched>"
+            self.record_request(request.method, route, response.status_code, elapsed)
+            if server_timing:
+                queries = g.get('query_timings', [])
+                db_ms = sum(queries) * 1000
+                response.headers['Server-Timing'] = (
+                    f'db;dur={db_ms:.2f};desc="{len(queries)} queries", '
+                    f'app;dur={elapsed * 1000 - db_ms:.2f}, total;dur={elapsed * 1000:.2f}')
+            return response
+
+    def wrap(self, connection):
+        return InstrumentedConnection(connection, self)
+
+    # ==============================================
+    # Prometheus exposition
+    # ==============================================
+    def render(self, gauges=None):
+        """Text exposition format; `gauges` is {name: (help, value or {labels: value})}"""
+        with self._lock:
+            queries = {key: _copy(histogram) for key, histogram in self.queries.items()}
+            query_rows = dict(self.query_rows)
+            query_errors = dict(self.query_errors)
+            requests = {key: _copy(histogram) for key, histogram in self.requests.items()}
+            checkouts = _copy(self.checkouts)
+            transactions = dict(self.transactions)
+        slow = len(self.slow_queries)
+
+        lines = []
+        _histogram(lines, "app_http_request_duration_seconds", "Request latency by route",
+                   {(("method", method), ("route", route), ("status", status)): histogram
+                    for (method, route, status), histogram in requests.items()})
+        _histogram(lines, "app_db_query_duration_seconds", "Query latency by statement fingerprint",
+                   {(("query", key),): histogram for key, histogram in queries.items()})
+        _counter(lines, "app_db_query_rows_total", "Rows returned or affected by fingerprint",
+                 {(("query", key),): value for key, value in query_rows.items()})
+        _counter(lines, "app_db_query_errors_total", "Failed executes by fingerprint",
+                 {(("query", key),): value for key, value in query_errors.items()})
+        _counter(lines, "app_db_transactions_total", "handle_db_operation outcomes",
+                 {(("outcome", key),): value for key, value in transactions.items()})
+        _histogram(lines, "app_db_checkout_duration_seconds", "Time to get a pooled connection",
+                   {(): checkouts})
+        lines.append("# HELP app_db_slow_queries_recent Slow queries held in the in-memory log")
+        lines.append("# TYPE app_db_slow_queries_recent gauge")
+        lines.append(f"app_db_slow_queries_recent {slow}")
+        for name, (help_text, value) in (gauges or {}).items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            if isinstance(value, dict):
+                for labels, number in value.items():
+                    lines.append(f"{name}{_labels(labels)} {_number(number)}")
+            else:
+                lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _copy(histogram):
+    copy = Histogram(histogram.buckets)
+    copy.counts = list(histogram.counts)
+    copy.count = histogram.count
+    copy.sum = histogram.sum
+    return copy
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value is None:
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+def _counter(lines, name, help_text, series):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for labels, value in series.items():
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+
+def _histogram(lines, name, help_text, series):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in series.items():
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels + (('le', repr(bound)),))} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+        lines.append(f"{name}_sum{_labels(labels)} {histogram.sum!r}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+
+# ==============================================
+# Connection / cursor wrappers
+# ==============================================
+class InstrumentedConnection:
+    """Pooled connection whose cursors report to Metrics; everything else passes through"""
+
+    def __init__(self, connection, metrics):
+        self._connection = connection
+        self._metrics = metrics
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs), self._metrics)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._sql = None
+
+    def _timed(self, method, sql, *args, **kwargs):
+        self._sql = sql
+        started = time.perf_counter()
+        try:
+            result = method(sql, *args, **kwargs)
+        except Exception:
+            self._metrics.record_query(sql, time.perf_counter() - started, 0, failed=True)
+            raise
+        rows = self._cursor.rowcount
+        self._metrics.record_query(sql, time.perf_counter() - started, rows if rows > 0 else 0)
+        return result
+
+    def execute(self, sql, *args, **kwargs):
+        return self._timed(self._cursor.execute, sql, *args, **kwargs)
+
+    def executemany(self, sql, *args, **kwargs):
+        return self._timed(self._cursor.executemany, sql, *args, **kwargs)
+
+    def fetchall(self):
+        before = max(self._cursor.rowcount, 0)
+        rows = self._cursor.fetchall()
+        # Buffered cursors already reported their rowcount at execute()
+        if before == 0 and self._sql is not None:
+            self._metrics.record_rows(self._sql, len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
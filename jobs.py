@@ -0,0 +1,374 @@
+"""Background jobs for work that can follow a committed write.
+
+Jobs are rows in a local SQLite file, so once queued they survive restarts
+and can be shared by every worker process on the host. Worker threads
+claim one job at a time under a lease; a job whose worker died is picked
+up again once its lease runs out. Failures are retried with exponential
+backoff up to `max_attempts`, then left as 'failed' for inspection.
+
+SQLite commits separately from MySQL, so a job queued after a MySQL commit
+is lost if the process dies in between. Jobs that must not be are staged
+in MySQL's job_outbox table (migration 0005) inside the write's own
+transaction with stage(), and relay() moves committed rows into the queue:
+right after the commit, and from relay_outbox, a periodic task on the
+workers, for whatever a crash left behind. A crash during relay() can
+queue a row twice; keys and idempotent handlers absorb that.
+
+Jobs with a `key` are coalesced: while a job with that key is still
+pending, enqueueing another is a no-op ("refresh GPA for student 12" once,
+however many grades changed). A key is free again as soon as its job
+starts, so a change made during a run schedules a fresh one; keys are not
+kept after that and do not de-duplicate retried requests.
+
+Handlers must be idempotent; a job can run more than once.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+OUTBOX_COUNT = "SELECT COUNT(*) AS staged FROM job_outbox WHERE name = %s"
+
+
+class JobQueue:
+    def __init__(self, path, workers=2, max_attempts=5, backoff=2.0, lease=300,
+                 poll_interval=1.0, retention=86400, logger=None):
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.logger = logger or logging.getLogger(__name__)
+        self.handlers = {}
+        self._periodic = []
+        self._periodic_lock = threading.Lock()
+
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._create_lock = threading.Lock()
+        self._created = False  # the file and schema are made on first use
+        self._counter_lock = threading.Lock()
+        self.counters = {"enqueued": 0, "coalesced": 0, "succeeded": 0, "retried": 0, "failed": 0}
+        self._run_ms = 0.0
+        self._lag_ms = 0.0
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._create(db)
+        return db
+
+    def _create(self, db):
+        with self._create_lock:
+            if self._created:
+                return
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id          INTEGER PRIMARY KEY,
+                    name        TEXT NOT NULL,
+                    payload     TEXT NOT NULL,
+                    key         TEXT,
+                    status      TEXT NOT NULL,
+                    attempts    INTEGER NOT NULL DEFAULT 0,
+                    enqueued_at REAL NOT NULL,
+                    run_after   REAL NOT NULL,
+                    lease_until REAL,
+                    finished_at REAL,
+                    last_error  TEXT
+                );
+                CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after);
+                CREATE UNIQUE INDEX IF NOT EXISTS jobs_pending_key ON jobs (key) WHERE status = 'pending';
+            """)
+            self._created = True
+
+    def _count(self, counter, amount=1):
+        with self._counter_lock:
+            self.counters[counter] += amount
+
+    # ==============================================
+    # Producing
+    # ==============================================
+    def handler(self, name):
+        """Register the function that runs jobs called `name`; it gets the payload"""
+        def decorator(func):
+            self.handlers[name] = func
+            return func
+        return decorator
+
+    def periodic(self, interval):
+        """Register func() to run on a worker thread every `interval` seconds,
+        first as soon as the workers start"""
+        def decorator(func):
+            self._periodic.append({"func": func, "interval": interval, "due": 0.0})
+            return func
+        return decorator
+
+    def enqueue(self, name, payload=None, key=None, delay=0):
+        """Queue a job; returns False if a pending job with the same key absorbed it"""
+        if name not in self.handlers:
+            raise KeyError(f"no handler registered for job '{name}'")
+        now = time.time()
+        cursor = self._db().execute(
+            """INSERT INTO jobs (name, payload, key, status, enqueued_at, run_after)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (key) WHERE status = 'pending' DO NOTHING""",
+            (name, json.dumps(payload or {}), key, PENDING, now, now + delay))
+        if cursor.rowcount == 0:
+            self._count("coalesced")
+            return False
+        self._count("enqueued")
+        self.start()
+        self._wake.set()
+        return True
+
+    def enqueue_many(self, name, jobs):
+        """Queue [(payload, key), ...] in one transaction; returns how many were new"""
+        if name not in self.handlers:
+            raise KeyError(f"no handler registered for job '{name}'")
+        jobs = list(jobs)
+        if not jobs:
+            return 0
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            before = db.total_changes
+            db.executemany(
+                """INSERT INTO jobs (name, payload, key, status, enqueued_at, run_after)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (key) WHERE status = 'pending' DO NOTHING""",
+                [(name, json.dumps(payload or {}), key, PENDING, now, now) for payload, key in jobs])
+            added = db.total_changes - before
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._count("enqueued", added)
+        self._count("coalesced", len(jobs) - added)
+        if added:
+            self.start()
+            self._wake.set()
+        return added
+
+    # ==============================================
+    # Outbox (MySQL)
+    # ==============================================
+    def stage(self, cursor, name, jobs):
+        """Write [(payload, key), ...] to job_outbox on the caller's MySQL cursor,
+        inside its transaction; relay() queues them once it commits"""
+        if name not in self.handlers:
+            raise KeyError(f"no handler registered for job '{name}'")
+        rows = [(name, json.dumps(payload or {}), key) for payload, key in jobs]
+        if rows:
+            cursor.executemany("INSERT INTO job_outbox (name, payload, job_key) VALUES (%s, %s, %s)", rows)
+
+    def relay(self, cursor, limit=500):
+        """Queue up to `limit` committed job_outbox rows and delete them; the caller
+        commits. Rows other relays hold are skipped. Returns how many moved"""
+        cursor.execute(
+            """SELECT outbox_id, name, payload, job_key FROM job_outbox
+               ORDER BY outbox_id LIMIT %s FOR UPDATE SKIP LOCKED""",
+            (limit,))
+        staged = {}
+        moved = []
+        for row in cursor.fetchall():
+            if row['name'] not in self.handlers:
+                self.logger.warning(f"Outbox row {row['outbox_id']} names unknown job '{row['name']}'")
+                continue
+            staged.setdefault(row['name'], []).append((json.loads(row['payload']), row['job_key']))
+            moved.append(row['outbox_id'])
+        for name, jobs in staged.items():
+            self.enqueue_many(name, jobs)
+        if moved:
+            cursor.execute(f"DELETE FROM job_outbox WHERE outbox_id IN ({', '.join(['%s'] * len(moved))})",
+                           tuple(moved))
+        return len(moved)
+
+    def staged(self, cursor, name):
+        """How many `name` jobs are committed to job_outbox but not queued yet"""
+        cursor.execute(OUTBOX_COUNT, (name,))
+        return cursor.fetchone()['staged']
+
+    # ==============================================
+    # Consuming
+    # ==============================================
+    def start(self):
+        """Start the worker threads (once); no-op when workers=0"""
+        if self._threads or self.workers <= 0:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stop.clear()
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                self._run_periodic()
+                if not self.run_one():
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+            except Exception as e:  # never let a worker thread die
+                self.logger.error(f"Job worker error: {str(e)}")
+                time.sleep(self.poll_interval)
+
+    def _run_periodic(self):
+        """Run the periodic tasks that are due, on one worker at a time"""
+        if not self._periodic or not self._periodic_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            for task in self._periodic:
+                if now < task["due"]:
+                    continue
+                task["due"] = now + task["interval"]
+                try:
+                    task["func"]()
+                except Exception as e:
+                    self.logger.error(f"Periodic task {task['func'].__name__} failed: {str(e)}")
+        finally:
+            self._periodic_lock.release()
+
+    def _claim(self):
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                """SELECT id, name, payload, attempts, enqueued_at FROM jobs
+                   WHERE (status = ? AND run_after <= ?) OR (status = ? AND lease_until < ?)
+                   ORDER BY run_after, id LIMIT 1""",
+                (PENDING, now, RUNNING, now)).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            # Leaving 'pending' frees the key, so later changes enqueue a new run
+            db.execute("UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ? WHERE id = ?",
+                       (RUNNING, now + self.lease, row[0]))
+            db.execute("COMMIT")
+            return row
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def run_one(self):
+        """Run the next ready job, if any; True if one ran"""
+        job = self._claim()
+        if job is None:
+            return False
+        job_id, name, payload, attempts, enqueued_at = job
+        attempts += 1
+        started = time.time()
+        try:
+            self.handlers[name](json.loads(payload))
+        except Exception as e:
+            self._failed(job_id, name, attempts, e)
+        else:
+            finished = time.time()
+            self._db().execute("UPDATE jobs SET status = ?, finished_at = ?, lease_until = NULL WHERE id = ?",
+                               (DONE, finished, job_id))
+            with self._counter_lock:
+                self.counters["succeeded"] += 1
+                self._run_ms += (finished - started) * 1000
+                self._lag_ms += (started - enqueued_at) * 1000
+        self._purge()
+        return True
+
+    def _failed(self, job_id, name, attempts, error):
+        if attempts < self.max_attempts:
+            delay = self.backoff * 2 ** (attempts - 1)
+            self.logger.warning(f"Job {name}#{job_id} failed (attempt {attempts}), retrying in {delay:.0f}s: {error}")
+            # Back to pending unless a newer job with the same key is already waiting
+            self._db().execute(
+                """UPDATE OR IGNORE jobs SET status = ?, run_after = ?, lease_until = NULL, last_error = ?
+                   WHERE id = ?""",
+                (PENDING, time.time() + delay, str(error), job_id))
+            self._db().execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, last_error = ? WHERE id = ? AND status = ?",
+                (DONE, time.time(), f"superseded after: {error}", job_id, RUNNING))
+            self._count("retried")
+        else:
+            self.logger.error(f"Job {name}#{job_id} failed after {attempts} attempts: {error}")
+            self._db().execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, lease_until = NULL, last_error = ? WHERE id = ?",
+                (FAILED, time.time(), str(error), job_id))
+            self._count("failed")
+
+    def _purge(self):
+        """Drop finished jobs older than `retention` seconds (failed ones are kept)"""
+        self._db().execute("DELETE FROM jobs WHERE status = ? AND finished_at < ?",
+                           (DONE, time.time() - self.retention))
+
+    def run_forever(self):
+        """Work the queue on the calling thread, e.g. in a dedicated process"""
+        self._work()
+
+    def drain(self, timeout=None):
+        """Run ready jobs on the calling thread until none are left"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        count = 0
+        while self.run_one():
+            count += 1
+            if deadline is not None and time.monotonic() > deadline:
+                break
+        return count
+
+    # ==============================================
+    # Metrics
+    # ==============================================
+    def pending(self, name):
+        """How many `name` jobs are waiting or running (failed ones are not counted)"""
+        return self._db().execute("SELECT COUNT(*) FROM jobs WHERE name = ? AND status IN (?, ?)",
+                                  (name, PENDING, RUNNING)).fetchone()[0]
+
+    def stats(self):
+        db = self._db()
+        now = time.time()
+        by_status = dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        oldest = db.execute("SELECT MIN(enqueued_at) FROM jobs WHERE status = ? AND run_after <= ?",
+                            (PENDING, now)).fetchone()[0]
+        with self._counter_lock:
+            counters = dict(self.counters)
+            succeeded = counters["succeeded"]
+            avg_run_ms = round(self._run_ms / succeeded, 2) if succeeded else None
+            avg_lag_ms = round(self._lag_ms / succeeded, 2) if succeeded else None
+        return {
+            "depth": by_status.get(PENDING, 0),
+            "running": by_status.get(RUNNING, 0),
+            "failed_jobs": by_status.get(FAILED, 0),
+            "oldest_ready_age_s": round(now - oldest, 3) if oldest else 0.0,
+            "workers": len(self._threads),
+            "avg_run_ms": avg_run_ms,
+            "avg_lag_ms": avg_lag_ms,
+            **counters,
+        }
@@ -0,0 +1,168 @@
+"""In-memory index of who may see which course.
+
+Holds student -> enrolled courses, course -> lecturer and forum -> course so
+authorization checks on course-scoped routes do not cost a query each.
+
+Enrollments loaded from the database are stored as three flat integer
+arrays (CSR layout): sorted student ids, an offset per student and the
+concatenated sorted course ids, about 12 bytes per enrollment however many
+students there are. Enrollments made after the load go into a small
+per-student overflow set until the next rebuild.
+
+The index is only ever missing entries, never holding wrong ones: the API
+has no way to unenroll a student or reassign a lecturer. Enrollments made
+by another process (another worker, bulk_loader.py) are simply not here
+yet, so callers treat a miss as "ask the database" and add() what it finds.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+# Rows fetched per round trip while building
+LOAD_BATCH = 10000
+
+# Database checks for what the index does not know (see fallback())
+LECTURER_QUERY = "SELECT lecturer_id FROM course WHERE course_id = %s"
+ENROLLED_QUERY = "SELECT 1 FROM student_course WHERE student_id = %s AND course_id = %s"
+FORUM_QUERY = "SELECT course_id FROM forum WHERE forum_id = %s"
+
+
+class MembershipIndex:
+    def __init__(self):
+        # (sorted student ids, offsets, course ids): the courses of students[i]
+        # are courses[offsets[i]:offsets[i + 1]]; swapped as one tuple on reload
+        self._csr = (array('I'), array('I', [0]), array('I'))
+        self._added = {}              # student_id -> set of course ids enrolled since the load
+        self._lecturers = {}          # course_id -> lecturer_id
+        self._forums = {}             # forum_id -> course_id
+        self._lock = threading.Lock()
+        self.ready = False
+        self.loaded_at = None
+        self.load_ms = None
+        self.hits = 0
+        self.misses = 0
+
+    # ==============================================
+    # Building
+    # ==============================================
+    def load(self, cursor):
+        """Rebuild from the database; readers keep using the old index until it is swapped in"""
+        started = time.perf_counter()
+        students, offsets, courses = array('I'), array('I'), array('I')
+        cursor.execute("SELECT student_id, course_id FROM student_course ORDER BY student_id, course_id")
+        current = None
+        while True:
+            rows = cursor.fetchmany(LOAD_BATCH)
+            if not rows:
+                break
+            for student_id, course_id in rows:
+                if student_id != current:
+                    students.append(student_id)
+                    offsets.append(len(courses))
+                    current = student_id
+                courses.append(course_id)
+        offsets.append(len(courses))
+
+        cursor.execute("SELECT course_id, lecturer_id FROM course")
+        lecturers = {course_id: lecturer_id for course_id, lecturer_id in cursor.fetchall()}
+        cursor.execute("SELECT forum_id, course_id FROM forum")
+        forums = {forum_id: course_id for forum_id, course_id in cursor.fetchall()}
+
+        with self._lock:
+            self._csr = (students, offsets, courses)
+            self._added = {}
+            self._lecturers = lecturers
+            self._forums = forums
+            self.ready = True
+            self.loaded_at = time.time()
+            self.load_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def add(self, student_id, course_id):
+        with self._lock:
+            self._added.setdefault(student_id, set()).add(course_id)
+
+    def add_many(self, pairs):
+        with self._lock:
+            for student_id, course_id in pairs:
+                self._added.setdefault(student_id, set()).add(course_id)
+
+    def set_lecturer(self, course_id, lecturer_id):
+        self._lecturers[course_id] = lecturer_id
+
+    def set_forum(self, forum_id, course_id):
+        self._forums[forum_id] = course_id
+
+    # ==============================================
+    # Lookups
+    # ==============================================
+    def is_enrolled(self, student_id, course_id):
+        """True if known to be enrolled; False only means the index has no record of it"""
+        students, offsets, courses = self._csr
+        index = bisect_left(students, student_id)
+        if index < len(students) and students[index] == student_id:
+            start, end = offsets[index], offsets[index + 1]
+            position = bisect_left(courses, course_id, start, end)
+            if position < end and courses[position] == course_id:
+                self.hits += 1
+                return True
+        if course_id in self._added.get(student_id, ()):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def lecturer_of(self, course_id):
+        """The course's lecturer id, or None if the course is not in the index"""
+        return self._lecturers.get(course_id)
+
+    def course_of_forum(self, forum_id):
+        return self._forums.get(forum_id)
+
+    # ==============================================
+    # Access checks
+    # ==============================================
+    # can_access() answers from memory when it can and otherwise returns
+    # None; the caller then runs fallback()'s query however it talks to the
+    # database (blocking or async) and hands the row to learn().
+    def can_access(self, identity, course_id):
+        """Admins, the course's lecturer and its enrolled students; None if unknown"""
+        if identity['role'] == 'admin':
+            return True
+        if identity['role'] == 'lecturer':
+            lecturer_id = self.lecturer_of(course_id)
+            return None if lecturer_id is None else lecturer_id == identity['user_id']
+        return True if self.is_enrolled(identity['user_id'], course_id) else None
+
+    def fallback(self, identity, course_id):
+        """(query, params) that settles a can_access() of None"""
+        if identity['role'] == 'lecturer':
+            return LECTURER_QUERY, (course_id,)
+        return ENROLLED_QUERY, (identity['user_id'], course_id)
+
+    def learn(self, identity, course_id, row):
+        """Record the fallback() row (a tuple, or None) and return the access decision"""
+        if row is None:
+            return False
+        if identity['role'] == 'lecturer':
+            self.set_lecturer(course_id, row[0])
+            return row[0] == identity['user_id']
+        self.add(identity['user_id'], course_id)
+        return True
+
+    def stats(self):
+        students, offsets, courses = self._csr
+        added = sum(len(course_ids) for course_ids in list(self._added.values()))
+        return {
+            "ready": self.ready,
+            "students": len(students),
+            "enrollments": len(courses) + added,
+            "added_since_load": added,
+            "courses": len(self._lecturers),
+            "forums": len(self._forums),
+            "bytes": sum(len(values) * values.itemsize for values in self._csr),
+            "hits": self.hits,
+            "misses": self.misses,
+            "loaded_at": self.loaded_at,
+            "load_ms": self.load_ms,
+        }
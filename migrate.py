@@ -0,0 +1,143 @@
+"""Versioned schema migrations on top of Sql_table.sql.
+
+Each migrations/NNNN_description.sql file is applied once, in version order,
+and recorded in schema_migrations together with a checksum of its contents.
+
+    python migrate.py            apply pending migrations
+    python migrate.py --status   list applied and pending migrations
+
+Connection settings come from the same DB_HOST, DB_PORT, DB_USER,
+DB_PASSWORD and DB_NAME environment variables as the API. MySQL commits DDL
+implicitly, so a migration that fails part way is not rolled back; fix the
+cause, undo what did apply, and run again.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+_FILENAME = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+
+
+def connect_args_from_env():
+    return {
+        "host": os.environ.get("DB_HOST", "localhost"),
+        "port": int(os.environ.get("DB_PORT", 3306)),
+        "user": os.environ.get("DB_USER", "root"),
+        "password": os.environ.get("DB_PASSWORD", ""),
+        "database": os.environ.get("DB_NAME", "course_management"),
+    }
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, encoding="utf-8") as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode()).hexdigest()
+
+    def statements(self):
+        """Statements separated by ';' at the end of a line; '--' comments dropped"""
+        lines = [line for line in self.sql.splitlines() if not line.strip().startswith("--")]
+        return [statement.strip() for statement in re.split(r";\s*$", "\n".join(lines), flags=re.M)
+                if statement.strip()]
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2),
+                                        os.path.join(directory, filename)))
+    migrations.sort(key=lambda migration: migration.version)
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"duplicate migration version in {directory}")
+    return migrations
+
+
+def ensure_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations
+        (
+            version    INT PRIMARY KEY,
+            name       VARCHAR(100) NOT NULL,
+            checksum   CHAR(64) NOT NULL,
+            applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_migrations(cursor):
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return dict(cursor.fetchall())
+
+
+def migrate(db, migrations, out=sys.stdout):
+    """Apply every migration not yet recorded; returns how many ran"""
+    cursor = db.cursor()
+    try:
+        ensure_table(cursor)
+        applied = applied_migrations(cursor)
+        count = 0
+        for migration in migrations:
+            if migration.version in applied:
+                if applied[migration.version] != migration.checksum:
+                    out.write(f"warning: {migration.version:04d}_{migration.name} was edited after "
+                              f"it was applied\n")
+                continue
+            out.write(f"applying {migration.version:04d}_{migration.name} ...\n")
+            for statement in migration.statements():
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                (migration.version, migration.name, migration.checksum)
+            )
+            db.commit()
+            count += 1
+        out.write(f"{count} migration(s) applied\n")
+        return count
+    finally:
+        cursor.close()
+
+
+def status(db, migrations, out=sys.stdout):
+    cursor = db.cursor()
+    try:
+        ensure_table(cursor)
+        applied = applied_migrations(cursor)
+    finally:
+        cursor.close()
+    for migration in migrations:
+        state = "applied" if migration.version in applied else "pending"
+        if state == "applied" and applied[migration.version] != migration.checksum:
+            state = "applied (edited since)"
+        out.write(f"{migration.version:04d}_{migration.name}: {state}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply schema migrations from migrations/")
+    parser.add_argument("--status", action="store_true", help="list migrations without applying")
+    args = parser.parse_args(argv)
+
+    import mysql.connector
+
+    migrations = load_migrations()
+    db = mysql.connector.connect(autocommit=False, **connect_args_from_env())
+    try:
+        if args.status:
+            status(db, migrations)
+        else:
+            migrate(db, migrations)
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+-- Secondary indexes for the columns the API joins and filters on.
+-- Where one of these can serve a foreign key, InnoDB drops the index it
+-- created implicitly for that key, so nothing is indexed twice.
+
+-- Course members, popular-course counts, enrollment stats refresh
+CREATE INDEX idx_student_course_course ON student_course (course_id);
+
+-- Course and student event listings (course_id = ? AND event_date range, ordered by date)
+CREATE INDEX idx_calendar_event_course_date ON calendar_event (course_id, event_date);
+
+-- Forum thread listings, newest/oldest first
+CREATE INDEX idx_forum_post_forum_created ON forum_post (forum_id, created_at);
+
+-- Role checks in bulk enrollment and admin listings
+CREATE INDEX idx_user_role ON user (role);
@@ -0,0 +1,8 @@
+-- Submissions reference files in the content-addressed store (file_store.py)
+-- by hash instead of keeping the bytes in the submitted_file BLOB.
+
+ALTER TABLE assignment_submission
+    ADD COLUMN file_sha256 CHAR(64) NULL,
+    ADD COLUMN file_size   BIGINT NULL,
+    ADD COLUMN file_name   VARCHAR(255) NULL,
+    ADD INDEX idx_submission_file (file_sha256);
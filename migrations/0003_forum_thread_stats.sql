@@ -0,0 +1,16 @@
+-- Precomputed per-thread reply counts and last activity for the forum
+-- thread listing. Threads without replies keep last_activity_at NULL and
+-- are listed with their created_at. reports.rebuild() recounts both.
+ALTER TABLE forum_post
+    ADD COLUMN reply_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN last_activity_at TIMESTAMP NULL;
+
+UPDATE forum_post fp
+JOIN (SELECT post_id, COUNT(*) AS replies, MAX(created_at) AS last_reply
+      FROM reply GROUP BY post_id) r ON r.post_id = fp.post_id
+SET fp.reply_count = r.replies,
+    fp.last_activity_at = GREATEST(fp.created_at, r.last_reply);
+
+-- Thread trees: a thread's top-level replies in id order (InnoDB appends
+-- reply_id); children are found through the parent_reply_id foreign key index
+CREATE INDEX idx_reply_post_parent ON reply (post_id, parent_reply_id);
@@ -0,0 +1,54 @@
+-- Report summary tables, kept current by the API and rebuilt by
+-- `flask rebuild-reports` (reports.py). Databases created before they
+-- existed are backfilled here, as a rebuild would.
+CREATE TABLE IF NOT EXISTS course_enrollment_stats
+(
+    course_id  INT PRIMARY KEY,
+    enrollment INT NOT NULL DEFAULT 0,
+    INDEX idx_enrollment (enrollment),
+    FOREIGN KEY (course_id) REFERENCES course(course_id)
+);
+
+CREATE TABLE IF NOT EXISTS student_course_stats
+(
+    student_id   INT PRIMARY KEY,
+    course_count INT NOT NULL DEFAULT 0,
+    INDEX idx_course_count (course_count),
+    FOREIGN KEY (student_id) REFERENCES user(user_id)
+);
+
+CREATE TABLE IF NOT EXISTS student_grade_stats
+(
+    student_id  INT PRIMARY KEY,
+    grade_sum   DECIMAL(12,2) NOT NULL DEFAULT 0,
+    grade_count INT NOT NULL DEFAULT 0,
+    average     DECIMAL(5,2),
+    INDEX idx_average (average),
+    FOREIGN KEY (student_id) REFERENCES user(user_id)
+);
+
+CREATE TABLE IF NOT EXISTS report_refresh
+(
+    report     VARCHAR(50) PRIMARY KEY,
+    rebuilt_at DATETIME NOT NULL
+);
+
+-- Recount rather than insert, in case the API already kept some rows
+INSERT INTO course_enrollment_stats (course_id, enrollment)
+SELECT course_id, COUNT(*) FROM student_course GROUP BY course_id
+ON DUPLICATE KEY UPDATE enrollment = VALUES(enrollment);
+
+INSERT INTO student_course_stats (student_id, course_count)
+SELECT student_id, COUNT(*) FROM student_course GROUP BY student_id
+ON DUPLICATE KEY UPDATE course_count = VALUES(course_count);
+
+INSERT INTO student_grade_stats (student_id, grade_sum, grade_count, average)
+SELECT student_id, SUM(grade), COUNT(grade), ROUND(AVG(grade), 2)
+FROM assignment_submission
+WHERE grade IS NOT NULL
+GROUP BY student_id
+ON DUPLICATE KEY UPDATE grade_sum = VALUES(grade_sum), grade_count = VALUES(grade_count),
+                        average = VALUES(average);
+
+INSERT INTO report_refresh (report, rebuilt_at) VALUES ('summaries', NOW())
+ON DUPLICATE KEY UPDATE rebuilt_at = NOW();
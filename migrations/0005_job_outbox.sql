@@ -0,0 +1,12 @@
+-- Background jobs staged inside the transaction whose write they follow
+-- (jobs.py stage()/relay()), so a crash after the commit cannot lose them.
+-- Rows live only until a relay has moved them to the job queue.
+CREATE TABLE IF NOT EXISTS job_outbox
+(
+    outbox_id  BIGINT AUTO_INCREMENT PRIMARY KEY,
+    name       VARCHAR(50) NOT NULL,
+    payload    TEXT NOT NULL,
+    job_key    VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_job_outbox_name (name)
+);
@@ -0,0 +1,127 @@
+import base64
+import json
+from datetime import date, datetime
+
+from flask import current_app, request
+
+# ==============================================
+# Keyset (cursor) pagination
+# ==============================================
+# Instead of LIMIT/OFFSET, which makes MySQL walk past every skipped row,
+# each page remembers the ordering key of its last row and the next page
+# asks for rows strictly after it. Deep pages cost the same as page 1.
+
+
+class InvalidCursor(ValueError):
+    """Raised for a continuation token we did not issue"""
+
+
+class Page:
+    """One page of rows plus the token for the next one (None on the last page)"""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def envelope(self):
+        return self.items, {"next_cursor": self.next_cursor}
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(",", ":"), default=_json_key)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor(token)
+    if not isinstance(values, list):
+        raise InvalidCursor(token)
+    return values
+
+
+def _json_key(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    return str(value)
+
+
+def page_args(default_limit=None):
+    """Read ?cursor= and ?limit= from the request; limit is capped at MAX_PAGE_SIZE"""
+    return parse_page_args(request.args, current_app.config, default_limit)
+
+
+def parse_page_args(args, config, default_limit=None):
+    """page_args() for any mapping of query parameters (e.g. outside Flask)"""
+    limit = default_limit or config['DEFAULT_PAGE_SIZE']
+    try:
+        limit = int(args.get('limit', limit))
+    except ValueError:
+        pass  # like Flask's type=int: fall back to the default
+    limit = max(1, min(limit, config['MAX_PAGE_SIZE']))
+    token = args.get('cursor')
+    return (decode_cursor(token) if token else None), limit
+
+
+def keyset_predicate(order_by, after):
+    """SQL condition selecting rows that sort after `after`, plus its params.
+
+    `order_by` is a list of (column, row_key) pairs, ascending, whose last
+    column is unique. A NULL leading value is handled, since MySQL sorts
+    NULLs first.
+    """
+    if len(after) != len(order_by):
+        raise InvalidCursor(after)
+    columns = [column for column, _ in order_by]
+    if len(columns) == 1:
+        return f"{columns[0]} > %s", [after[0]]
+    if len(columns) != 2:
+        raise ValueError("keyset pagination supports one or two ordering columns")
+
+    (lead, tie), (lead_value, tie_value) = columns, after
+    if lead_value is None:
+        return f"({lead} IS NOT NULL OR ({lead} IS NULL AND {tie} > %s))", [tie_value]
+    return f"({lead} > %s OR ({lead} = %s AND {tie} > %s))", [lead_value, lead_value, tie_value]
+
+
+def keyset_page(cursor, select, where, params, order_by, after, limit):
+    """Run `select` + `where` one page at a time.
+
+    select    SELECT ... FROM ... JOIN ... (no WHERE)
+    where     conditions without the WHERE keyword, or "" for none
+    order_by  [(column, row_key), ...] e.g. [("ce.event_date", "event_date"),
+              ("ce.event_id", "event_id")]; the row_key names the column in
+              the result row
+    """
+    query, params = keyset_query(select, where, params, order_by, after, limit)
+    cursor.execute(query, params)
+    return keyset_result(cursor.fetchall(), order_by, limit)
+
+
+def keyset_query(select, where, params, order_by, after, limit):
+    """(query, params) for one page; fetches one extra row to detect a next page"""
+    conditions = [where] if where else []
+    params = list(params)
+    if after is not None:
+        condition, extra = keyset_predicate(order_by, after)
+        conditions.append(condition)
+        params.extend(extra)
+
+    query = select
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY " + ", ".join(column for column, _ in order_by) + " LIMIT %s"
+    params.append(limit + 1)
+    return query, tuple(params)
+
+
+def keyset_result(rows, order_by, limit):
+    """The Page for rows fetched with keyset_query()"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][key] for _, key in order_by])
+    return Page(rows, next_cursor)
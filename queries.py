@@ -0,0 +1,423 @@
+"""Named, typed SQL statements for the routes in app.py.
+
+Each statement is registered once under a name, with a type for every
+%(name)s parameter, and routes run it by name:
+
+    queries.run(db, "course.create", course_id=..., name=..., lecturer_id=...)
+
+Parameters are checked and converted before anything is sent (a bad one
+raises InvalidParameter, a 400), then the statement runs as a server-side
+prepared statement: MySQL parses and plans it once per connection, and
+later executions send only the values. Prepared cursors are cached on the
+pooled connection (PooledConnection.statements), so a connection the pool
+replaces after a failed ping, a recycle or an invalidate() starts with an
+empty cache and prepares again; a statement the server has forgotten is
+re-prepared on the spot. Each connection holds at most one handle per
+statement here, well under max_prepared_stmt_count.
+
+Streamed exports (stream()) run the registered SQL on the caller's
+unbuffered cursor instead: they execute once per request and may be
+abandoned half read, which a cached prepared cursor must never be.
+
+Hooks added with on_execute() see every execution, for metrics; stats()
+has per-query counters. asgi_app.py runs the same registered SQL on its
+aiomysql pool (unprepared) and reports each execution through record().
+
+Nothing here imports Flask.
+"""
+import threading
+import time
+from datetime import date, datetime
+
+from mysql.connector import Error, errorcode
+
+import forums
+from pagination import keyset_query, keyset_result
+
+
+class InvalidParameter(ValueError):
+    """Raised for a parameter value of the wrong type"""
+
+
+# ==============================================
+# Parameter Types
+# ==============================================
+def _integer(value):
+    if isinstance(value, bool):
+        raise TypeError(value)
+    if isinstance(value, int):
+        return value
+    return int(value)  # numeric strings from query parameters
+
+
+def _string(value):
+    if not isinstance(value, str):
+        raise TypeError(value)
+    return value
+
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(_string(value)[:10])
+
+
+CONVERTERS = {int: _integer, str: _string, date: _date}
+
+
+class optional:
+    """A parameter type that also accepts None (SQL NULL)"""
+
+    def __init__(self, kind):
+        self.kind = kind
+
+
+def _converter(kind):
+    nullable = isinstance(kind, optional)
+    convert = CONVERTERS[kind.kind if nullable else kind]
+    if not nullable:
+        return convert
+    return lambda value: None if value is None else convert(value)
+
+
+# ==============================================
+# Statements
+# ==============================================
+def _compile(sql, types):
+    """`sql` with %(name)s placeholders -> (positional SQL, parameter order)"""
+    order = []
+    positional = sql
+    while True:
+        start = positional.find("%(")
+        if start < 0:
+            break
+        end = positional.index(")s", start)
+        order.append(positional[start + 2:end])
+        positional = positional[:start] + "%s" + positional[end + 2:]
+    missing = set(order) ^ set(types)
+    if missing:
+        raise ValueError(f"Parameters without a type or placeholder: {', '.join(sorted(missing))}")
+    return positional, tuple(order)
+
+
+class Query:
+    """A statement with typed %(name)s parameters
+
+    fetch  'all' (list of rows), 'one' (a row or None) or 'write'
+           (a Write with rowcount and lastrowid)
+    """
+
+    def __init__(self, name, sql, /, fetch="all", **types):
+        if fetch not in ("all", "one", "write"):
+            raise ValueError(f"Unknown fetch mode {fetch!r}")
+        self.name = name
+        self.fetch = fetch
+        self.sql, self.order = _compile(sql, types)
+        self.types = types
+        self._converters = {key: _converter(kind) for key, kind in types.items()}
+
+    def bind(self, params):
+        """Parameter values in placeholder order, checked and converted"""
+        if params.keys() != self.types.keys():  # a bug in the caller, not the request
+            raise TypeError(f"{self.name} takes {sorted(self.types)}, got {sorted(params)}")
+        values = []
+        for key in self.order:
+            try:
+                values.append(self._converters[key](params[key]))
+            except (TypeError, ValueError):
+                raise InvalidParameter(f"Invalid {key}")
+        return tuple(values)
+
+
+class PageQuery(Query):
+    """A keyset-paginated SELECT (see pagination.keyset_page)
+
+    select    SELECT ... FROM ... JOIN ... (no WHERE)
+    where     conditions with %(name)s parameters, or ""
+    order_by  [(column, row_key), ...]
+    """
+
+    def __init__(self, name, select, where, order_by, /, **types):
+        super().__init__(name, f"{select} WHERE {where}" if where else select, **types)
+        self.select = select
+        self.where = _compile(where, types)[0] if where else ""
+        self.order_by = order_by
+        self._variants = {}
+
+    def page_statement(self, values, after, limit):
+        """(sql, params) for one page; the same str object for every page of one shape,
+        so the prepared cursor recognizes it"""
+        sql, params = keyset_query(self.select, self.where, values, self.order_by, after, limit)
+        shape = None if after is None else (len(after), after[0] is None)
+        return self._variants.setdefault(shape, sql), params
+
+
+class Write:
+    """What a 'write' query did"""
+
+    def __init__(self, rowcount, lastrowid):
+        self.rowcount = rowcount
+        self.lastrowid = lastrowid
+
+
+# ==============================================
+# Registry
+# ==============================================
+class Registry:
+    def __init__(self):
+        self.queries = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def add(self, query):
+        if query.name in self.queries:
+            raise ValueError(f"Query {query.name} registered twice")
+        self.queries[query.name] = query
+        self._stats[query.name] = {"calls": 0, "errors": 0, "prepares": 0, "total_ms": 0.0, "max_ms": 0.0}
+        return query
+
+    def on_execute(self, func):
+        """Call func(name, sql, seconds, rows, failed) after every execution"""
+        self._hooks.append(func)
+        return func
+
+    def __getitem__(self, name):
+        return self.queries[name]
+
+    # ------------------------------------------
+    # Execution
+    # ------------------------------------------
+    def run(self, db, name, /, **params):
+        """Execute a registered query on `db` (a pooled connection)"""
+        query = self.queries[name]
+        if isinstance(query, PageQuery):
+            raise TypeError(f"{name} is paginated; use page()")
+        return self._execute(db, query, query.sql, query.bind(params))
+
+    def page(self, db, name, after, limit, /, **params):
+        """One keyset Page of a PageQuery, `after` being the decoded ?cursor="""
+        query = self.queries[name]
+        sql, values = query.page_statement(query.bind(params), after, limit)
+        return keyset_result(self._execute(db, query, sql, values, fetch="all"), query.order_by, limit)
+
+    def run_many(self, db, name, rows, /):
+        """Execute a write query once per parameter dict in `rows`, all on one prepared
+        statement; returns the total rowcount"""
+        query = self.queries[name]
+        if query.fetch != "write":
+            raise TypeError(f"{name} is not a write")
+        bound = [query.bind(params) for params in rows]  # reject bad rows before any are written
+        return sum(self._execute(db, query, query.sql, values).rowcount for values in bound)
+
+    def stream(self, cursor, name, /, order_by="", **params):
+        """Execute a registered query unprepared on `cursor` (for streamed exports) and
+        return the cursor; `order_by` is appended as is"""
+        query = self.queries[name]
+        sql = f"{query.sql} ORDER BY {order_by}" if order_by else query.sql
+        cursor.execute(sql, query.bind(params))
+        return cursor
+
+    def _execute(self, db, query, sql, values, fetch=None):
+        fetch = fetch or query.fetch
+        started = time.perf_counter()
+        rows = 0
+        try:
+            try:
+                cursor = self._cursor(db, query, sql)
+                cursor.execute(sql, values)
+            except Error as e:
+                if e.errno != errorcode.ER_UNKNOWN_STMT_HANDLER:
+                    raise
+                db.statements.pop((query.name, sql), None)  # deallocated server-side; prepare again
+                cursor = self._cursor(db, query, sql)
+                cursor.execute(sql, values)
+            if fetch == "write":
+                result = Write(cursor.rowcount, cursor.lastrowid)
+                rows = max(cursor.rowcount, 0)
+            else:
+                result = cursor.fetchall()
+                rows = len(result)
+                if fetch == "one":
+                    result = result[0] if result else None
+        except Exception:
+            self.record(query.name, sql, time.perf_counter() - started, 0, True)
+            raise
+        self.record(query.name, sql, time.perf_counter() - started, rows, False)
+        return result
+
+    def _cursor(self, db, query, sql):
+        """The connection's prepared cursor for this statement, created on first use"""
+        key = (query.name, sql)
+        cursor = db.statements.get(key)
+        if cursor is None:
+            cursor = db.statements[key] = db.raw.cursor(prepared=True, dictionary=True)
+            with self._lock:
+                self._stats[query.name]["prepares"] += 1
+        return cursor
+
+    def record(self, name, sql, seconds, rows, failed):
+        """Count an execution of query `name`; executors other than run() and page()
+        (asgi_app's aiomysql pool) report theirs here"""
+        with self._lock:
+            stats = self._stats[name]
+            stats["calls"] += 1
+            stats["errors"] += failed
+            stats["total_ms"] += seconds * 1000
+            stats["max_ms"] = max(stats["max_ms"], seconds * 1000)
+        for hook in self._hooks:
+            hook(name, sql, seconds, rows, failed)
+
+    def stats(self):
+        with self._lock:
+            return {name: {**stats, "total_ms": round(stats["total_ms"], 3),
+                           "avg_ms": round(stats["total_ms"] / stats["calls"], 3) if stats["calls"] else 0.0,
+                           "max_ms": round(stats["max_ms"], 3)}
+                    for name, stats in self._stats.items()}
+
+
+QUERIES = Registry()
+run = QUERIES.run
+page = QUERIES.page
+run_many = QUERIES.run_many
+stream = QUERIES.stream
+on_execute = QUERIES.on_execute
+stats = QUERIES.stats
+
+# ==============================================
+# Users
+# ==============================================
+QUERIES.add(Query(
+    "user.create",
+    """INSERT INTO user (user_id, name, email, password, role)
+       VALUES (%(user_id)s, %(name)s, %(email)s, %(password)s, %(role)s)""",
+    fetch="write", user_id=int, name=str, email=str, password=str, role=str))
+
+QUERIES.add(Query(
+    "user.login",
+    "SELECT user_id, role FROM user WHERE email = %(email)s AND password = %(password)s",
+    fetch="one", email=str, password=str))
+
+# ==============================================
+# Courses
+# ==============================================
+QUERIES.add(Query(
+    "course.create",
+    "INSERT INTO course (course_id, name, lecturer_id) VALUES (%(course_id)s, %(name)s, %(lecturer_id)s)",
+    fetch="write", course_id=int, name=str, lecturer_id=int))
+
+QUERIES.add(PageQuery(
+    "course.list", "SELECT * FROM course", "",
+    [("course_id", "course_id")]))
+
+QUERIES.add(PageQuery(
+    "course.by_lecturer", "SELECT * FROM course", "lecturer_id = %(lecturer_id)s",
+    [("course_id", "course_id")], lecturer_id=int))
+
+QUERIES.add(PageQuery(
+    "course.by_student",
+    """SELECT c.* FROM course c
+       JOIN student_course sc ON c.course_id = sc.course_id""",
+    "sc.student_id = %(student_id)s",
+    [("sc.course_id", "course_id")], student_id=int))
+
+QUERIES.add(PageQuery(
+    "course.members",
+    """SELECT u.user_id, u.name, u.email
+       FROM user u
+       JOIN student_course sc ON u.user_id = sc.student_id""",
+    "sc.course_id = %(course_id)s",
+    [("sc.student_id", "user_id")], course_id=int))
+
+# ==============================================
+# Calendar Events
+# ==============================================
+QUERIES.add(Query(
+    "event.create",
+    """INSERT INTO calendar_event (course_id, title, description, event_date, created_by)
+       VALUES (%(course_id)s, %(title)s, %(description)s, %(event_date)s, %(created_by)s)""",
+    fetch="write", course_id=int, title=str, description=optional(str), event_date=date, created_by=int))
+
+QUERIES.add(PageQuery(
+    "event.by_course", "SELECT * FROM calendar_event", "course_id = %(course_id)s",
+    [("event_date", "event_date"), ("event_id", "event_id")], course_id=int))
+
+# A student's events, optionally from/to a date: one statement per combination,
+# each a plain comparison on the column so idx_calendar_event_course_date applies
+_STUDENT_EVENTS = """SELECT ce.* FROM calendar_event ce
+       JOIN student_course sc ON ce.course_id = sc.course_id"""
+_STUDENT_EVENTS_ORDER = [("ce.event_date", "event_date"), ("ce.event_id", "event_id")]
+
+QUERIES.add(PageQuery(
+    "event.by_student", _STUDENT_EVENTS, "sc.student_id = %(student_id)s",
+    _STUDENT_EVENTS_ORDER, student_id=int))
+
+QUERIES.add(PageQuery(
+    "event.by_student_from", _STUDENT_EVENTS, "sc.student_id = %(student_id)s AND ce.event_date >= %(start)s",
+    _STUDENT_EVENTS_ORDER, student_id=int, start=date))
+
+QUERIES.add(PageQuery(
+    "event.by_student_until", _STUDENT_EVENTS, "sc.student_id = %(student_id)s AND ce.event_date < %(end)s",
+    _STUDENT_EVENTS_ORDER, student_id=int, end=date))
+
+QUERIES.add(PageQuery(
+    "event.by_student_between", _STUDENT_EVENTS,
+    "sc.student_id = %(student_id)s AND ce.event_date >= %(start)s AND ce.event_date < %(end)s",
+    _STUDENT_EVENTS_ORDER, student_id=int, start=date, end=date))
+
+# ==============================================
+# Forums
+# ==============================================
+QUERIES.add(Query(
+    "forum.create",
+    "INSERT INTO forum (course_id, name) VALUES (%(course_id)s, %(name)s)",
+    fetch="write", course_id=int, name=str))
+
+QUERIES.add(Query(
+    "forum.by_course",
+    "SELECT * FROM forum WHERE course_id = %(course_id)s",
+    course_id=int))
+
+QUERIES.add(Query(
+    "thread.create",
+    """INSERT INTO forum_post (forum_id, user_id, title, post)
+       VALUES (%(forum_id)s, %(user_id)s, %(title)s, %(post)s)""",
+    fetch="write", forum_id=int, user_id=int, title=str, post=str))
+
+# Oldest first, in idx_forum_post_forum_created order (see forums.py)
+QUERIES.add(PageQuery(
+    "thread.by_forum", forums.THREAD_SUMMARY_SELECT, "fp.forum_id = %(forum_id)s",
+    [("fp.created_at", "created_at"), ("fp.post_id", "post_id")], forum_id=int))
+
+# ==============================================
+# Course Content
+# ==============================================
+QUERIES.add(Query(
+    "content.create",
+    """INSERT INTO course_content (course_id, section, title, content_type, content_url, description)
+       VALUES (%(course_id)s, %(section)s, %(title)s, %(content_type)s, %(content_url)s, %(description)s)""",
+    fetch="write", course_id=int, section=str, title=str, content_type=str,
+    content_url=optional(str), description=optional(str)))
+
+QUERIES.add(PageQuery(
+    "content.by_course", "SELECT * FROM course_content", "course_id = %(course_id)s",
+    [("section", "section"), ("content_id", "content_id")], course_id=int))
+
+# ==============================================
+# Submissions
+# ==============================================
+QUERIES.add(Query(
+    "submission.create",
+    """INSERT INTO assignment_submission (assignment_id, student_id, file_sha256, file_size, file_name)
+       VALUES (%(assignment_id)s, %(student_id)s, %(file_sha256)s, %(file_size)s, %(file_name)s)""",
+    fetch="write", assignment_id=int, student_id=int, file_sha256=str, file_size=int, file_name=str))
+
+QUERIES.add(Query(
+    "submission.file",
+    """SELECT s.student_id, s.file_sha256, s.file_name, a.course_id
+       FROM assignment_submission s
+       JOIN assignment a ON a.assignment_id = s.assignment_id
+       WHERE s.submission_id = %(submission_id)s""",
+    fetch="one", submission_id=int))
@@ -0,0 +1,203 @@
+"""Summary tables behind the /reports endpoints.
+
+course_enrollment_stats, student_course_stats and student_grade_stats hold
+the aggregates the reports used to compute with GROUP BY on every request;
+forum_post.reply_count and last_activity_at do the same for thread listings.
+Writes keep them current incrementally (record_enrollment, record_grades);
+rebuild() recomputes them from scratch, e.g. after a bulk load. The tables
+are created by migrations/0004_report_summaries.sql.
+
+Nothing here imports Flask, so the bulk loader can use it too.
+"""
+from decimal import Decimal
+
+# ==============================================
+# Full Rebuild
+# ==============================================
+REBUILD_STATEMENTS = [
+    "DELETE FROM course_enrollment_stats",
+    """INSERT INTO course_enrollment_stats (course_id, enrollment)
+       SELECT course_id, COUNT(*) FROM student_course GROUP BY course_id""",
+    "DELETE FROM student_course_stats",
+    """INSERT INTO student_course_stats (student_id, course_count)
+       SELECT student_id, COUNT(*) FROM student_course GROUP BY student_id""",
+    "DELETE FROM student_grade_stats",
+    """INSERT INTO student_grade_stats (student_id, grade_sum, grade_count, average)
+       SELECT student_id, SUM(grade), COUNT(grade), ROUND(AVG(grade), 2)
+       FROM assignment_submission
+       WHERE grade IS NOT NULL
+       GROUP BY student_id""",
+    # Forum thread listing counters (forums.py)
+    """UPDATE forum_post fp
+       LEFT JOIN (SELECT post_id, COUNT(*) AS replies, MAX(created_at) AS last_reply
+                  FROM reply GROUP BY post_id) r ON r.post_id = fp.post_id
+       SET fp.reply_count = COALESCE(r.replies, 0),
+           fp.last_activity_at = GREATEST(fp.created_at, r.last_reply)""",
+    """INSERT INTO report_refresh (report, rebuilt_at) VALUES ('summaries', NOW())
+       ON DUPLICATE KEY UPDATE rebuilt_at = NOW()""",
+]
+
+
+def rebuild(cursor):
+    """Recompute every summary table; run inside one transaction"""
+    for statement in REBUILD_STATEMENTS:
+        cursor.execute(statement)
+
+
+# ==============================================
+# Incremental Maintenance
+# ==============================================
+def record_enrollment(cursor, student_id, course_id):
+    """Count one new student_course row"""
+    cursor.execute(
+        """INSERT INTO course_enrollment_stats (course_id, enrollment) VALUES (%s, 1)
+           ON DUPLICATE KEY UPDATE enrollment = enrollment + 1""",
+        (course_id,)
+    )
+    cursor.execute(
+        """INSERT INTO student_course_stats (student_id, course_count) VALUES (%s, 1)
+           ON DUPLICATE KEY UPDATE course_count = course_count + 1""",
+        (student_id,)
+    )
+
+
+def refresh_enrollment_stats(cursor, student_ids, course_ids, chunk_size=1000):
+    """Recount the given students and courses from student_course"""
+    for table, key, column, ids in (
+            ("course_enrollment_stats", "course_id", "enrollment", sorted(course_ids)),
+            ("student_course_stats", "student_id", "course_count", sorted(student_ids))):
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            cursor.execute(
+                f"""INSERT INTO {table} ({key}, {column})
+                    SELECT {key}, COUNT(*) FROM student_course
+                    WHERE {key} IN ({", ".join(["%s"] * len(chunk))})
+                    GROUP BY {key}
+                    ON DUPLICATE KEY UPDATE {column} = VALUES({column})""",
+                tuple(chunk)
+            )
+
+
+def grade_delta(old_grade, new_grade):
+    """(sum change, count change) for one submission going from old to new grade"""
+    old_grade = None if old_grade is None else Decimal(str(old_grade))
+    new_grade = None if new_grade is None else Decimal(str(new_grade))
+    if old_grade is None and new_grade is None:
+        return 0, 0
+    if old_grade is None:
+        return new_grade, 1
+    if new_grade is None:
+        return -old_grade, -1
+    return new_grade - old_grade, 0
+
+
+def ensure_grade_stats(cursor, student_ids):
+    """Seed student_grade_stats from the submissions for students it lacks.
+
+    Two transactions grading different assignments can both find a student
+    missing; the second insert then waits for the first and, once it has
+    committed, leaves its row alone instead of failing on the key.
+    """
+    if not student_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(student_ids))
+    cursor.execute(
+        f"""INSERT INTO student_grade_stats (student_id, grade_sum, grade_count, average)
+            SELECT a.student_id, COALESCE(SUM(a.grade), 0), COUNT(a.grade), ROUND(AVG(a.grade), 2)
+            FROM assignment_submission a
+            LEFT JOIN student_grade_stats s ON s.student_id = a.student_id
+            WHERE a.student_id IN ({placeholders}) AND s.student_id IS NULL
+            GROUP BY a.student_id
+            ON DUPLICATE KEY UPDATE student_grade_stats.student_id = student_grade_stats.student_id""",
+        tuple(student_ids)
+    )
+
+
+def record_grades(cursor, deltas):
+    """Apply {student_id: (sum change, count change)} to student_grade_stats"""
+    rows = [(student_id, grade_sum, grade_count, grade_sum, grade_count)
+            for student_id, (grade_sum, grade_count) in deltas.items()
+            if grade_sum or grade_count]
+    if not rows:
+        return
+    # The UPDATE list is applied left to right, so `average` sees the new totals
+    cursor.executemany(
+        """INSERT INTO student_grade_stats (student_id, grade_sum, grade_count, average)
+           VALUES (%s, %s, %s, ROUND(%s / NULLIF(%s, 0), 2))
+           ON DUPLICATE KEY UPDATE
+               grade_sum = grade_sum + VALUES(grade_sum),
+               grade_count = grade_count + VALUES(grade_count),
+               average = ROUND(grade_sum / NULLIF(grade_count, 0), 2)""",
+        rows
+    )
+
+
+# ==============================================
+# Report Queries
+# ==============================================
+class Report:
+    """Report rows plus when the summaries were last fully rebuilt
+
+    `pending` counts queued or running recounts of the summaries the report
+    reads (the refresh_enrollment_stats job after a bulk enrollment).
+    """
+
+    def __init__(self, rows, rebuilt_at, pending=0):
+        self.rows = rows
+        self.rebuilt_at = rebuilt_at
+        self.pending = pending
+
+    def envelope(self):
+        # Summaries are kept current by every write since the last rebuild,
+        # except bulk enrollments, which recount them in a job after commit.
+        # Stale: no rebuild on record (rows loaded out of band may be
+        # missing), or a recount has not finished yet.
+        return self.rows, {"as_of": self.rebuilt_at, "stale": self.rebuilt_at is None or self.pending > 0}
+
+
+REFRESH_QUERY = "SELECT rebuilt_at FROM report_refresh WHERE report = 'summaries'"
+
+TOP_STUDENTS = """
+    SELECT s.student_id AS user_id, u.name, s.average
+    FROM student_grade_stats s
+    JOIN user u ON u.user_id = s.student_id
+    WHERE s.average IS NOT NULL
+    ORDER BY s.average DESC
+    LIMIT %s
+"""
+
+POPULAR_COURSES = """
+    SELECT c.course_id, c.name, s.enrollment
+    FROM course_enrollment_stats s
+    JOIN course c ON c.course_id = s.course_id
+    WHERE s.enrollment >= %s
+    ORDER BY s.enrollment DESC
+"""
+
+BUSY_STUDENTS = """
+    SELECT u.user_id, u.name, s.course_count
+    FROM student_course_stats s
+    JOIN user u ON u.user_id = s.student_id
+    WHERE s.course_count >= %s
+    ORDER BY s.course_count DESC
+"""
+
+
+def _report(cursor, query, params=(), pending=0):
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    cursor.execute(REFRESH_QUERY)
+    refresh = cursor.fetchone()
+    return Report(rows, refresh['rebuilt_at'] if refresh else None, pending)
+
+
+def top_students(cursor, limit=10):
+    return _report(cursor, TOP_STUDENTS, (limit,))
+
+
+def popular_courses(cursor, min_enrollment=50, pending=0):
+    return _report(cursor, POPULAR_COURSES, (min_enrollment,), pending)
+
+
+def busy_students(cursor, min_courses=5, pending=0):
+    return _report(cursor, BUSY_STUDENTS, (min_courses,), pending)
@@ -0,0 +1,282 @@
+"""Read-through cache for public GET responses.
+
+Responses are keyed by path, query string and the current *version* of
+each tag the route depends on (e.g. "course:12:forums"). A write bumps the
+versions of the tags it affects, so every key built from the old version
+stops matching at once; the orphaned entries age out through LRU/TTL.
+Because readers fold the versions into the key before querying MySQL, a
+read that races a write can only ever store under the old version. That
+only holds if the query sees the write, so a miss is filled with
+g.response_cache_fill set and app.py keeps such reads off replicas, which
+may not have the write yet.
+
+Two stores:
+
+    MemoryStore  per-process LRU with TTL
+    SqliteStore  a SQLite file shared by every worker process on the host,
+                 so an invalidation in one worker is seen by all of them
+
+Every cached response carries an ETag and honours If-None-Match.
+"""
+import functools
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, g, make_response, request
+
+
+class MemoryStore:
+    """In-process LRU of (expires_at, value) with TTL expiry"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteStore:
+    """LRU/TTL entries and tag versions in a SQLite file shared across processes"""
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._create_lock = threading.Lock()
+        self._created = False  # the file and schema are made on first use
+        self.evictions = 0
+        self.expirations = 0
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._create(db)
+        return db
+
+    def _create(self, db):
+        with self._create_lock:
+            if self._created:
+                return
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key        TEXT PRIMARY KEY,
+                    value      BLOB NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_used  REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+                CREATE TABLE IF NOT EXISTS tag_versions (
+                    tag     TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                );
+            """)
+            self._created = True
+
+    def get(self, key):
+        db = self._db()
+        row = db.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if row[1] <= now:
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.expirations += 1
+            return None
+        db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+        return _decode(row[0])
+
+    def set(self, key, value, ttl):
+        db = self._db()
+        now = time.time()
+        db.execute("INSERT OR REPLACE INTO entries (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                   (key, _encode(value), now + ttl, now))
+        excess = db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if excess > 0:
+            # Expired entries go first, then the least recently used
+            cursor = db.execute(
+                """DELETE FROM entries WHERE key IN (
+                       SELECT key FROM entries ORDER BY expires_at > ?, last_used LIMIT ?)""",
+                (now, excess))
+            self.evictions += cursor.rowcount
+
+    def versions(self, tags):
+        if not tags:
+            return []
+        rows = dict(self._db().execute(
+            f"SELECT tag, version FROM tag_versions WHERE tag IN ({', '.join('?' * len(tags))})",
+            tuple(tags)).fetchall())
+        return [rows.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        db = self._db()
+        db.executemany(
+            """INSERT INTO tag_versions (tag, version) VALUES (?, 1)
+               ON CONFLICT(tag) DO UPDATE SET version = version + 1""",
+            [(tag,) for tag in tags])
+
+    def clear(self):
+        db = self._db()
+        db.execute("DELETE FROM entries")
+        db.execute("DELETE FROM tag_versions")
+
+    def __len__(self):
+        return self._db().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+def _encode(value):
+    status, etag, mimetype, body = value
+    return f"{status}\n{etag}\n{mimetype}\n".encode() + body
+
+
+def _decode(blob):
+    status, etag, mimetype, body = bytes(blob).split(b"\n", 3)
+    return int(status), etag.decode(), mimetype.decode(), body
+
+
+class ResponseCache:
+    """Route decorator plus invalidation and hit/miss counters"""
+
+    def __init__(self, store=None, ttl=60, enabled=True):
+        self.store = store if store is not None else MemoryStore()
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def cached(self, tags):
+        """Cache a GET view; `tags(**view_args)` names what its data depends on"""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**view_args):
+                if not self.enabled or request.method != 'GET':
+                    return view(**view_args)
+
+                key, entry = self.lookup(request.path, request.args.items(multi=True), tags(**view_args))
+                if entry is not None:
+                    status, etag, mimetype, body = entry
+                    return self._conditional(Response(body, status=status, mimetype=mimetype), etag, "HIT")
+
+                g.response_cache_fill = True  # read from the primary (app.reads_from_replica)
+                response = make_response(view(**view_args))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                etag = self.save(key, response.status_code, response.mimetype, response.get_data())
+                return self._conditional(response, etag, "MISS")
+            return wrapper
+        return decorator
+
+    def lookup(self, path, args, tags):
+        """(key, cached (status, etag, mimetype, body) or None) for a GET of path
+        with query parameters `args` whose data depends on `tags`"""
+        route_tags = sorted(tags)
+        versions = self.store.versions(route_tags)
+        query = "&".join(f"{name}={value}" for name, value in sorted(args))
+        key = "|".join([path, query] + [f"{tag}={version}" for tag, version in zip(route_tags, versions)])
+        entry = self.store.get(key)
+        self._count('hits' if entry is not None else 'misses')
+        return key, entry
+
+    def save(self, key, status, mimetype, body):
+        """Store a response body under a lookup() key; returns its ETag"""
+        etag = hashlib.sha1(body).hexdigest()
+        self.store.set(key, (status, etag, mimetype, body), self.ttl)
+        self._count('stores')
+        return etag
+
+    def record_not_modified(self):
+        self._count('not_modified')
+
+    def _conditional(self, response, etag, state):
+        response.set_etag(etag)
+        response.headers['X-Cache'] = state
+        response.make_conditional(request)
+        if response.status_code == 304:
+            self.record_not_modified()
+        return response
+
+    def invalidate(self, *tags):
+        if tags:
+            self.store.bump(tags)
+            self._count('invalidations', len(tags))
+
+    def invalidate_on_success(self, result, *tags):
+        """Invalidate `tags` if a handle_db_operation() result succeeded, then pass it on"""
+        status = result[1] if isinstance(result, tuple) else result.status_code
+        if status < 400:
+            self.invalidate(*tags)
+        return result
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.store).__name__,
+            "enabled": self.enabled,
+            "entries": len(self.store),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "stores": self.stores,
+            "not_modified": self.not_modified,
+            "evictions": self.store.evictions,
+            "expirations": self.store.expirations,
+            "invalidations": self.invalidations,
+        }
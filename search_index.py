@@ -0,0 +1,524 @@
+"""Full-text search over course content and forum threads, without MySQL.
+
+An inverted index kept next to the app in SEARCH_INDEX_PATH:
+
+    CURRENT              generation number of the live files
+    segment-<gen>.idx    immutable index built by `flask build-search-index`
+    journal-<gen>.jsonl  documents added since that build, one JSON per line
+
+The segment is memory-mapped and read in place, so opening it costs about
+the same however large it is. Documents are numbered in (course, kind, id)
+order, which makes a course's documents a contiguous id range; posting
+lists are sorted document ids (uint32) with term frequencies (uint16), so
+a course-scoped query binary-searches each posting list to that range and
+never looks at other courses' postings.
+
+Writes append to the journal (add_content / add_thread, called after the
+inserting transaction commits), and every process replays journal lines it
+has not seen before answering a query, so all workers see new documents
+without a rebuild. Journal postings are kept per course, so a query only
+looks at its own course's journal documents. Rebuild periodically (stats()
+has the journal's size) to fold the journal into a fresh segment; lines
+written after the build's mark() was taken, i.e. after its database reads
+began, are carried over to the new journal.
+
+Ranking is BM25 over title and body (title words count TITLE_WEIGHT
+times). Every query word also matches longer words it is a prefix of, at
+PREFIX_WEIGHT, so results appear while the user is still typing.
+"""
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+from array import array
+from bisect import bisect_left, insort
+
+CONTENT = 0
+THREAD = 1
+KIND_NAMES = {CONTENT: "content", THREAD: "thread"}
+
+TITLE_WEIGHT = 3
+PREFIX_WEIGHT = 0.5
+MAX_EXPANSIONS = 50      # longer words considered per prefix
+MAX_TERM_LENGTH = 40
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""a an and are as at be by for from has have in is it its of on or that the
+this to was were will with""".split())
+
+_WORD = re.compile(r"\w+")
+
+MAGIC = b"SRCHIDX1"
+# magic, documents, courses, terms, postings, term bytes, title bytes, total document length
+HEADER = struct.Struct("<8s6IQ")
+
+
+def tokenize(text):
+    """Lowercased words of `text`, minus stopwords and one-letter words"""
+    return [word for word in _WORD.findall((text or "").lower())
+            if 1 < len(word) <= MAX_TERM_LENGTH and word not in STOPWORDS]
+
+
+def term_frequencies(title, text):
+    """({term: weighted frequency}, document length) for one document"""
+    counts = {}
+    for word in tokenize(title):
+        counts[word] = counts.get(word, 0) + TITLE_WEIGHT
+    for word in tokenize(text):
+        counts[word] = counts.get(word, 0) + 1
+    return counts, sum(counts.values())
+
+
+# ==============================================
+# Segment Files
+# ==============================================
+class Segment:
+    """A read-only, memory-mapped segment; an empty one if path is None"""
+
+    def __init__(self, path=None):
+        if path is None:
+            self._empty()
+            return
+        with open(path, "rb") as f:
+            # Unmapped when the last view is dropped, i.e. when the segment is replaced
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, docs, courses, terms, postings, term_bytes, title_bytes,
+         self.total_length) = HEADER.unpack_from(mapped)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a search index segment")
+
+        view = memoryview(mapped)
+        offset = HEADER.size
+
+        def take(count, code):
+            nonlocal offset
+            size = count * struct.calcsize(code)
+            values = view[offset:offset + size].cast(code)
+            offset += size
+            return values
+
+        self.doc_course = take(docs, "I")
+        self.doc_kind = take(docs, "I")
+        self.doc_source = take(docs, "I")
+        self.doc_parent = take(docs, "I")
+        self.doc_length = take(docs, "I")
+        self.title_start = take(docs + 1, "I")
+        self.course_ids = take(courses, "I")
+        self.course_start = take(courses + 1, "I")
+        self.term_start = take(terms + 1, "I")
+        self.post_docs = take(postings, "I")
+        self.post_tf = take(postings, "H")
+        self.terms = bytes(view[offset:offset + term_bytes]).decode("utf-8").split("\n") if terms else []
+        offset += term_bytes
+        self._titles = view[offset:offset + title_bytes]
+
+    def _empty(self):
+        self.doc_course = self.doc_kind = self.doc_source = self.doc_parent = self.doc_length = ()
+        self.title_start = (0,)
+        self.course_ids = self.post_docs = self.post_tf = ()
+        self.course_start = self.term_start = (0,)
+        self.terms = []
+        self._titles = b""
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_course)
+
+    def title(self, doc):
+        return bytes(self._titles[self.title_start[doc]:self.title_start[doc + 1]]).decode("utf-8")
+
+    def course_range(self, course_id):
+        """(first, end) document ids of a course"""
+        index = bisect_left(self.course_ids, course_id)
+        if index < len(self.course_ids) and self.course_ids[index] == course_id:
+            return self.course_start[index], self.course_start[index + 1]
+        return 0, 0
+
+    def contains(self, course_id, kind, source_id):
+        first, end = self.course_range(course_id)
+        low, high = first, end
+        wanted = (kind, source_id)
+        while low < high:  # documents of a course are in (kind, id) order
+            middle = (low + high) // 2
+            if (self.doc_kind[middle], self.doc_source[middle]) < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        return low < end and (self.doc_kind[low], self.doc_source[low]) == wanted
+
+    def postings(self, term_index, first, end):
+        """(doc, tf) pairs of a term for documents in [first, end)"""
+        start, stop = self.term_start[term_index], self.term_start[term_index + 1]
+        low = bisect_left(self.post_docs, first, start, stop)
+        high = bisect_left(self.post_docs, end, low, stop)
+        return zip(self.post_docs[low:high], self.post_tf[low:high])
+
+    def document_frequency(self, term_index):
+        return self.term_start[term_index + 1] - self.term_start[term_index]
+
+
+def write_segment(path, documents):
+    """Write a segment for (kind, source_id, course_id, parent_id, title, text)
+    documents, which must come in (course_id, kind, source_id) order"""
+    columns = [array("I") for _ in range(5)]
+    title_start, titles = array("I", [0]), bytearray()
+    course_ids, course_start = array("I"), array("I")
+    postings = {}  # term -> (doc ids, frequencies)
+
+    for doc, (kind, source_id, course_id, parent_id, title, text) in enumerate(documents):
+        if not course_ids or course_ids[-1] != course_id:
+            course_ids.append(course_id)
+            course_start.append(doc)
+        counts, length = term_frequencies(title, text)
+        for column, value in zip(columns, (course_id, kind, source_id, parent_id or 0, length)):
+            column.append(value)
+        titles += (title or "").replace("\n", " ").encode("utf-8")
+        title_start.append(len(titles))
+        for term, count in counts.items():
+            docs, frequencies = postings.setdefault(term, (array("I"), array("H")))
+            docs.append(doc)
+            frequencies.append(min(count, 0xFFFF))
+    course_start.append(len(columns[0]))
+
+    terms = sorted(postings)
+    term_start, post_docs, post_tf = array("I", [0]), array("I"), array("H")
+    for term in terms:
+        docs, frequencies = postings.pop(term)
+        post_docs.extend(docs)
+        post_tf.extend(frequencies)
+        term_start.append(len(post_docs))
+    term_bytes = "\n".join(terms).encode("utf-8")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(columns[0]), len(course_ids), len(terms), len(post_docs),
+                            len(term_bytes), len(titles), sum(columns[4])))
+        for values in (*columns, title_start, course_ids, course_start, term_start, post_docs, post_tf):
+            values.tofile(f)
+        f.write(term_bytes)
+        f.write(titles)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# Full rebuilds stream both tables in (course_id, id) order; documents()
+# merges them into segment order.
+CONTENT_QUERY = """SELECT content_id, course_id, title, CONCAT_WS(' ', section, description)
+    FROM course_content WHERE course_id IS NOT NULL ORDER BY course_id, content_id"""
+THREAD_QUERY = """SELECT fp.post_id, f.course_id, fp.forum_id, fp.title, fp.post
+    FROM forum_post fp JOIN forum f ON f.forum_id = fp.forum_id
+    WHERE f.course_id IS NOT NULL ORDER BY f.course_id, fp.post_id"""
+
+
+def documents(content_rows, thread_rows):
+    """Documents for build() from CONTENT_QUERY and THREAD_QUERY rows (tuples)"""
+    return heapq.merge(
+        ((CONTENT, content_id, course_id, None, title, text) for content_id, course_id, title, text in content_rows),
+        ((THREAD, post_id, course_id, forum_id, title, text)
+         for post_id, course_id, forum_id, title, text in thread_rows),
+        key=lambda document: (document[2], document[0], document[1]))
+
+
+# ==============================================
+# Search Index
+# ==============================================
+class SearchIndex:
+    def __init__(self, path, logger=None):
+        self.path = path
+        self.logger = logger
+        self._lock = threading.RLock()
+        self.generation = None
+        self.segment = Segment()
+        self._current_stamp = None
+        self._reset_journal()
+        self.searches = 0
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _journal_path(self, generation):
+        return self._file(f"journal-{generation}.jsonl")
+
+    def _read_current(self):
+        try:
+            with open(self._file("CURRENT")) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _reset_journal(self):
+        # Documents added since the segment: ids continue after its last one
+        self._journal_offset = 0
+        self._docs = []            # (kind, source_id, course_id, parent_id, title, length)
+        self._keys = set()         # (kind, source_id) of self._docs
+        self._postings = {}        # term -> {course_id: [(doc, tf), ...]}
+        self._frequency = {}       # term -> journal documents containing it
+        self._terms = []           # sorted keys of self._postings, for prefix lookups
+        self._length = 0
+
+    # ==============================================
+    # Loading and Refreshing
+    # ==============================================
+    def open(self):
+        """Map the current segment and replay its journal"""
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            self._open_generation(self._read_current())
+
+    def _open_generation(self, generation):
+        segment_path = self._file(f"segment-{generation}.idx")
+        segment = Segment(segment_path) if os.path.exists(segment_path) else Segment()
+        self.segment = segment
+        self.generation = generation
+        self._reset_journal()
+        self._replay()
+        if self.logger:
+            self.logger.info(f"Search index generation {generation} opened: {len(segment)} documents "
+                             f"in the segment, {len(self._docs)} from the journal")
+
+    def refresh(self):
+        """Pick up a rebuild or journal lines written by any process (two stat() calls)"""
+        with self._lock:
+            try:
+                stat = os.stat(self._file("CURRENT"))
+                stamp = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                stamp = None
+            if stamp != self._current_stamp:
+                self._current_stamp = stamp
+                generation = self._read_current()
+                if generation != self.generation:
+                    self._open_generation(generation)
+                    return
+            self._replay()
+
+    def _replay(self):
+        journal = self._journal_path(self.generation)
+        try:
+            if os.path.getsize(journal) <= self._journal_offset:
+                return
+        except FileNotFoundError:
+            return
+        with open(journal, "rb") as f:
+            f.seek(self._journal_offset)
+            data = f.read()
+        complete = data.rfind(b"\n") + 1  # a line still being written is read next time
+        self._journal_offset += complete
+        for line in data[:complete].splitlines():
+            try:
+                self._index(json.loads(line))
+            except (ValueError, KeyError, TypeError) as e:
+                if self.logger:
+                    self.logger.warning(f"Skipping bad search journal line: {str(e)}")
+
+    def _index(self, entry):
+        kind, source_id, course_id = entry["kind"], entry["id"], entry["course_id"]
+        if (kind, source_id) in self._keys or self.segment.contains(course_id, kind, source_id):
+            return  # written twice around a rebuild
+        counts, length = term_frequencies(entry.get("title"), entry.get("text"))
+        doc = len(self.segment) + len(self._docs)
+        self._docs.append((kind, source_id, course_id, entry.get("parent") or 0, entry.get("title") or "", length))
+        self._keys.add((kind, source_id))
+        self._length += length
+        for term, count in counts.items():
+            if term not in self._postings:
+                self._postings[term] = {}
+                insort(self._terms, term)
+            self._postings[term].setdefault(course_id, []).append((doc, count))
+            self._frequency[term] = self._frequency.get(term, 0) + 1
+
+    # ==============================================
+    # Adding Documents
+    # ==============================================
+    def add_content(self, content_id, course_id, title, text):
+        self._append({"kind": CONTENT, "id": content_id, "course_id": course_id, "title": title, "text": text})
+
+    def add_thread(self, post_id, forum_id, course_id, title, text):
+        self._append({"kind": THREAD, "id": post_id, "course_id": course_id, "parent": forum_id,
+                      "title": title, "text": text})
+
+    def _append(self, entry):
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            generation = self.generation
+            _append_line(self._journal_path(generation), line)
+            self.refresh()
+            if self.generation != generation:
+                # A rebuild swapped generations under us and may have copied
+                # the old journal before this line landed; repeat it (replay
+                # ignores duplicates).
+                _append_line(self._journal_path(self.generation), line)
+                self.refresh()
+
+    # ==============================================
+    # Rebuilding
+    # ==============================================
+    def mark(self):
+        """Where the journal ends now; take it before reading the documents for
+        build() from the database and pass it as `since`"""
+        generation = self._read_current()
+        return generation, _size(self._journal_path(generation))
+
+    def build(self, documents, since=None):
+        """Write a new generation from (kind, source_id, course_id, parent_id,
+        title, text) documents in (course_id, kind, source_id) order, e.g.
+        streamed from MySQL, and switch every process over to it.
+
+        Journal lines after `since` (a mark()) are carried over, the older
+        ones being in the documents. Without it the journal's size now is
+        used, which is only right if `documents` were read after this call.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        old = self._read_current()
+        old_journal = self._journal_path(old)
+        if since is None:
+            copied = _size(old_journal)
+        elif since[0] == old:
+            copied = since[1]
+        else:
+            copied = 0  # another build switched generations since; replay skips what it has
+
+        generation = old + 1
+        write_segment(self._file(f"segment-{generation}.idx"), documents)
+        journal = self._journal_path(generation)
+        copied = _copy_tail(old_journal, journal, copied)
+        _write_atomic(self._file("CURRENT"), f"{generation}\n")
+        # Lines appended to the old journal until writers notice the switch
+        _copy_tail(old_journal, journal, copied)
+
+        for name in os.listdir(self.path):
+            match = re.fullmatch(r"(?:segment|journal)-(\d+)\.(?:idx|jsonl)", name)
+            if match and int(match.group(1)) < old:
+                os.remove(self._file(name))
+        self.refresh()
+        return generation
+
+    # ==============================================
+    # Searching
+    # ==============================================
+    def search(self, query, course_id, limit=20):
+        """Best-matching documents of one course, highest score first"""
+        words = tokenize(query)
+        if not words:
+            return []
+        self.refresh()
+        with self._lock:
+            self.searches += 1
+            segment = self.segment
+            total = len(segment) + len(self._docs)
+            if not total:
+                return []
+            average_length = (segment.total_length + self._length) / total
+            first, end = segment.course_range(course_id)
+
+            scores = {}
+            for word in words:
+                best = {}  # a document counts once per query word, by its best-matching term
+                for term, weight in self._expand(word):
+                    segment_index = _find(segment.terms, term)
+                    frequency = (segment.document_frequency(segment_index) if segment_index is not None
+                                 else 0) + self._frequency.get(term, 0)
+                    idf = math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+                    postings = list(segment.postings(segment_index, first, end)) if segment_index is not None else []
+                    postings += self._postings.get(term, {}).get(course_id, ())
+                    offset = len(segment)
+                    for doc, tf in postings:
+                        length = segment.doc_length[doc] if doc < offset else self._docs[doc - offset][5]
+                        score = weight * idf * tf * (BM25_K1 + 1) / (
+                            tf + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+                        if score > best.get(doc, 0):
+                            best[doc] = score
+                for doc, score in best.items():
+                    scores[doc] = scores.get(doc, 0) + score
+
+            return [self._result(doc, score) for doc, score in
+                    heapq.nlargest(limit, scores.items(), key=lambda item: item[1])]
+
+    def _expand(self, word):
+        """(term, weight): the word itself and up to MAX_EXPANSIONS longer words starting with it"""
+        expansions = [(word, 1.0)]
+        longer = set()
+        for terms in (self.segment.terms, self._terms):
+            index = bisect_left(terms, word)
+            while index < len(terms) and len(longer) < MAX_EXPANSIONS and terms[index].startswith(word):
+                if terms[index] != word:
+                    longer.add(terms[index])
+                index += 1
+        return expansions + [(term, PREFIX_WEIGHT) for term in sorted(longer)]
+
+    def _result(self, doc, score):
+        segment = self.segment
+        if doc < len(segment):
+            kind, source_id, course_id, parent_id = (segment.doc_kind[doc], segment.doc_source[doc],
+                                                     segment.doc_course[doc], segment.doc_parent[doc])
+            title = segment.title(doc)
+        else:
+            kind, source_id, course_id, parent_id, title, _ = self._docs[doc - len(segment)]
+        result = {"type": KIND_NAMES[kind], "id": source_id, "course_id": course_id, "title": title,
+                  "score": round(score, 4)}
+        if kind == THREAD:
+            result["forum_id"] = parent_id
+        return result
+
+    def stats(self):
+        segment = self.segment
+        return {
+            "generation": self.generation,
+            "segment_documents": len(segment),
+            "segment_terms": len(segment.terms),
+            "segment_postings": len(segment.post_docs),
+            "journal_documents": len(self._docs),
+            "journal_terms": len(self._terms),
+            "journal_bytes": self._journal_offset,
+            "searches": self.searches,
+        }
+
+
+def _find(terms, term):
+    index = bisect_left(terms, term)
+    return index if index < len(terms) and terms[index] == term else None
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _append_line(path, line):
+    # One write() on an O_APPEND descriptor: lines from concurrent processes don't interleave
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def _copy_tail(source, destination, offset):
+    """Append source's complete lines from offset to destination; returns the new offset"""
+    try:
+        with open(source, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        data = b""
+    data = data[:data.rfind(b"\n") + 1]
+    with open(destination, "ab") as f:
+        f.write(data)
+    return offset + len(data)
+
+
+def _write_atomic(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
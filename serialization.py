@@ -0,0 +1,107 @@
+"""JSON encoding for API responses.
+
+FastJSONProvider replaces Flask's default JSON provider, so jsonify() (and
+with it handle_db_operation()), the streamed exports and asgi_app.py all
+encode through it. It uses orjson when installed and the standard library
+otherwise.
+
+Types JSON has no notation for go through ADAPTERS, an explicit
+type -> function table, instead of a chain of isinstance checks per value.
+The adapters reproduce Flask's defaults, so clients see the same values:
+dates and datetimes as HTTP dates (`event_date`, `created_at`), Decimals as
+strings (`gpa`, `grade`, report averages), UUIDs as strings. Keys are
+sorted and output is compact, as before; the only byte-level difference
+is that non-ASCII text is sent as UTF-8 rather than \\u escapes.
+"""
+import json
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from functools import lru_cache
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback, same output
+    orjson = None
+
+
+_DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS = (None, "Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def http_datetime(value):
+    """werkzeug.http.http_date() output (naive means UTC) at a fraction of its cost"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return (f"{_DAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month]} {value.year:04d} "
+            f"{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT")
+
+
+@lru_cache(maxsize=4096)
+def http_day(value):
+    # Listings repeat the same few dates many times over
+    return f"{_DAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month]} {value.year:04d} 00:00:00 GMT"
+
+
+ADAPTERS = {
+    Decimal: str,
+    datetime: http_datetime,
+    date: http_day,
+    uuid.UUID: str,
+}
+
+
+def adapt(value):
+    """JSON-native form of `value` via ADAPTERS; TypeError for unknown types"""
+    adapter = ADAPTERS.get(type(value))
+    if adapter is None:
+        for kind, candidate in ADAPTERS.items():  # subclasses, e.g. a DB driver's own Decimal
+            if isinstance(value, kind):
+                adapter = candidate
+                break
+        else:
+            raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return adapter(value)
+
+
+if orjson is not None:
+    # Dates go to adapt() instead of orjson's ISO format, to keep Flask's HTTP dates
+    _OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def encode(obj):
+        """Compact JSON as bytes, with a trailing newline like jsonify()"""
+        return orjson.dumps(obj, default=adapt, option=_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+
+    def _dumps(obj):
+        return orjson.dumps(obj, default=adapt, option=_OPTIONS).decode()
+else:
+    def encode(obj):
+        """Compact JSON as bytes, with a trailing newline like jsonify()"""
+        return (_dumps(obj) + "\n").encode()
+
+    def _dumps(obj):
+        return json.dumps(obj, default=adapt, sort_keys=True, separators=(",", ":"))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, encoding through encode()"""
+
+    default = staticmethod(adapt)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:  # e.g. indent=; the fast path takes no options
+            return super().dumps(obj, **kwargs)
+        return _dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs or orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)  # indented for debugging
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(encode(obj), mimetype=self.mimetype)
@@ -0,0 +1,103 @@
+import io
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+import app as flask_module
+from file_store import FileStore
+from jobs import JobQueue
+
+PDF = b"%PDF-1.4\n" + bytes(range(256)) * 8
+
+
+class Cursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql, params=()):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+
+class Connection:
+    """A pooled connection whose prepared statements all return `rows`"""
+
+    def __init__(self, rows):
+        self.statements = {}
+        self.raw = self
+        self.rows = rows
+
+    def cursor(self, **kwargs):
+        return Cursor(self.rows)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(flask_module, "refresh_memberships", lambda: None)
+    monkeypatch.setattr(flask_module, "jobs", JobQueue(str(tmp_path / "jobs.sqlite"), workers=0))
+    return flask_module.app.test_client()
+
+
+@pytest.fixture
+def submission(client, monkeypatch, tmp_path):
+    """Submission 5: student 4's file for an assignment in course 3, taught by 9"""
+    store = FileStore(str(tmp_path), 1 << 20)
+    stored = store.save(io.BytesIO(PDF))
+    row = {"student_id": 4, "file_sha256": stored.sha256, "file_name": "essay.pdf", "course_id": 3}
+    monkeypatch.setattr(flask_module, "file_store", store)
+    monkeypatch.setattr(flask_module, "get_db", lambda *args, **kwargs: Connection([row]))
+    monkeypatch.setattr(flask_module, "can_access_course", lambda identity, course_id: (
+        identity["role"] == "admin" or (identity["user_id"], course_id) == (9, 3)))
+    return client
+
+
+def headers(user_id, role, **extra):
+    with flask_module.app.app_context():
+        token = create_access_token(identity={"user_id": user_id, "role": role})
+    return {"Authorization": f"Bearer {token}", **extra}
+
+
+@pytest.mark.parametrize("user_id, role, status", [
+    (4, "student", 200),
+    (6, "student", 403),
+    (9, "lecturer", 200),
+    (8, "lecturer", 403),  # another course's lecturer
+    (1, "admin", 200),
+])
+def test_download_is_limited_to_the_student_and_course(submission, user_id, role, status):
+    response = submission.get("/submissions/5/file", headers=headers(user_id, role))
+    assert response.status_code == status
+    if status == 200:
+        assert response.data == PDF
+
+
+def test_download_supports_ranges_and_etags(submission):
+    response = submission.get("/submissions/5/file", headers=headers(4, "student", Range="bytes=0-7"))
+    assert response.status_code == 206
+    assert response.data == PDF[:8]
+    assert response.headers["Content-Range"] == f"bytes 0-7/{len(PDF)}"
+
+    etag = submission.get("/submissions/5/file", headers=headers(4, "student")).headers["ETag"]
+    response = submission.get("/submissions/5/file", headers=headers(4, "student", **{"If-None-Match": etag}))
+    assert response.status_code == 304
+
+
+@pytest.mark.parametrize("url", ["/jobs/stats", "/queries/stats", "/cache/stats", "/metrics/slow-queries"])
+def test_stats_are_for_admins_and_scrapers(client, monkeypatch, url):
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers=headers(9, "lecturer")).status_code == 403
+    assert client.get(url, headers=headers(1, "admin")).status_code == 200
+    monkeypatch.setitem(flask_module.app.config, "METRICS_SCRAPE_ADDRS", {"10.0.0.5"})
+    assert client.get(url, environ_base={"REMOTE_ADDR": "10.0.0.5"}).status_code == 200
+    assert client.get(url, environ_base={"REMOTE_ADDR": "10.0.0.6"}).status_code == 401
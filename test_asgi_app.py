@@ -0,0 +1,169 @@
+import asyncio
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+import app as flask_module
+import db_pool
+from jobs import JobQueue
+
+aiomysql = pytest.importorskip("aiomysql")
+pytest.importorskip("httpx")  # Starlette's TestClient
+TestClient = pytest.importorskip("starlette.testclient").TestClient
+
+import asgi_app  # noqa: E402
+
+
+def answer(sql, params):
+    """Rows for the statements the routes under test run, by table"""
+    if "job_outbox" in sql:
+        return [{"staged": 0}]
+    if "report_refresh" in sql:
+        return [{"rebuilt_at": datetime(2025, 1, 30, 2, 0)}]
+    if "course_enrollment_stats" in sql:
+        return [{"course_id": 1, "name": "Algebra", "enrollment": 61}]
+    if "calendar_event" in sql:
+        return [{"event_id": n, "course_id": 1, "title": f"Quiz {n}", "description": None,
+                 "event_date": date(2025, 1, 30 + n), "created_by": 9} for n in range(2)]
+    if "course" in sql:
+        return [{"course_id": n, "name": f"Course {n}", "lecturer_id": 9, "fee": Decimal("12.50")}
+                for n in range(1, 4)]
+    return []
+
+
+class Cursor:
+    rowcount, lastrowid = 0, None
+
+    def execute(self, sql, params=()):
+        self.rows = answer(sql, params)
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def close(self):
+        pass
+
+
+class Connection:
+    """A pooled connection for the Flask side, prepared cursors included"""
+
+    def __init__(self):
+        self.statements = {}
+        self.raw = self
+
+    def cursor(self, **kwargs):
+        return Cursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def clients(monkeypatch, tmp_path):
+    async def fetch_all(sql, params=(), name=None):
+        return answer(sql, params)
+
+    monkeypatch.setattr(flask_module, "get_db", lambda *args, **kwargs: Connection())
+    monkeypatch.setattr(asgi_app, "fetch_all", fetch_all)
+    monkeypatch.setattr(flask_module.cache, "enabled", False)  # both modes share it
+    monkeypatch.setattr(flask_module, "jobs", JobQueue(str(tmp_path / "jobs.sqlite"), workers=0))
+    return flask_module.app.test_client(), TestClient(asgi_app.app)
+
+
+def student_token(student_id):
+    with flask_module.app.app_context():
+        return create_access_token(identity={"user_id": student_id, "role": "student"})
+
+
+@pytest.mark.parametrize("url", [
+    "/courses",
+    "/courses?limit=2",
+    "/courses?lecturer_id=9",
+    "/courses?lecturer_id=nine",
+    "/courses?cursor=bogus",
+    "/courses/1/events",
+    "/reports/popular-courses",
+])
+def test_both_modes_answer_alike(clients, url):
+    flask_client, asgi_client = clients
+    expected, actual = flask_client.get(url), asgi_client.get(url)
+    assert actual.status_code == expected.status_code
+    assert actual.json() == expected.get_json()
+
+
+def test_both_modes_check_the_token_alike(clients):
+    flask_client, asgi_client = clients
+    headers = {"Authorization": f"Bearer {student_token(4)}"}
+    for url, status in [("/students/4/events?from=2025-01-01", 200), ("/students/5/events", 403),
+                        ("/students/4/events?from=01/01/2025", 400)]:
+        expected, actual = flask_client.get(url, headers=headers), asgi_client.get(url, headers=headers)
+        assert actual.status_code == expected.status_code == status
+        assert actual.json() == expected.get_json()
+    assert asgi_client.get("/students/4/events").status_code == 401
+
+
+class Pool:
+    """Enough of an aiomysql pool for asgi_app._connection()"""
+
+    def __init__(self, name, down=False):
+        self.name = name
+        self.down = down
+        self.size, self.freesize, self.maxsize = 0, 0, 10
+
+    async def acquire(self):
+        if self.down:
+            raise aiomysql.OperationalError(2003, "Can't connect to MySQL server")
+        return self.name
+
+    def release(self, db):
+        pass
+
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr(db_pool.ReplicaSet, "_monitor", lambda self: None)
+    idle = SimpleNamespace(in_use=0)  # the Flask side's pools, unused here
+    router = db_pool.ReplicaSet(idle, {"replica:3306": idle})
+    router._mark(router.replicas[0], True, 0, "ok")
+    monkeypatch.setattr(flask_module, "get_router", lambda: router)
+    monkeypatch.setattr(asgi_app, "_pools", {None: Pool("primary"), "replica:3306": Pool("replica")})
+    return router
+
+
+def read_from(writer=None, cache_fill=False):
+    async def connect():
+        asgi_app._writer.set(writer)
+        asgi_app._cache_fill.set(cache_fill)
+        async with asgi_app._connection() as db:
+            return db
+
+    return asyncio.run(connect())
+
+
+def test_reads_are_routed_like_the_flask_app(router):
+    assert read_from() == "replica"
+    assert read_from(cache_fill=True) == "primary"
+    router.record_write(4)
+    assert read_from(writer=4) == "primary"
+    assert read_from(writer=5) == "replica"
+    stats = router.stats()
+    assert (stats["replica_reads"], stats["primary_reads"], stats["read_your_writes"]) == (2, 1, 1)
+
+
+def test_unreachable_replica_falls_back_to_the_primary(router):
+    asgi_app._pools["replica:3306"].down = True
+    assert read_from() == "primary"
+    assert router.stats()["replicas"]["replica:3306"]["state"] == "unreachable"
+    assert read_from() == "primary"  # out of rotation until the next lag check
@@ -0,0 +1,96 @@
+import json
+import random
+import threading
+from urllib.parse import urlsplit
+
+import pytest
+
+import benchmark
+
+
+def fixtures():
+    """benchmark.Fixtures as sampled from a small bench database, without one"""
+    fx = object.__new__(benchmark.Fixtures)
+    fx.students = [(100 + n, f"s{n}@uni.test") for n in range(5)]
+    fx.lecturers = [(10, "l0@uni.test"), (11, "l1@uni.test")]
+    fx.admins = [(1, "a0@uni.test")]
+    fx.courses = [1, 2, 3]
+    fx.forums = [7, 8]
+    fx.assignments = [(20, 1), (21, 2)]
+    fx.student_courses = {100: [1, 2], 101: [3]}
+    fx.lecturer_courses = {10: [1]}
+    fx.course_forums = {1: [7], 3: [8]}
+    fx.forum_threads = {7: [70, 71]}
+    fx.next_ids = {"user": 1_000_000, "course": 1_000_000}
+    fx.tokens = {role: [(user[0], f"{role}-token") for user in users]
+                 for role, users in (("student", fx.students), ("lecturer", fx.lecturers),
+                                     ("admin", fx.admins))}
+    fx._lock = threading.Lock()
+    return fx
+
+
+def test_percentiles_and_summary():
+    values = [float(n) for n in range(1, 101)]
+    assert benchmark.percentile(values, 0.95) == 95.0
+    assert benchmark.percentile([4.0], 0.5) == 4.0
+    assert benchmark.percentile([], 0.5) is None
+    summary = benchmark.summarize([3.0, 1.0, 2.0], 1, 2.0)
+    assert summary == {"requests": 3, "errors": 1, "rps": 1.5, "mean_ms": 2.0, "p50_ms": 2.0,
+                       "p95_ms": 3.0, "p99_ms": 3.0, "max_ms": 3.0}
+    assert benchmark.summarize([], 0, 1.0)["p95_ms"] is None
+
+
+def test_every_workload_requests_a_real_route():
+    from app import app
+
+    urls = app.url_map.bind("localhost")
+    fx, rng = fixtures(), random.Random(0)
+    for name, workload in benchmark.WORKLOADS.items():
+        for _, operation in workload:
+            label, method, path, body, token = operation(fx, rng)
+            urls.match(urlsplit(path).path, method)  # NotFound / MethodNotAllowed otherwise
+            assert label.split()[0] == method, (name, label)
+
+
+def test_drive_records_per_route_latencies_and_server_errors(monkeypatch):
+    class Client:
+        def request(self, method, path, body=None, token=None):
+            return (500 if path == "/reports/busy-students" else 200), b"{}"
+
+    monkeypatch.setattr(benchmark, "mysql_questions", lambda: None)
+    samples, before, after = benchmark.drive(benchmark.REPORT_OPS, Client, fixtures(), clients=2,
+                                             duration=0.05, warmup=0.01, seed=1)
+    assert set(samples) == {"GET /reports/top-students", "GET /reports/popular-courses",
+                            "GET /reports/busy-students"}
+    latencies, errors = samples["GET /reports/busy-students"]
+    assert errors == [len(latencies)] and latencies
+    assert samples["GET /reports/top-students"][1] == [0]
+    assert (before, after) == (None, None)
+
+
+def result(p95, rps):
+    stats = {"requests": 100, "errors": 0, "rps": rps, "p50_ms": 1.0, "p95_ms": p95, "p99_ms": p95}
+    return {"workload": "mixed", "overall": stats, "routes": {"GET /courses": stats}}
+
+
+@pytest.mark.parametrize("p95, rps, ok", [
+    (10.5, 100, True),
+    (11.5, 100, False),   # p95 up 15%
+    (10.0, 85, False),    # throughput down 15%
+    (8.0, 120, True),
+])
+def test_compare_flags_regressions_past_the_threshold(tmp_path, capsys, p95, rps, ok):
+    old, new = tmp_path / "old.json", tmp_path / "new.json"
+    old.write_text(json.dumps(result(10.0, 100)))
+    new.write_text(json.dumps(result(p95, rps)))
+    assert benchmark.compare(str(old), str(new), threshold=10.0) is ok
+    assert ("REGRESSION" in capsys.readouterr().out) is not ok
+
+
+def test_results_are_written_as_json_and_csv(tmp_path):
+    benchmark.write_results(result(10.0, 100), str(tmp_path))
+    (json_file,) = tmp_path.glob("*-mixed.json")
+    assert json.loads(json_file.read_text())["routes"]["GET /courses"]["p95_ms"] == 10.0
+    (csv_file,) = tmp_path.glob("*-mixed.csv")
+    assert csv_file.read_text().splitlines()[1:] == [
+        "ALL,100,0,100,,1.0,10.0,10.0,", "GET /courses,100,0,100,,1.0,10.0,10.0,"]
@@ -0,0 +1,72 @@
+import csv
+import io
+import os
+
+import pytest
+
+import bulk_loader
+
+
+def quiet():
+    return bulk_loader.Progress(out=io.StringIO())
+
+
+def test_sql_literal():
+    assert bulk_loader.sql_literal(None) == "NULL"
+    assert bulk_loader.sql_literal(True) == "1"
+    assert bulk_loader.sql_literal(42) == "42"
+    assert bulk_loader.sql_literal(2.5) == "2.5"
+    assert bulk_loader.sql_literal("O'Brien") == "'O\\'Brien'"
+    assert bulk_loader.sql_literal("a\\b\nc\0") == "'a\\\\b\\nc\\0'"
+
+
+def test_batched():
+    assert list(bulk_loader.batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(bulk_loader.batched([], 2)) == []
+
+
+def test_sql_writer_batches_inserts_inside_one_transaction():
+    out = io.StringIO()
+    writer = bulk_loader.SqlWriter(out, batch_size=2, progress=quiet())
+    writer.begin()
+    writer.write("user", ["user_id", "name"], [(1, "Ann"), (2, "O'Neil"), (3, None)])
+    writer.finish()
+    assert out.getvalue() == (
+        "SET FOREIGN_KEY_CHECKS = 0;\nSET UNIQUE_CHECKS = 0;\nSTART TRANSACTION;\n"
+        "INSERT INTO user (user_id, name) VALUES\n(1, 'Ann'),\n(2, 'O\\'Neil');\n"
+        "INSERT INTO user (user_id, name) VALUES\n(3, NULL);\n"
+        "COMMIT;\nSET UNIQUE_CHECKS = 1;\nSET FOREIGN_KEY_CHECKS = 1;\n")
+
+
+def test_tables_must_arrive_parents_first():
+    writer = bulk_loader.SqlWriter(io.StringIO(), progress=quiet())
+    writer.write("course", ["course_id"], [(1,)])
+    writer.write("course", ["course_id"], [(2,)])  # a table may come in several chunks
+    with pytest.raises(ValueError, match="'user' written after one of its dependants"):
+        writer.write("user", ["user_id"], [(1,)])
+
+
+def test_delimited_writer_round_trips_through_csv(tmp_path):
+    writer = bulk_loader.DelimitedWriter(str(tmp_path), batch_size=2, progress=quiet())
+    writer.begin()
+    writer.write("user", ["user_id", "name"], [(1, 'Say "hi"'), (2, None)])
+    writer.write("user", ["user_id", "name"], [(3, "a,b")])
+    writer.write("course", ["course_id", "lecturer_id"], [(7, 1)])
+    writer.finish()
+
+    with open(tmp_path / "user.csv", newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f)) == [["1", 'Say "hi"'], ["2", "NULL"], ["3", "a,b"]]
+    with open(tmp_path / "load.sql", encoding="utf-8") as f:
+        script = f.read()
+    assert script.index("'user.csv' INTO TABLE user") < script.index("'course.csv' INTO TABLE course")
+    assert "(course_id, lecturer_id);" in script
+    assert sorted(os.listdir(tmp_path)) == ["course.csv", "load.sql", "user.csv"]
+
+
+def test_tsv_load_script_uses_a_tab_terminator(tmp_path):
+    writer = bulk_loader.DelimitedWriter(str(tmp_path), delimiter="\t", progress=quiet())
+    writer.begin()
+    writer.write("user", ["user_id"], [(1,)])
+    writer.finish()
+    assert (tmp_path / "user.tsv").read_text() == "1\n"
+    assert "FIELDS TERMINATED BY '\\t'" in (tmp_path / "load.sql").read_text()
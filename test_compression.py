@@ -0,0 +1,67 @@
+import gzip
+
+import pytest
+from flask import Flask, Response, jsonify, request
+
+from compression import Compressor
+
+BIG = {"rows": [{"course_id": n, "name": f"Course {n}"} for n in range(200)]}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    compressor = Compressor(min_bytes=256)
+    compressor.init_app(app)
+
+    @app.route("/big")
+    def big():
+        response = jsonify(BIG)
+        response.set_etag("v1")
+        return response.make_conditional(request)
+
+    @app.route("/small")
+    def small():
+        return jsonify({"ok": True})
+
+    @app.route("/stream")
+    def stream():
+        return Response((f"{n}\n" for n in range(1000)), mimetype="application/x-ndjson")
+
+    app.compressor = compressor
+    return app.test_client()
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("br, gzip", "br"),             # tie: Brotli
+    ("br;q=0.5, gzip", "gzip"),
+    ("*", "br"),
+])
+def test_negotiate_by_q_value(header, expected):
+    compressor = Compressor()
+    compressor.encodings = ("br", "gzip")  # whether or not brotli is installed here
+    assert compressor.negotiate(header) == expected
+
+
+def test_large_json_is_gzipped_with_a_weak_etag(client):
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == 'W/"v1"'
+    assert gzip.decompress(response.data) == client.get("/big").data
+    assert client.application.compressor.stats()["gzip_responses"] == 1
+
+    revalidated = client.get("/big", headers={"Accept-Encoding": "gzip", "If-None-Match": 'W/"v1"'})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == 'W/"v1"'
+
+
+def test_small_and_streamed_responses_go_out_as_they_are(client):
+    for url in ("/small", "/stream"):
+        response = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers
+    assert client.get("/big").headers.get("Content-Encoding") is None
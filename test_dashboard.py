@@ -0,0 +1,123 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+from mysql.connector import Error
+
+import dashboard
+from db_pool import PoolTimeout
+
+COURSES = [{"course_id": 1, "name": "Algebra"}, {"course_id": 2, "name": "Poetry"}]
+
+
+class Cursor:
+    """Answers each section's query by table; `fail` maps a table to the error it raises"""
+
+    def __init__(self, fail=None, release=None):
+        self.fail = fail or {}
+        self.release = release
+        self.deadlines = []
+
+    def execute(self, sql, params=()):
+        if "MAX_EXECUTION_TIME" in sql:
+            self.deadlines.append(params[0] if params else None)
+            return
+        table = next(name for name in ("student_course", "calendar_event", "course_content", "forum_post")
+                     if name in sql)
+        if table in self.fail:
+            raise self.fail[table]
+        if table == "calendar_event" and self.release is not None:
+            self.release.wait(5)  # a slow section
+        self.rows = {"student_course": COURSES}.get(table, [{"table": table}])
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class Connection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.closed = False
+
+    def cursor(self, dictionary=False):
+        return self._cursor
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        yield executor
+
+
+def load(cursor, executor, connect, timeout=1.0):
+    return dashboard.load(cursor, 4, executor, connect, date(2025, 1, 30), 10, timeout)
+
+
+def test_sections_run_on_their_own_connections(executor):
+    opened = []
+
+    def connect():
+        opened.append(Connection(Cursor()))
+        return opened[-1]
+
+    sections, extra = load(Cursor(), executor, connect).envelope()
+    assert sections["courses"] == COURSES
+    assert sections["upcoming_events"] == [{"table": "calendar_event"}]
+    assert extra == {"partial": False, "sections_failed": {}}
+    assert len(opened) == 3 and all(db.closed for db in opened)
+    assert all(db._cursor.deadlines == [1000, None] for db in opened)
+
+
+def test_a_section_without_a_connection_fails_alone(executor):
+    calls = []
+
+    def connect():
+        calls.append(1)
+        if len(calls) == 2:
+            raise PoolTimeout(msg="No database connection available after 1.0s")
+        return Connection(Cursor())
+
+    result = load(Cursor(), executor, connect)
+    assert list(result.failed.values()) == [dashboard.ERROR]
+    assert sum(section is None for section in result.sections.values()) == 1
+
+
+def test_a_slow_section_times_out(executor):
+    release = threading.Event()
+    try:
+        result = load(Cursor(), executor, lambda: Connection(Cursor(release=release)), timeout=0.05)
+    finally:
+        release.set()
+    assert result.failed == {"upcoming_events": dashboard.TIMEOUT}
+    assert result.sections["upcoming_events"] is None
+    assert result.sections["recent_content"] == [{"table": "course_content"}]
+
+
+def test_without_an_executor_sections_share_the_request_cursor():
+    cursor = Cursor(fail={"forum_post": Error(msg="Query execution was interrupted", errno=3024),
+                          "course_content": Error(msg="Lost connection", errno=2013)})
+
+    def connect():
+        raise AssertionError("no extra connections at the cap")
+
+    result = load(cursor, None, connect)
+    assert result.failed == {"recent_content": dashboard.ERROR, "forum_activity": dashboard.TIMEOUT}
+    assert result.sections["upcoming_events"] == [{"table": "calendar_event"}]
+    assert cursor.deadlines == [1000, None] * 3
+
+
+def test_students_without_courses_get_empty_sections(executor):
+    class NoCourses(Cursor):
+        def execute(self, sql, params=()):
+            self.rows = []
+
+    result = load(NoCourses(), executor, None)
+    assert result.envelope() == ({"courses": [], "upcoming_events": [], "recent_content": [],
+                                  "forum_activity": []}, {"partial": False, "sections_failed": {}})
@@ -0,0 +1,249 @@
+import time
+
+import pytest
+from mysql.connector import Error
+
+import db_pool
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+        self.in_transaction = False
+        self.unread_result = False
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise Error(msg="gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    created = []
+
+    def connect(**kwargs):
+        created.append(FakeConnection())
+        return created[-1]
+
+    monkeypatch.setattr(db_pool.mysql.connector, "connect", connect)
+    return created
+
+
+def test_reuses_the_most_recently_released_connection(connections):
+    pool = ConnectionPool({}, size=2, max_overflow=0)
+    first, second = pool.connect(), pool.connect()
+    first_raw, second_raw = first.raw, second.raw
+    first.close()
+    second.close()
+    assert pool.connect().raw is second_raw
+    assert pool.connect().raw is first_raw
+    assert len(connections) == 2
+
+
+def test_overflow_connections_close_on_release(connections):
+    pool = ConnectionPool({}, size=1, max_overflow=1)
+    first, second = pool.connect(), pool.connect()
+    first.close()
+    second.close()
+    assert [raw.closed for raw in connections] == [False, True]
+    assert pool.stats()["open"] == 1
+
+
+def test_times_out_when_exhausted(connections):
+    pool = ConnectionPool({}, size=1, max_overflow=0, timeout=0.05)
+    held = pool.connect()
+    with pytest.raises(PoolTimeout):
+        pool.connect()
+    assert pool.stats()["timeouts"] == 1
+    held.close()
+    pool.connect()
+
+
+def test_a_checkout_can_wait_less_than_the_pool_timeout(connections):
+    pool = ConnectionPool({}, size=1, max_overflow=0, timeout=30)
+    pool.connect()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.connect(timeout=0.05)
+    assert time.monotonic() - started < 1
+
+
+def test_release_rolls_back_open_transactions(connections):
+    pool = ConnectionPool({}, size=1, max_overflow=0)
+    connection = pool.connect()
+    connection.raw.in_transaction = True
+    connection.close()
+    assert connections[0].rollbacks == 1
+    connection.close()  # a second close is a no-op
+    assert pool.stats()["in_use"] == 0
+
+
+def test_dead_connection_is_replaced_on_checkout(connections):
+    pool = ConnectionPool({}, size=1, max_overflow=0, ping_interval=0)
+    connection = pool.connect()
+    connection.raw.alive = False
+    connection.close()
+    assert pool.connect().raw is connections[1]
+    assert connections[0].closed
+    assert pool.stats()["invalidated"] == 1
+
+
+def test_old_connection_is_recycled(connections):
+    pool = ConnectionPool({}, size=1, max_overflow=0, recycle=1)
+    connection = pool.connect()
+    connection._entry.created_at -= 2
+    connection.close()
+    assert pool.connect().raw is connections[1]
+    assert pool.stats()["recycled"] == 1
+
+
+def test_invalidated_connection_is_discarded(connections):
+    pool = ConnectionPool({}, size=1, max_overflow=0)
+    connection = pool.connect()
+    connection.invalidate()
+    connection.close()
+    assert connections[0].closed
+    assert pool.stats()["open"] == 0
+
+
+def test_returned_connection_cannot_be_used(connections):
+    pool = ConnectionPool({}, size=1, max_overflow=0)
+    connection = pool.connect()
+    connection.close()
+    with pytest.raises(Error):
+        connection.cursor()
+
+
+class StatusCursor:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def execute(self, query):
+        if self.pool.status is None:
+            raise Error(msg="Lost connection")
+
+    def fetchall(self):
+        return self.pool.status
+
+    def close(self):
+        pass
+
+
+class ReplicaConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self, dictionary=False):
+        return StatusCursor(self.pool)
+
+    def invalidate(self):
+        pass
+
+    def close(self):
+        self.pool.in_use -= 1
+
+
+class FakePool:
+    """A pool whose connections answer SHOW REPLICA STATUS with `status`"""
+
+    def __init__(self, name, status=()):
+        self.name = name
+        self.status = list(status)
+        self.down = False
+        self.in_use = 0
+        self.size = 10
+
+    def connect(self, timeout=None):
+        if self.down:
+            raise PoolTimeout(msg="Timed out waiting for a connection")
+        self.in_use += 1
+        return ReplicaConnection(self)
+
+    def dispose(self):
+        pass
+
+
+@pytest.fixture
+def replicas(monkeypatch):
+    # Lag checks run when a test calls check(), not on a timer
+    monkeypatch.setattr(db_pool.ReplicaSet, "_monitor", lambda self: None)
+
+    def build(selection="round_robin", **status):
+        pools = {name: FakePool(name, rows) for name, rows in status.items()}
+        replica_set = db_pool.ReplicaSet(FakePool("primary"), pools, selection=selection, max_lag=5)
+        for replica in replica_set.replicas:
+            replica_set.check(replica)
+        return replica_set, pools
+
+    return build
+
+
+def routed(replica_set, read_only=True, writer=None):
+    return replica_set.connect(read_only, writer).pool.name
+
+
+def test_reads_rotate_across_replicas_and_writes_use_the_primary(replicas):
+    replica_set, _ = replicas(r1=[{"Seconds_Behind_Source": 1}], r2=[])
+    assert {routed(replica_set) for _ in range(4)} == {"r1", "r2"}
+    assert routed(replica_set, read_only=False) == "primary"
+    assert replica_set.stats()["replica_reads"] == 4
+
+
+def test_unchecked_replicas_are_not_used(monkeypatch):
+    monkeypatch.setattr(db_pool.ReplicaSet, "_monitor", lambda self: None)
+    replica_set = db_pool.ReplicaSet(FakePool("primary"), {"r1": FakePool("r1")})
+    assert routed(replica_set) == "primary"
+    assert replica_set.stats()["fallback_unavailable"] == 1
+
+
+def test_writers_read_their_writes_from_the_primary(replicas):
+    replica_set, _ = replicas(r1=[])
+    replica_set.record_write(7)
+    assert routed(replica_set, writer=7) == "primary"
+    assert routed(replica_set, writer=8) == "r1"
+    replica_set._writers[7] -= replica_set.read_your_writes_window
+    assert routed(replica_set, writer=7) == "r1"
+
+
+def test_lagging_and_stopped_replicas_leave_the_rotation(replicas):
+    replica_set, pools = replicas(r1=[], r2=[])
+    pools["r1"].status = [{"Seconds_Behind_Source": 30}]
+    replica_set.check(replica_set.replicas[0])
+    assert {routed(replica_set) for _ in range(4)} == {"r2"}
+
+    pools["r2"].status = [{"Seconds_Behind_Master": None}]
+    replica_set.check(replica_set.replicas[1])
+    assert routed(replica_set) == "primary"
+    stats = replica_set.stats()
+    assert stats["fallback_lagging"] == 1
+    assert (stats["replicas"]["r1"]["state"], stats["replicas"]["r2"]["state"]) == ("lagging", "stopped")
+
+    pools["r1"].status = [{"Seconds_Behind_Source": 0}]
+    replica_set.check(replica_set.replicas[0])
+    assert routed(replica_set) == "r1"
+
+
+def test_unreachable_replica_falls_back_to_the_primary(replicas):
+    replica_set, pools = replicas(r1=[])
+    pools["r1"].down = True
+    assert routed(replica_set) == "primary"
+    assert replica_set.stats()["replicas"]["r1"]["state"] == "unreachable"
+    pools["r1"].down = False
+    replica_set.check(replica_set.replicas[0])
+    assert routed(replica_set) == "r1"
+
+
+def test_least_busy_picks_the_emptiest_replica(replicas):
+    replica_set, pools = replicas(selection="least_busy", r1=[], r2=[])
+    pools["r1"].in_use, pools["r2"].in_use = 5, 0
+    assert routed(replica_set) == "r2"
@@ -0,0 +1,89 @@
+import pytest
+
+import enrollment
+import reports
+
+
+class Cursor:
+    """student_course behind its primary key, for the statements enrollment.py issues"""
+
+    def __init__(self, students, courses, enrolled=()):
+        self.students = set(students)
+        self.courses = set(courses)
+        self.enrolled = set(enrolled)
+        self.counted = []  # record_enrollment upserts
+        self.inserts = 0
+
+    def execute(self, sql, params=()):
+        if sql.startswith("SELECT user_id AS id"):
+            self.rows = [{"id": student_id} for student_id in params if student_id in self.students]
+        elif sql.startswith("SELECT course_id AS id"):
+            self.rows = [{"id": course_id} for course_id in params if course_id in self.courses]
+        elif sql.startswith("INSERT INTO student_course ("):
+            self.inserts += 1
+            pairs = set(zip(params[::2], params[1::2]))
+            self.rowcount = len(pairs - self.enrolled)  # 0 affected rows for a no-op update
+            self.enrolled |= pairs
+        else:
+            self.counted.append((sql.split()[2], params))
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_enroll_one_counts_only_new_enrollments():
+    cursor = Cursor({4}, {1})
+    assert enrollment.enroll_one(cursor, 4, 1)
+    assert not enrollment.enroll_one(cursor, 4, 1)
+    assert cursor.counted == [("course_enrollment_stats", (1,)), ("student_course_stats", (4,))]
+
+
+def test_parse_pairs():
+    pairs, errors = enrollment.parse_pairs([
+        {"student_id": 4, "course_id": 1}, {"student_id": "4", "course_id": 1},
+        {"student_id": True, "course_id": 1}, [4, 1]])
+    assert pairs == [(4, 1)]
+    assert [error["row"] for error in errors] == [2, 3, 4]
+
+
+def test_parse_csv():
+    pairs, errors = enrollment.parse_csv(" student_id , course_id\n4,1\n 5 , 2 \nfive,2\n")
+    assert pairs == [(4, 1), (5, 2)]
+    assert errors == [{"row": 4, "error": "student_id and course_id must be integers"}]
+    with pytest.raises(ValueError):
+        enrollment.parse_csv("student,course\n4,1\n")
+
+
+def test_enroll_many_upserts_in_batches():
+    cursor = Cursor({4, 5, 6}, {1, 2}, enrolled={(4, 1)})
+    pairs = [(4, 1), (5, 1), (6, 2), (5, 1), (7, 1), (5, 3), (4, 2)]
+    batch = enrollment.enroll_many(cursor, pairs, [{"row": 9, "error": "bad"}], batch_size=2)
+
+    assert batch.envelope()[0] == {"received": 8, "inserted": 3, "skipped": 2, "invalid": 3}
+    assert [error.get("error") for error in batch.envelope()[1]["errors"]] == [
+        "bad", "Unknown student", "Unknown course"]
+    assert cursor.enrolled == {(4, 1), (5, 1), (6, 2), (4, 2)}
+    assert cursor.inserts == 2
+    assert (batch.students, batch.courses) == ([4, 5, 6], [1, 2])
+    assert cursor.counted == []  # recounted by the caller, not row by row
+
+
+def test_enroll_many_with_nothing_new_leaves_the_summaries_alone():
+    cursor = Cursor({4}, {1}, enrolled={(4, 1)})
+    batch = enrollment.enroll_many(cursor, [(4, 1)])
+    assert (batch.inserted, batch.skipped, batch.students, batch.courses) == (0, 1, [], [])
+    assert batch.enrolled == [(4, 1)]
+
+
+def test_refresh_enrollment_stats_recounts_in_chunks():
+    class Recorder:
+        def __init__(self):
+            self.calls = []
+
+        def execute(self, sql, params):
+            self.calls.append((sql.split()[2], params))
+
+    cursor = Recorder()
+    reports.refresh_enrollment_stats(cursor, {6, 4, 5}, {2, 1}, chunk_size=2)
+    assert cursor.calls == [("course_enrollment_stats", (1, 2)),
+                            ("student_course_stats", (4, 5)), ("student_course_stats", (6,))]
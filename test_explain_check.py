@@ -0,0 +1,37 @@
+import textwrap
+
+import explain_check
+
+SOURCE = '''
+def events(cursor, course_id, start, end):
+    where = "course_id = %s"
+    params = [course_id]
+    if start:
+        where += " AND event_date >= %s"
+    cursor.execute(f"SELECT * FROM calendar_event WHERE {where} ORDER BY event_date", params)
+    cursor.execute("UPDATE course SET name = %s WHERE course_id IN (" + ", ".join(["%s"] * 3) + ")", ())
+    cursor.execute("DELETE FROM report_refresh")  # explain: full-scan-ok
+    cursor.execute(build_sql())
+    cursor.execute("SET SESSION MAX_EXECUTION_TIME = 1000")
+'''
+
+
+def test_find_queries_rebuilds_sql_from_the_source(tmp_path):
+    path = tmp_path / "routes.py"
+    path.write_text(textwrap.dedent(SOURCE))
+    queries, skipped = explain_check.find_queries(str(path))
+
+    assert [(query.line, query.sql, query.allowed) for query in queries] == [
+        (7, "SELECT * FROM calendar_event WHERE course_id = %s AND event_date >= %s ORDER BY event_date", False),
+        (8, "UPDATE course SET name = %s WHERE course_id IN (%s)", False),
+        (9, "DELETE FROM report_refresh", True),
+    ]
+    assert queries[0].location == "routes.py:7"
+    assert skipped == [("routes.py:10", "dynamic SQL (build_sql())")]
+
+
+def test_dummy_params_keep_date_comparisons_sargable():
+    sql = "SELECT * FROM calendar_event WHERE course_id = %s AND event_date >= %s AND event_date < %s LIMIT %s"
+    assert explain_check.with_dummy_params(sql) == (
+        "SELECT * FROM calendar_event WHERE course_id = '1' AND event_date >= '2024-01-01' "
+        "AND event_date < '2024-01-01' LIMIT 10")
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+from flask_jwt_extended import create_access_token
+from mysql.connector import Error
+
+import app as flask_module
+from jobs import JobQueue
+
+MEMBERS = [{"user_id": n, "name": f"Student {n}", "email": f"s{n}@uni.test"} for n in range(1, 6)]
+
+
+class Cursor:
+    """An unbuffered cursor: rows come out of iteration, optionally failing after `fail_after`"""
+
+    def __init__(self, rows, fail_after=None):
+        self.rows = rows
+        self.fail_after = fail_after
+        self.sql = None
+
+    def execute(self, sql, params=()):
+        self.sql, self.params = sql, params
+
+    def __iter__(self):
+        for count, row in enumerate(self.rows):
+            if count == self.fail_after:
+                raise Error(msg="Lost connection to MySQL server during query", errno=2013)
+            yield row
+
+    def close(self):
+        pass
+
+
+class Connection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.log = []
+
+    def cursor(self, dictionary=False, buffered=None):
+        self.log.append(("cursor", buffered))
+        return self._cursor
+
+    def commit(self):
+        self.log.append("commit")
+
+    def rollback(self):
+        self.log.append("rollback")
+
+    def invalidate(self):
+        self.log.append("invalidate")
+
+    def close(self):
+        self.log.append("close")
+
+
+@pytest.fixture
+def export(monkeypatch, tmp_path):
+    monkeypatch.setattr(flask_module, "refresh_memberships", lambda: None)
+    monkeypatch.setattr(flask_module, "jobs", JobQueue(str(tmp_path / "jobs.sqlite"), workers=0))
+    monkeypatch.setattr(flask_module, "can_access_course", lambda identity, course_id: True)
+    monkeypatch.setitem(flask_module.app.config, "STREAM_BATCH_ROWS", 2)
+    with flask_module.app.app_context():
+        token = create_access_token(identity={"user_id": 9, "role": "lecturer"})
+    client = flask_module.app.test_client()
+
+    def get(query, cursor, **headers):
+        db = Connection(cursor)
+        monkeypatch.setattr(flask_module, "get_db", lambda *args, **kwargs: db)
+        response = client.get(f"/courses/3/members{query}",
+                              headers={"Authorization": f"Bearer {token}", **headers})
+        return response, db
+
+    return get
+
+
+def test_json_export_streams_every_row_in_one_document(export):
+    cursor = Cursor(MEMBERS)
+    response, db = export("?export=json", cursor)
+    assert response.is_streamed
+    assert response.mimetype == "application/json"
+    assert response.headers["X-Accel-Buffering"] == "no"
+    assert json.loads(response.get_data()) == {"message": "Course members retrieved", "data": MEMBERS}
+    response.close()
+    assert cursor.sql.endswith("ORDER BY sc.student_id") and cursor.params == (3,)
+    assert db.log == [("cursor", False), "commit", "close"]
+
+
+def test_ndjson_export_is_negotiable_by_accept(export):
+    response, _ = export("", Cursor(MEMBERS), Accept="application/x-ndjson")
+    assert response.mimetype == "application/x-ndjson"
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == MEMBERS
+
+
+def test_an_empty_export_is_still_a_document(export):
+    response, _ = export("?export=json", Cursor([]))
+    assert json.loads(response.get_data()) == {"message": "Course members retrieved", "data": []}
+
+
+def test_a_failure_mid_stream_ends_the_body_and_discards_the_connection(export):
+    response, db = export("?export=json", Cursor(MEMBERS, fail_after=3))
+    assert response.status_code == 200  # already sent
+    body = json.loads(response.get_data())
+    assert body["data"] == MEMBERS[:2] and body["error"] == "Database operation failed"
+    response.close()
+    assert db.log == [("cursor", False), "rollback", "invalidate", "close"]
+
@@ -0,0 +1,85 @@
+import forums
+from pagination import decode_cursor
+
+THREAD = {"post_id": 5, "forum_id": 2, "title": "Exam dates"}
+
+
+def reply(reply_id, parent=None, depth=1, root_rank=1):
+    return {"reply_id": reply_id, "parent_reply_id": parent, "reply_content": f"reply {reply_id}",
+            "user_id": 4, "author_name": "Ann", "created_at": None, "depth": depth, "root_rank": root_rank}
+
+
+# Two roots and a third probing for the next page, breadth first as TREE_QUERY returns them
+ROWS = [reply(10, root_rank=1), reply(20, root_rank=2), reply(30, root_rank=3),
+        reply(11, 10, 2, 1), reply(12, 10, 2, 1), reply(21, 20, 2, 2),
+        reply(13, 11, 3, 1)]
+
+
+class Cursor:
+    """The thread row, then the TREE_QUERY rows"""
+
+    def __init__(self, thread, rows):
+        self.results = [thread, rows]
+        self.executed = []
+
+    def execute(self, sql, params):
+        self.executed.append(params)
+
+    def fetchone(self):
+        return self.results.pop(0)
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+
+def load(limit, max_replies):
+    return forums.load_thread(Cursor(THREAD, list(ROWS)), 2, 5, None, limit, 4, max_replies)
+
+
+def shape(replies):
+    return [(node["reply_id"], shape(node["replies"])) for node in replies]
+
+
+def test_build_tree_nests_replies_under_their_parents():
+    roots, last_root = forums.build_tree([row for row in ROWS if row["root_rank"] <= 2])
+    assert shape(roots) == [(10, [(11, [(13, [])]), (12, [])]), (20, [(21, [])])]
+    assert roots[0]["replies"][0]["depth"] == 2
+    assert last_root == 20
+    assert forums.build_tree([]) == ([], None)
+
+
+def test_a_page_of_roots_with_a_cursor_for_the_next():
+    tree = load(limit=2, max_replies=50)
+    thread, extra = tree.envelope()
+    assert thread["title"] == "Exam dates"
+    assert shape(thread["replies"]) == [(10, [(11, [(13, [])]), (12, [])]), (20, [(21, [])])]
+    assert (extra["replies_loaded"], extra["truncated"]) == (6, False)
+    assert decode_cursor(extra["next_cursor"]) == [20]
+
+
+def test_the_last_page_has_no_cursor():
+    tree = load(limit=3, max_replies=50)
+    assert tree.next_cursor is None
+    assert [node["reply_id"] for node in tree.replies] == [10, 20, 30]
+
+
+def test_max_replies_truncates_the_deepest_levels():
+    tree = load(limit=2, max_replies=4)
+    assert tree.truncated and tree.loaded == 4
+    assert shape(tree.replies) == [(10, [(11, []), (12, [])]), (20, [])]
+
+
+def test_tree_query_parameters():
+    cursor = Cursor(THREAD, [])
+    forums.load_thread(cursor, 2, 5, None, 20, 4, 500)
+    # one extra root probes for a next page, two extra rows show max_replies being exceeded
+    assert cursor.executed == [(5, 2), (5, 0, 21, 4, 20, 502)]
+    cursor = Cursor(THREAD, [])
+    forums.load_thread(cursor, 2, 5, 30, 20, 4, 500)
+    assert cursor.executed[1][1] == 30
+
+
+def test_a_thread_from_another_forum_is_not_found():
+    cursor = Cursor(None, [])
+    assert forums.load_thread(cursor, 2, 5, None, 20, 4, 500) is None
+    assert cursor.executed == [(5, 2)]
@@ -0,0 +1,114 @@
+from decimal import Decimal
+
+import grading
+import reports
+
+
+class Cursor:
+    """assignment_submission and student_grade_stats for the statements
+    apply_grades() issues, so the running totals can be checked"""
+
+    def __init__(self, submissions, stats=None):
+        self.submissions = dict(submissions)  # {(assignment_id, student_id): grade}
+        self.stats = dict(stats or {})  # {student_id: (grade_sum, grade_count)}
+        self.log = []
+
+    def execute(self, sql, params):
+        self.log.append(sql.split()[0])
+        if "FOR UPDATE" in sql:
+            assignment_id, *student_ids = params
+            self.rows = [{"student_id": student_id, "grade": self.submissions[(assignment_id, student_id)]}
+                         for student_id in student_ids if (assignment_id, student_id) in self.submissions]
+        elif sql.lstrip().startswith("INSERT INTO student_grade_stats"):  # ensure_grade_stats
+            for student_id in params:
+                if student_id not in self.stats:
+                    self.stats[student_id] = self.totals(student_id)
+        elif sql.lstrip().startswith("UPDATE assignment_submission"):
+            count = (len(params) - 1) // 3
+            pairs, assignment_id = params[:2 * count], params[2 * count]
+            for student_id, grade in zip(pairs[::2], pairs[1::2]):
+                self.submissions[(assignment_id, student_id)] = grade
+
+    def executemany(self, sql, rows):  # record_grades
+        self.log.append("UPSERT")
+        for student_id, grade_sum, grade_count, _, _ in rows:
+            old_sum, old_count = self.stats.get(student_id, (0, 0))
+            self.stats[student_id] = (old_sum + grade_sum, old_count + grade_count)
+
+    def fetchall(self):
+        return self.rows
+
+    def totals(self, student_id):
+        """What reports.rebuild() would put in student_grade_stats"""
+        grades = [grade for (_, owner), grade in self.submissions.items()
+                  if owner == student_id and grade is not None]
+        return sum(grades, Decimal(0)), len(grades)
+
+
+def test_grade_delta():
+    assert reports.grade_delta(None, None) == (0, 0)
+    assert reports.grade_delta(None, 80) == (Decimal(80), 1)
+    assert reports.grade_delta(80, None) == (Decimal(-80), -1)
+    assert reports.grade_delta(70.5, Decimal("75.25")) == (Decimal("4.75"), 0)
+
+
+def test_parse_grade():
+    assert grading.parse_grade("87.456") == Decimal("87.46")
+    for bad in (True, "A+", float("nan"), -1, 100.01, None):
+        assert grading.parse_grade(bad) is None
+
+
+def test_outcomes_and_running_totals():
+    cursor = Cursor(
+        {(1, 10): None, (1, 11): Decimal("60.00"), (1, 12): Decimal("90.00"), (1, 13): None,
+         (2, 10): Decimal("70.00"), (2, 11): Decimal("80.00"), (2, 13): Decimal("50.00")},
+        # 13 has never been graded through the summaries: seeded from assignment 2 first
+        stats={10: (Decimal("70.00"), 1), 11: (Decimal("140.00"), 2), 12: (Decimal("90.00"), 1)})
+    batch = grading.apply_grades(cursor, 1, [
+        {"student_id": 10, "grade": 80},     # first grade
+        {"student_id": 11, "grade": "65"},   # regrade
+        {"student_id": 12, "grade": 90},     # same as before
+        {"student_id": 13, "grade": 100},    # first grade, unseeded student
+        {"student_id": 14, "grade": 50},     # no submission
+        {"student_id": 10, "grade": 0},
+        {"student_id": "x", "grade": 50},
+        {"student_id": 15, "grade": 101},
+    ])
+
+    assert [result["outcome"] for result in batch.results] == [
+        grading.GRADED, grading.REGRADED, grading.UNCHANGED, grading.GRADED,
+        grading.NOT_SUBMITTED, grading.DUPLICATE, grading.INVALID, grading.INVALID]
+    assert batch.summary() == {"graded": 2, "regraded": 1, "unchanged": 1, "not_submitted": 1,
+                               "duplicate": 1, "invalid": 2}
+    assert sorted(batch.changed_students) == [10, 11, 13]
+    assert cursor.log == ["SELECT", "INSERT", "UPDATE", "UPSERT"]  # seeded before the update
+    for student_id in (10, 11, 12, 13):
+        assert cursor.stats[student_id] == cursor.totals(student_id)
+    assert cursor.stats[13] == (Decimal("150.00"), 2)
+
+
+def test_nothing_written_when_nothing_changed():
+    cursor = Cursor({(1, 10): Decimal("80.00")})
+    batch = grading.apply_grades(cursor, 1, [{"student_id": 10, "grade": 80}])
+    assert batch.summary() == {"unchanged": 1}
+    assert cursor.log == ["SELECT"]
+
+
+def test_record_grades_skips_zero_deltas():
+    cursor = Cursor({})
+    reports.record_grades(cursor, {10: (0, 0)})
+    assert cursor.log == []
+    reports.record_grades(cursor, {10: (Decimal("5.00"), 0), 11: (Decimal("40.00"), 1)})
+    assert cursor.stats == {10: (Decimal("5.00"), 0), 11: (Decimal("40.00"), 1)}
+
+
+def test_refresh_gpa_rescales_to_the_gpa_scale():
+    class Recorder:
+        def execute(self, sql, params):
+            self.sql, self.params = sql, params
+
+    cursor = Recorder()
+    grading.refresh_gpa(cursor, [10, 11])
+    assert "ROUND(s.average * %s / %s, 2)" in cursor.sql
+    average, (scale, maximum, *student_ids) = Decimal("87.50"), cursor.params
+    assert (round(average * scale / maximum, 2), student_ids) == (Decimal("3.50"), [10, 11])
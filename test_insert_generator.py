@@ -0,0 +1,88 @@
+import csv
+import os
+import re
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("faker")
+
+import Insert_Generator as generator  # noqa: E402
+from bulk_loader import TABLE_ORDER  # noqa: E402
+
+
+def generate(out_dir, workers=1, seed=3):
+    settings = generator.Settings(students=300, courses=12, seed=seed, chunk_size=100)
+    generator.generate(settings, generator.Output("csv", str(out_dir)), workers)
+    return settings, read_tables(out_dir), str(out_dir)
+
+
+def read_tables(out_dir):
+    """{table: sorted rows} from every (shard) file, as LOAD DATA would see them"""
+    tables = {}
+    for name in os.listdir(out_dir):
+        if name.endswith(".csv"):
+            with open(os.path.join(out_dir, name), newline="", encoding="utf-8") as f:
+                tables.setdefault(name.split(".")[0], []).extend(
+                    tuple(None if value == "NULL" else value for value in row) for row in csv.reader(f))
+    return {table: sorted(rows, key=repr) for table, rows in tables.items()}
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    return generate(tmp_path_factory.mktemp("seed"))
+
+
+def test_every_table_is_loaded_parents_first(dataset):
+    _, tables, out_dir = dataset
+    with open(os.path.join(out_dir, "load.sql")) as f:
+        loaded = re.findall(r"INTO TABLE (\w+)", f.read())
+    assert set(loaded) == set(tables)
+    assert loaded == [table for table in TABLE_ORDER if table in tables]
+
+
+def test_users_are_laid_out_admins_lecturers_students(dataset):
+    settings, tables, _ = dataset
+    roles = Counter(row[4] for row in tables["user"])
+    assert roles == {"admin": settings.admins, "lecturer": settings.lecturers, "student": settings.students}
+    students = {int(row[0]) for row in tables["user"] if row[4] == "student"}
+    assert min(students) == settings.first_student_id
+    assert {int(row[0]) for row in tables["student_profile"]} == students
+
+
+def test_enrollments_respect_the_course_and_student_bounds(dataset):
+    settings, tables, _ = dataset
+    pairs = [(int(student), int(course)) for student, course in tables["student_course"]]
+    assert len(pairs) == len(set(pairs))
+    per_course = Counter(course for _, course in pairs)
+    assert set(per_course) == set(range(1, settings.courses + 1))
+    assert min(per_course.values()) >= generator.MIN_STUDENTS_PER_COURSE
+    per_student = Counter(student for student, _ in pairs)
+    assert min(per_student.values()) >= generator.MIN_COURSES_PER_STUDENT
+    lecturers = Counter(row[4] for row in tables["course"])
+    assert max(lecturers.values()) <= generator.MAX_COURSES_PER_LECTURER
+
+
+def test_child_rows_reference_existing_parents(dataset):
+    _, tables, _ = dataset
+    forums = {row[0] for row in tables["forum"]}
+    posts = {row[0]: row for row in tables["forum_post"]}
+    assert {row[4] for row in tables["forum_post"]} <= forums
+    replies = {row[0]: row for row in tables["reply"]}
+    for reply in replies.values():
+        assert reply[3] in posts
+        if reply[4] is not None:  # a nested reply answers a reply in the same thread
+            assert replies[reply[4]][3] == reply[3]
+    enrolled = set(tables["student_course"])
+    assignment_course = {row[0]: row[2] for row in tables["assignment"]}
+    for submission in tables["assignment_submission"]:
+        assert (submission[2], assignment_course[submission[1]]) in enrolled
+
+
+def test_the_same_seed_gives_the_same_data_on_any_number_of_workers(dataset, tmp_path):
+    _, tables, _ = dataset
+    _, parallel, _ = generate(tmp_path / "parallel", workers=2)
+    assert parallel == tables
+    _, reseeded, _ = generate(tmp_path / "reseeded", seed=4)
+    assert reseeded["user"] != tables["user"]
@@ -0,0 +1,154 @@
+import pytest
+
+from jobs import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs" / "jobs.sqlite"), workers=0, max_attempts=3, backoff=0)
+
+
+def test_jobs_run_with_their_payload(queue):
+    seen = []
+    queue.handler('record')(seen.append)
+    assert queue.enqueue('record', {"student_id": 4})
+    assert queue.drain() == 1
+    assert seen == [{"student_id": 4}]
+    assert queue.stats()["succeeded"] == 1
+    assert queue.stats()["depth"] == 0
+
+
+def test_pending_jobs_with_the_same_key_coalesce(queue):
+    seen = []
+    queue.handler('gpa')(seen.append)
+    assert queue.enqueue('gpa', {"student_id": 1}, key="gpa:1")
+    assert not queue.enqueue('gpa', {"student_id": 1}, key="gpa:1")
+    assert queue.enqueue_many('gpa', [({"student_id": 1}, "gpa:1"), ({"student_id": 2}, "gpa:2")]) == 1
+    queue.drain()
+    assert seen == [{"student_id": 1}, {"student_id": 2}]
+    assert queue.enqueue('gpa', {"student_id": 1}, key="gpa:1")  # free again once run
+
+
+def test_failures_retry_then_stay_failed(queue):
+    attempts = []
+
+    @queue.handler('flaky')
+    def flaky(payload):
+        attempts.append(payload)
+        raise RuntimeError("database down")
+
+    queue.enqueue('flaky')
+    queue.drain()
+    stats = queue.stats()
+    assert len(attempts) == 3
+    assert (stats["retried"], stats["failed"], stats["failed_jobs"]) == (2, 1, 1)
+
+
+def test_retry_succeeds(queue):
+    attempts = []
+
+    @queue.handler('once')
+    def once(payload):
+        attempts.append(payload)
+        if len(attempts) == 1:
+            raise RuntimeError("deadlock")
+
+    queue.enqueue('once')
+    queue.drain()
+    assert len(attempts) == 2
+    assert queue.stats()["succeeded"] == 1
+
+
+def test_delayed_jobs_wait(queue):
+    queue.handler('later')(lambda payload: None)
+    queue.enqueue('later', delay=60)
+    assert queue.drain() == 0
+    assert queue.stats()["depth"] == 1
+
+
+def test_pending_counts_unfinished_jobs_by_name(queue):
+    queue.handler('recount')(lambda payload: None)
+    queue.handler('fail')(lambda payload: 1 / 0)
+    queue.enqueue('recount')
+    queue.enqueue('recount', delay=60)
+    queue.enqueue('fail')
+    assert (queue.pending('recount'), queue.pending('fail')) == (2, 1)
+    queue.drain()
+    assert (queue.pending('recount'), queue.pending('fail')) == (1, 0)
+
+
+def test_unknown_job_names_are_rejected(queue):
+    with pytest.raises(KeyError):
+        queue.enqueue('missing')
+
+
+def test_jobs_survive_a_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    first = JobQueue(path, workers=0)
+    first.handler('record')(lambda payload: None)
+    first.enqueue('record', {"n": 1})
+    second = JobQueue(path, workers=0)
+    seen = []
+    second.handler('record')(seen.append)
+    assert second.drain() == 1
+    assert seen == [{"n": 1}]
+
+
+def test_the_file_is_created_on_first_use(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs" / "jobs.sqlite"), workers=0)
+    assert not (tmp_path / "jobs").exists()
+    assert queue.stats()["depth"] == 0
+    assert (tmp_path / "jobs" / "jobs.sqlite").exists()
+
+
+class Outbox:
+    """job_outbox for stage() and relay(): a MySQL cursor over a list of rows"""
+
+    def __init__(self):
+        self.rows = []
+
+    def executemany(self, sql, rows):
+        for name, payload, key in rows:
+            self.rows.append({"outbox_id": len(self.rows) + 1, "name": name, "payload": payload,
+                              "job_key": key})
+
+    def execute(self, sql, params):
+        if sql.startswith("DELETE"):
+            self.rows = [row for row in self.rows if row["outbox_id"] not in params]
+        elif "COUNT(*)" in sql:
+            self.result = [{"staged": sum(row["name"] == params[0] for row in self.rows)}]
+        else:
+            self.result = self.rows[:params[0]]
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0]
+
+
+def test_staged_jobs_are_queued_by_relay(queue):
+    seen = []
+    queue.handler('gpa')(seen.append)
+    outbox = Outbox()
+    queue.stage(outbox, 'gpa', [({"student_id": 1}, "gpa:1"), ({"student_id": 2}, "gpa:2")])
+    assert (queue.staged(outbox, 'gpa'), queue.pending('gpa')) == (2, 0)
+
+    assert queue.relay(outbox) == 2
+    assert (queue.staged(outbox, 'gpa'), queue.pending('gpa')) == (0, 2)
+    # A relay that died before its MySQL commit moves the same rows again
+    queue.stage(outbox, 'gpa', [({"student_id": 1}, "gpa:1")])
+    queue.relay(outbox)
+    assert queue.pending('gpa') == 2
+    queue.drain()
+    assert seen == [{"student_id": 1}, {"student_id": 2}]
+    with pytest.raises(KeyError):
+        queue.stage(outbox, 'nope', [({}, None)])
+
+
+def test_periodic_tasks_run_when_due(queue):
+    runs = []
+    queue.periodic(60)(lambda: runs.append(1))
+    queue._run_periodic()
+    queue._run_periodic()
+    assert runs == [1]
@@ -0,0 +1,91 @@
+from membership import ENROLLED_QUERY, LECTURER_QUERY, MembershipIndex
+
+
+class FakeCursor:
+    """Answers the three queries load() runs, in order"""
+
+    def __init__(self, enrollments, courses, forums):
+        self.results = [list(enrollments), list(courses), list(forums)]
+        self.rows = []
+
+    def execute(self, query, params=()):
+        self.rows = self.results.pop(0)
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+
+STUDENT = {"user_id": 2, "role": "student"}
+LECTURER = {"user_id": 50, "role": "lecturer"}
+
+
+def loaded():
+    index = MembershipIndex()
+    index.load(FakeCursor([(1, 10), (2, 10), (2, 11), (2, 30), (5, 11)],
+                          [(10, 50), (11, 51)], [(7, 10)]))
+    return index
+
+
+def test_enrollments_from_the_load():
+    index = loaded()
+    assert index.ready
+    assert index.is_enrolled(2, 11) and index.is_enrolled(2, 30) and index.is_enrolled(5, 11)
+    assert not index.is_enrolled(2, 12)
+    assert not index.is_enrolled(3, 10)
+    assert not index.is_enrolled(6, 10)  # past the last student
+
+
+def test_enrollments_after_the_load():
+    index = loaded()
+    index.add(3, 10)
+    index.add_many([(2, 12)])
+    assert index.is_enrolled(3, 10) and index.is_enrolled(2, 12)
+    assert index.stats()["added_since_load"] == 2
+
+
+def test_reload_replaces_additions():
+    index = loaded()
+    index.add(3, 10)
+    index.load(FakeCursor([(3, 10)], [], []))
+    assert index.is_enrolled(3, 10)
+    assert not index.is_enrolled(2, 11)
+    assert index.stats()["added_since_load"] == 0
+
+
+def test_lecturers_and_forums():
+    index = loaded()
+    assert index.lecturer_of(10) == 50
+    assert index.lecturer_of(12) is None
+    index.set_lecturer(12, 52)
+    assert index.lecturer_of(12) == 52
+    assert index.course_of_forum(7) == 10
+    index.set_forum(8, 12)
+    assert index.course_of_forum(8) == 12
+
+
+def test_access_decisions():
+    index = loaded()
+    assert index.can_access({"user_id": 1, "role": "admin"}, 99)
+    assert index.can_access(LECTURER, 10) is True
+    assert index.can_access(LECTURER, 11) is False
+    assert index.can_access(LECTURER, 12) is None
+    assert index.can_access(STUDENT, 10) is True
+    assert index.can_access(STUDENT, 12) is None
+    assert index.course_of_forum(7) == 10
+
+
+def test_fallback_rows_are_learned():
+    index = loaded()
+    assert index.fallback(STUDENT, 12) == (ENROLLED_QUERY, (2, 12))
+    assert index.learn(STUDENT, 12, (1,)) is True
+    assert index.can_access(STUDENT, 12) is True
+    assert index.learn(STUDENT, 13, None) is False
+
+    assert index.fallback(LECTURER, 12) == (LECTURER_QUERY, (12,))
+    assert index.learn(LECTURER, 12, (50,)) is True
+    assert index.can_access(LECTURER, 12) is True
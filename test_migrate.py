@@ -0,0 +1,90 @@
+import io
+
+import pytest
+
+import migrate
+
+
+def write(directory, files):
+    for name, sql in files.items():
+        (directory / name).write_text(sql, encoding="utf-8")
+
+
+class Cursor:
+    def __init__(self, applied):
+        self.applied = applied  # {version: checksum}
+        self.executed = []
+
+    def execute(self, sql, params=()):
+        self.executed.append(sql.strip())
+        if sql.startswith("INSERT INTO schema_migrations"):
+            self.applied[params[0]] = params[2]
+
+    def fetchall(self):
+        return list(self.applied.items())
+
+    def close(self):
+        pass
+
+
+class Connection:
+    def __init__(self, applied=None):
+        self._cursor = Cursor(dict(applied or {}))
+        self.commits = 0
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_migrations_load_in_version_order(tmp_path):
+    write(tmp_path, {"0010_later.sql": "", "0002_indexes.sql": "", "notes.txt": "", "3_no-pad.sql": ""})
+    assert [(m.version, m.name) for m in migrate.load_migrations(str(tmp_path))] == [
+        (2, "indexes"), (3, "no-pad"), (10, "later")]
+
+
+def test_duplicate_versions_are_rejected(tmp_path):
+    write(tmp_path, {"0002_a.sql": "", "2_b.sql": ""})
+    with pytest.raises(ValueError, match="duplicate migration version"):
+        migrate.load_migrations(str(tmp_path))
+
+
+def test_statements_split_at_line_ends_without_comments(tmp_path):
+    write(tmp_path, {"0001_x.sql": "-- a comment; with a semicolon\n"
+                                   "CREATE INDEX a ON t (x);\n\n"
+                                   "ALTER TABLE t\n  ADD COLUMN note VARCHAR(10) DEFAULT ';';\n"})
+    (migration,) = migrate.load_migrations(str(tmp_path))
+    assert migration.statements() == ["CREATE INDEX a ON t (x)",
+                                      "ALTER TABLE t\n  ADD COLUMN note VARCHAR(10) DEFAULT ';'"]
+
+
+def test_only_pending_migrations_run(tmp_path):
+    write(tmp_path, {"0001_a.sql": "CREATE INDEX a ON t (x);\n", "0002_b.sql": "CREATE INDEX b ON t (y);\n"})
+    migrations = migrate.load_migrations(str(tmp_path))
+    db = Connection({1: migrations[0].checksum})
+    out = io.StringIO()
+
+    assert migrate.migrate(db, migrations, out) == 1
+    assert "CREATE INDEX a ON t (x)" not in db._cursor.executed
+    assert "CREATE INDEX b ON t (y)" in db._cursor.executed
+    assert db.commits == 1
+    assert migrate.migrate(db, migrations, io.StringIO()) == 0
+
+
+def test_edited_migrations_are_flagged(tmp_path):
+    write(tmp_path, {"0001_a.sql": "CREATE INDEX a ON t (x);\n"})
+    migrations = migrate.load_migrations(str(tmp_path))
+    db = Connection({1: "0" * 64})
+    out = io.StringIO()
+    migrate.migrate(db, migrations, out)
+    assert "0001_a was edited after it was applied" in out.getvalue()
+    out = io.StringIO()
+    migrate.status(db, migrations, out)
+    assert out.getvalue() == "0001_a: applied (edited since)\n"
+
+
+def test_shipped_migrations_load():
+    versions = [migration.version for migration in migrate.load_migrations()]
+    assert versions == sorted(versions) and versions[0] == 1
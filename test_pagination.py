@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+
+from pagination import (InvalidCursor, decode_cursor, encode_cursor, keyset_predicate, keyset_query,
+                        keyset_result, parse_page_args)
+
+CONFIG = {"DEFAULT_PAGE_SIZE": 50, "MAX_PAGE_SIZE": 200}
+EVENTS = [("ce.event_date", "event_date"), ("ce.event_id", "event_id")]
+
+
+def test_single_column_predicate():
+    assert keyset_predicate([("course_id", "course_id")], [7]) == ("course_id > %s", [7])
+
+
+def test_two_column_predicate():
+    condition, params = keyset_predicate(EVENTS, ["2025-01-02", 9])
+    assert condition == "(ce.event_date > %s OR (ce.event_date = %s AND ce.event_id > %s))"
+    assert params == ["2025-01-02", "2025-01-02", 9]
+
+
+def test_null_leading_value_continues_past_the_nulls():
+    condition, params = keyset_predicate(EVENTS, [None, 9])
+    assert condition == "(ce.event_date IS NOT NULL OR (ce.event_date IS NULL AND ce.event_id > %s))"
+    assert params == [9]
+
+
+def test_cursor_of_the_wrong_length_is_rejected():
+    with pytest.raises(InvalidCursor):
+        keyset_predicate(EVENTS, [9])
+
+
+def test_query_fetches_one_extra_row():
+    query, params = keyset_query("SELECT * FROM course", "lecturer_id = %s", (3,),
+                                 [("course_id", "course_id")], [10], 25)
+    assert query == ("SELECT * FROM course WHERE lecturer_id = %s AND course_id > %s "
+                     "ORDER BY course_id LIMIT %s")
+    assert params == (3, 10, 26)
+
+
+def test_first_page_without_filter():
+    query, params = keyset_query("SELECT * FROM course", "", (), [("course_id", "course_id")], None, 10)
+    assert query == "SELECT * FROM course ORDER BY course_id LIMIT %s"
+    assert params == (11,)
+
+
+def test_result_sets_next_cursor_only_when_more_rows_exist():
+    rows = [{"event_date": date(2025, 1, day), "event_id": day} for day in range(1, 5)]
+    page = keyset_result(list(rows), [("event_date", "event_date"), ("event_id", "event_id")], 3)
+    assert page.items == rows[:3]
+    assert decode_cursor(page.next_cursor) == ["2025-01-03", 3]
+    assert keyset_result(rows[:3], EVENTS, 3).next_cursor is None
+
+
+def test_cursor_round_trip_and_garbage():
+    assert decode_cursor(encode_cursor([None, 5])) == [None, 5]
+    for token in ("not base64!", encode_cursor({"a": 1})[:-2], "eyJhIjoxfQ"):
+        with pytest.raises(InvalidCursor):
+            decode_cursor(token)
+
+
+def test_page_args_cap_and_fallback():
+    assert parse_page_args({"limit": "1000"}, CONFIG) == (None, 200)
+    assert parse_page_args({"limit": "0"}, CONFIG) == (None, 1)
+    assert parse_page_args({"limit": "many"}, CONFIG) == (None, 50)
+    assert parse_page_args({}, CONFIG, default_limit=10) == (None, 10)
@@ -0,0 +1,156 @@
+from datetime import date
+
+import pytest
+from mysql.connector import Error, errorcode
+
+import queries
+from pagination import decode_cursor
+from queries import InvalidParameter, PageQuery, Query, Registry, optional
+
+
+class PreparedCursor:
+    """Mimics MySQLCursorPrepared: prepares again only for a different SQL object"""
+
+    def __init__(self, log):
+        self.log = log
+        self.executed = None
+        self.forget = False
+
+    def execute(self, sql, params):
+        if self.forget:
+            self.forget = False
+            raise Error(msg="Unknown prepared statement handler", errno=errorcode.ER_UNKNOWN_STMT_HANDLER)
+        if sql is not self.executed:
+            self.log.append(sql)
+            self.executed = sql
+        self.params = params
+        self.rowcount, self.lastrowid = 1, 42
+        self.rows = [{"course_id": n} for n in range(1, 5)]
+
+    def fetchall(self):
+        return self.rows
+
+
+class Connection:
+    """What the registry needs of a PooledConnection"""
+
+    def __init__(self, log):
+        self.statements = {}
+        self.raw = self
+        self.log = log
+
+    def cursor(self, prepared=False, dictionary=False):
+        assert prepared and dictionary
+        return PreparedCursor(self.log)
+
+
+@pytest.fixture
+def registry():
+    registry = Registry()
+    registry.add(Query("course.create", "INSERT INTO course (course_id, name) VALUES (%(course_id)s, %(name)s)",
+                       fetch="write", course_id=int, name=str))
+    registry.add(Query("event.create", "INSERT INTO calendar_event (event_date, description) "
+                       "VALUES (%(event_date)s, %(description)s)",
+                       fetch="write", event_date=date, description=optional(str)))
+    registry.add(Query("course.get", "SELECT * FROM course WHERE course_id = %(course_id)s",
+                       fetch="one", course_id=int))
+    registry.add(PageQuery("course.list", "SELECT * FROM course", "", [("course_id", "course_id")]))
+    return registry
+
+
+@pytest.fixture
+def log():
+    return []
+
+
+def test_parameters_are_converted_and_ordered(registry, log):
+    db = Connection(log)
+    result = registry.run(db, "course.create", name="Algebra", course_id="5")
+    assert result.lastrowid == 42
+    assert log == ["INSERT INTO course (course_id, name) VALUES (%s, %s)"]
+    assert list(db.statements.values())[0].params == (5, "Algebra")
+
+
+def test_bad_values_raise_invalid_parameter(registry, log):
+    db = Connection(log)
+    for params in ({"course_id": "five", "name": "x"}, {"course_id": True, "name": "x"},
+                   {"course_id": 1, "name": None}):
+        with pytest.raises(InvalidParameter):
+            registry.run(db, "course.create", **params)
+    with pytest.raises(InvalidParameter):
+        registry.run(db, "event.create", event_date="31/01/2025", description=None)
+    registry.run(db, "event.create", event_date="2025-01-31", description=None)
+    assert list(db.statements.values())[0].params == (date(2025, 1, 31), None)
+
+
+def test_wrong_parameter_names_are_a_programming_error(registry, log):
+    with pytest.raises(TypeError):
+        registry.run(Connection(log), "course.create", course_id=1)
+    with pytest.raises(ValueError):
+        Query("bad", "SELECT %(a)s", b=int)
+
+
+def test_statements_are_prepared_once_per_connection(registry, log):
+    db = Connection(log)
+    for _ in range(3):
+        assert registry.run(db, "course.get", course_id=1) == {"course_id": 1}
+    assert len(log) == 1
+    registry.run(Connection(log), "course.get", course_id=1)  # e.g. after a reconnect
+    assert len(log) == 2
+    assert registry.stats()["course.get"]["prepares"] == 2
+    assert registry.stats()["course.get"]["calls"] == 4
+
+
+def test_forgotten_statement_is_prepared_again(registry, log):
+    db = Connection(log)
+    registry.run(db, "course.get", course_id=1)
+    next(iter(db.statements.values())).forget = True
+    assert registry.run(db, "course.get", course_id=1) == {"course_id": 1}
+    assert len(log) == 2
+    assert registry.stats()["course.get"]["errors"] == 0
+
+
+def test_pages_reuse_one_statement_per_shape(registry, log):
+    db = Connection(log)
+    page = registry.page(db, "course.list", None, 3)
+    assert [row["course_id"] for row in page.items] == [1, 2, 3]
+    assert decode_cursor(page.next_cursor) == [3]
+    registry.page(db, "course.list", [3], 3)
+    registry.page(db, "course.list", [6], 3)
+    assert log == ["SELECT * FROM course ORDER BY course_id LIMIT %s",
+                   "SELECT * FROM course WHERE course_id > %s ORDER BY course_id LIMIT %s"]
+    with pytest.raises(TypeError):
+        registry.run(db, "course.list")
+
+
+def test_run_many_checks_every_row_first(registry, log):
+    db = Connection(log)
+    rows = [{"course_id": 1, "name": "a"}, {"course_id": 2, "name": "b"}]
+    assert registry.run_many(db, "course.create", rows) == 2
+    with pytest.raises(InvalidParameter):
+        registry.run_many(db, "course.create", rows + [{"course_id": "x", "name": "c"}])
+    assert registry.stats()["course.create"]["calls"] == 2
+
+
+def test_hooks_see_every_execution(registry, log):
+    seen = []
+    registry.on_execute(lambda *args: seen.append(args))
+    registry.run(Connection(log), "course.get", course_id=1)
+    name, sql, seconds, rows, failed = seen[0]
+    assert (name, rows, failed) == ("course.get", 4, False)  # rows read
+    assert sql == "SELECT * FROM course WHERE course_id = %s"
+
+
+def test_registered_queries_compile():
+    for query in queries.QUERIES.queries.values():
+        assert "%(" not in query.sql
+        assert query.sql.count("%s") == len(query.order)
+
+
+def test_thread_listing_pages_in_index_order():
+    # (forum_id, created_at) plus the primary key: idx_forum_post_forum_created, no filesort
+    query = queries.QUERIES["thread.by_forum"]
+    sql, params = query.page_statement(query.bind({"forum_id": "7"}), ["2025-01-30 02:00:00", 12], 20)
+    assert sql.endswith("WHERE fp.forum_id = %s AND (fp.created_at > %s OR (fp.created_at = %s "
+                        "AND fp.post_id > %s)) ORDER BY fp.created_at, fp.post_id LIMIT %s")
+    assert params == (7, "2025-01-30 02:00:00", "2025-01-30 02:00:00", 12, 21)
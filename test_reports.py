@@ -0,0 +1,68 @@
+import io
+from datetime import datetime
+
+import bulk_loader
+import reports
+
+REBUILT = datetime(2025, 1, 30, 2, 0)
+
+
+class Cursor:
+    def __init__(self, rows, refresh=None):
+        self.rows = rows
+        self.refresh = refresh
+        self.executed = []
+
+    def execute(self, sql, params=()):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.refresh
+
+
+def test_reports_read_the_summaries_and_the_last_rebuild():
+    rows = [{"course_id": 1, "name": "Algebra", "enrollment": 61}]
+    cursor = Cursor(rows, {"rebuilt_at": REBUILT})
+    assert reports.popular_courses(cursor, 50).envelope() == (rows, {"as_of": REBUILT, "stale": False})
+    (query, params), (refresh, _) = cursor.executed
+    assert "FROM course_enrollment_stats" in query and "GROUP BY" not in query
+    assert params == (50,)
+    assert "report_refresh" in refresh
+
+
+def test_stale_without_a_rebuild_or_while_recounting():
+    assert reports.busy_students(Cursor([])).envelope()[1] == {"as_of": None, "stale": True}
+    report = reports.busy_students(Cursor([], {"rebuilt_at": REBUILT}), 5, pending=1)
+    assert report.envelope()[1] == {"as_of": REBUILT, "stale": True}
+
+
+def test_record_enrollment_bumps_both_counters():
+    cursor = Cursor([])
+    reports.record_enrollment(cursor, 4, 1)
+    assert [(sql.split()[2], params) for sql, params in cursor.executed] == [
+        ("course_enrollment_stats", (1,)), ("student_course_stats", (4,))]
+    assert all("enrollment + 1" in sql or "course_count + 1" in sql for sql, _ in cursor.executed)
+
+
+def test_rebuild_runs_every_statement():
+    cursor = Cursor([])
+    reports.rebuild(cursor)
+    assert [sql for sql, _ in cursor.executed] == reports.REBUILD_STATEMENTS
+
+
+def test_bulk_loads_of_report_sources_end_with_a_rebuild():
+    def load(table, **kwargs):
+        out = io.StringIO()
+        writer = bulk_loader.SqlWriter(out, progress=bulk_loader.Progress(out=io.StringIO()), **kwargs)
+        writer.begin()
+        writer.write(table, ["student_id", "course_id"] if table == "student_course" else ["user_id"], [(4, 1)])
+        writer.finish()
+        return out.getvalue()
+
+    script = load("student_course")
+    assert script.index(reports.REBUILD_STATEMENTS[-1]) < script.index("COMMIT")
+    assert reports.REBUILD_STATEMENTS[0] not in load("user")
+    assert reports.REBUILD_STATEMENTS[0] not in load("student_course", refresh_reports=False)
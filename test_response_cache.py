@@ -0,0 +1,106 @@
+import time
+
+import pytest
+from flask import Flask, g, jsonify
+
+from response_cache import MemoryStore, ResponseCache, SqliteStore
+
+ENTRY = (200, "etag", "application/json", b"{}")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStore(max_entries=2)
+    return SqliteStore(str(tmp_path / "responses.sqlite"), max_entries=2)
+
+
+def test_store_round_trip_and_expiry(store):
+    store.set("fresh", ENTRY, ttl=60)
+    assert tuple(store.get("fresh")) == ENTRY
+    store.set("key", ENTRY, ttl=0.01)
+    time.sleep(0.02)
+    assert store.get("key") is None
+
+
+def test_store_bump_changes_only_the_bumped_tags(store):
+    before = store.versions(["a", "b"])
+    store.bump(["a"])
+    after = store.versions(["a", "b"])
+    assert after[0] != before[0]
+    assert after[1] == before[1]
+
+
+def test_sqlite_store_creates_its_file_on_first_use(tmp_path):
+    store = SqliteStore(str(tmp_path / "cache" / "responses.sqlite"))
+    assert not (tmp_path / "cache").exists()
+    assert store.get("key") is None
+    assert (tmp_path / "cache" / "responses.sqlite").exists()
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryStore(max_entries=2)
+    store.set("a", 1, 60)
+    store.set("b", 2, 60)
+    store.get("a")
+    store.set("c", 3, 60)
+    assert (store.get("a"), store.get("b"), store.get("c")) == (1, None, 3)
+    assert store.evictions == 1
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    cache = ResponseCache(MemoryStore(), ttl=60)
+    calls = []
+
+    @app.route('/courses/<int:course_id>/forums')
+    @cache.cached(lambda course_id: [f"course:{course_id}:forums"])
+    def forums(course_id):
+        calls.append(g.get('response_cache_fill'))
+        if course_id == 0:
+            return jsonify({"error": "Resource not found"}), 404
+        return jsonify({"data": [len(calls)]})
+
+    client = app.test_client()
+    client.cache, client.calls = cache, calls
+    return client
+
+
+def test_second_request_is_a_hit(client):
+    first = client.get('/courses/1/forums')
+    second = client.get('/courses/1/forums')
+    assert (first.headers['X-Cache'], second.headers['X-Cache']) == ("MISS", "HIT")
+    assert second.get_json() == first.get_json()
+    assert client.calls == [True]  # the miss was marked as a cache fill
+
+
+def test_invalidation_misses_on_the_next_request(client):
+    client.get('/courses/1/forums')
+    client.cache.invalidate("course:1:forums")
+    response = client.get('/courses/1/forums')
+    assert response.headers['X-Cache'] == "MISS"
+    assert response.get_json() == {"data": [2]}
+    assert client.get('/courses/2/forums').headers['X-Cache'] == "MISS"
+
+
+def test_if_none_match_returns_304(client):
+    etag = client.get('/courses/1/forums').headers['ETag']
+    response = client.get('/courses/1/forums', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert client.cache.stats()["not_modified"] == 1
+
+
+def test_errors_are_not_cached(client):
+    client.get('/courses/0/forums')
+    client.get('/courses/0/forums')
+    assert len(client.calls) == 2
+    assert client.cache.stats()["stores"] == 0
+
+
+def test_invalidate_on_success_skips_failed_writes(client):
+    version = client.cache.store.versions(["course:1:forums"])
+    client.cache.invalidate_on_success(({"error": "x"}, 500), "course:1:forums")
+    assert client.cache.store.versions(["course:1:forums"]) == version
+    client.cache.invalidate_on_success(({"data": 1}, 201), "course:1:forums")
+    assert client.cache.store.versions(["course:1:forums"]) != version
@@ -0,0 +1,103 @@
+import os
+
+from search_index import CONTENT, THREAD, SearchIndex, documents, tokenize
+
+CONTENT_ROWS = [
+    (1, 10, "Lecture notes week one", "Introduction sorting algorithms"),
+    (2, 10, "Exam review", "Past papers and solutions"),
+    (3, 20, "Sorting lab", "Quicksort and mergesort exercises"),
+]
+THREAD_ROWS = [
+    (5, 10, 7, "Question about sorting", "Is quicksort stable?"),
+]
+
+
+def built(tmp_path):
+    index = SearchIndex(str(tmp_path / "search_index"))
+    index.open()
+    index.build(documents(CONTENT_ROWS, THREAD_ROWS))
+    return index
+
+
+def ids(results):
+    return [(result["type"], result["id"]) for result in results]
+
+
+def test_tokenize_drops_stopwords_and_short_words():
+    assert tokenize("The Quick-sort of a B tree") == ["quick", "sort", "tree"]
+
+
+def test_documents_merge_in_course_order():
+    order = [(doc[2], doc[0], doc[1]) for doc in documents(CONTENT_ROWS, THREAD_ROWS)]
+    assert order == [(10, CONTENT, 1), (10, CONTENT, 2), (10, THREAD, 5), (20, CONTENT, 3)]
+
+
+def test_search_is_scoped_to_the_course(tmp_path):
+    index = built(tmp_path)
+    assert set(ids(index.search("sorting", 10))) == {("content", 1), ("thread", 5)}
+    assert ids(index.search("sorting", 20)) == [("content", 3)]
+    assert index.search("sorting", 30) == []
+
+
+def test_title_matches_rank_first(tmp_path):
+    index = built(tmp_path)
+    results = index.search("sorting", 10)
+    assert ids(results)[0] == ("thread", 5)  # in the title, not only the body
+    assert results[0]["forum_id"] == 7
+
+
+def test_prefixes_match_longer_words(tmp_path):
+    index = built(tmp_path)
+    assert ids(index.search("quick", 20)) == [("content", 3)]
+    assert index.search("the", 10) == []
+
+
+def test_journal_additions_are_searchable_and_survive_reopen(tmp_path):
+    index = built(tmp_path)
+    index.add_content(9, 10, "Graph algorithms", "Dijkstra shortest paths")
+    assert ids(index.search("dijkstra", 10)) == [("content", 9)]
+
+    reopened = SearchIndex(index.path)
+    reopened.open()
+    assert ids(reopened.search("dijkstra", 10)) == [("content", 9)]
+    assert reopened.stats()["journal_documents"] == 1
+
+
+def test_rebuild_folds_the_journal_into_the_segment(tmp_path):
+    index = built(tmp_path)
+    index.add_thread(6, 7, 10, "Heaps", "Binary heap question")
+    # Lines written before a build are in the database rows it reads
+    rows = THREAD_ROWS + [(6, 10, 7, "Heaps", "Binary heap question")]
+    generation = index.build(documents(CONTENT_ROWS, rows))
+    assert ids(index.search("heap", 10)) == [("thread", 6)]
+    assert index.stats()["segment_documents"] == 5
+    assert index.stats()["journal_documents"] == 0
+    # Only the previous generation is kept
+    assert sorted(os.listdir(index.path)) == sorted([
+        "CURRENT", f"segment-{generation - 1}.idx", f"journal-{generation - 1}.jsonl",
+        f"segment-{generation}.idx", f"journal-{generation}.jsonl"])
+
+
+def test_written_twice_around_a_rebuild_counts_once(tmp_path):
+    index = built(tmp_path)
+    index.add_content(1, 10, "Lecture notes week one", "Introduction sorting algorithms")
+    assert index.stats()["journal_documents"] == 0
+
+
+def test_lines_added_while_the_database_is_read_are_carried_over(tmp_path):
+    index = built(tmp_path)
+    since = index.mark()
+    # Committed and journaled after the build's SELECTs started, so not in its rows
+    index.add_thread(6, 7, 10, "Heaps", "Binary heap question")
+    index.build(documents(CONTENT_ROWS, THREAD_ROWS), since)
+    assert ids(index.search("heap", 10)) == [("thread", 6)]
+    assert index.stats()["journal_documents"] == 1
+
+
+def test_journal_postings_are_kept_per_course(tmp_path):
+    index = built(tmp_path)
+    index.add_content(9, 10, "Graph algorithms", "Dijkstra shortest paths")
+    index.add_content(10, 20, "Graph theory", "Dijkstra proofs")
+    assert ids(index.search("dijkstra", 10)) == [("content", 9)]
+    assert ids(index.search("dijkstra", 20)) == [("content", 10)]
+    assert index.search("dijkstra", 30) == []
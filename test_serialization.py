@@ -0,0 +1,59 @@
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import serialization
+
+ROW = {
+    "name": "Zoë",
+    "gpa": Decimal("3.50"),
+    "event_date": date(2025, 1, 30),
+    "created_at": datetime(2025, 1, 30, 14, 5, 9),
+    "token": uuid.UUID(int=1),
+    "count": 3,
+    "missing": None,
+}
+
+
+def test_adapters_match_flask_defaults():
+    flask_default = DefaultJSONProvider.default
+    for value in ROW.values():
+        if type(value) in serialization.ADAPTERS:
+            assert serialization.adapt(value) == flask_default(value)
+    aware = datetime(2025, 1, 30, 16, 5, 9, tzinfo=timezone(timedelta(hours=2)))
+    assert serialization.http_datetime(aware) == "Thu, 30 Jan 2025 14:05:09 GMT"
+
+
+def test_adapt_handles_subclasses_and_rejects_unknown_types():
+    class DriverDecimal(Decimal):
+        pass
+
+    assert serialization.adapt(DriverDecimal("1.5")) == "1.5"
+    with pytest.raises(TypeError, match="set is not JSON serializable"):
+        serialization.adapt({1})
+
+
+def test_encode_is_compact_sorted_and_utf8():
+    body = serialization.encode([ROW])
+    assert body.endswith(b"]\n")
+    assert body.index(b'"count"') < body.index(b'"created_at"') < body.index(b'"name"')
+    assert b"Zo\xc3\xab" in body and b'": ' not in body
+    assert json.loads(body) == [{
+        "name": "Zoë", "gpa": "3.50", "event_date": "Thu, 30 Jan 2025 00:00:00 GMT",
+        "created_at": "Thu, 30 Jan 2025 14:05:09 GMT", "token": str(uuid.UUID(int=1)),
+        "count": 3, "missing": None}]
+
+
+def test_jsonify_goes_through_the_provider():
+    app = Flask(__name__)
+    app.json = serialization.FastJSONProvider(app)
+    with app.app_context():
+        response = app.json.response({"rows": [ROW]})
+        assert response.get_data() == serialization.encode({"rows": [ROW]})
+        assert app.json.loads(app.json.dumps({"b": 1, "a": [2]})) == {"a": [2], "b": 1}
+        assert app.json.dumps({"a": 1}, indent=2) == '{\n  "a": 1\n}'